@@ -0,0 +1,244 @@
+"""
+Analyze student_logs proctoring events per exam attempt
+
+LogRepository.getLogsByStudent only lists events per student. This script
+joins a student_logs export with the exam_attempts windows
+(startedAt -> submittedAt) and reports, per attempt:
+
+    tabSwitches   number of "Tab Change" events inside the window
+    maxBurst      most tab switches within any --window seconds
+    burst         maxBurst >= --burst-threshold
+    outlier       tabSwitches is far above the rest of the same exam
+                  (robust z-score on median/MAD >= --z)
+
+Both exports are read in time order and joined with a sorted merge: attempts
+become active when the log stream reaches their startedAt and are finished
+when it passes their submittedAt. Only active attempts are held in memory.
+Use --sort if the exports are not already ordered (logs by timestamp,
+attempts by startedAt); that loads them into memory first.
+
+Export format:
+    logs      NDJSON StudentLog documents; timestamp as epoch millis, ISO-8601
+              or a Firestore {"_seconds", "_nanoseconds"} object
+    attempts  NDJSON or CSV ExamAttempt documents
+
+Usage:
+    python analyze-proctoring-logs.py <student_logs.ndjson> <attempts.ndjson|csv>
+                                      [--event "Tab Change"] [--window 60]
+                                      [--burst-threshold 3] [--z 3.5] [--sort]
+                                      [--output proctoring_report.csv]
+"""
+
+import argparse
+import csv
+import heapq
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from pathlib import Path
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+REPORT_FIELDS = ['attemptId', 'examId', 'studentId', 'studentName', 'startedAt', 'submittedAt',
+                 'events', 'tabSwitches', 'maxBurst', 'burst', 'outlier']
+
+
+def read_records(path):
+    """Yield documents from an NDJSON, JSON array or CSV export"""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.suffix.lower() == '.csv':
+            yield from csv.DictReader(f)
+        elif path.suffix.lower() == '.json':
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def to_millis(value):
+    """Epoch millis from the timestamp shapes found in exports"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, dict):
+        seconds = value.get('_seconds', value.get('seconds', 0))
+        nanos = value.get('_nanoseconds', value.get('nanoseconds', 0))
+        return int(seconds) * 1000 + int(nanos) // 1_000_000
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value)
+    if text.isdigit():
+        return int(text)
+    return int(datetime.fromisoformat(text.replace('Z', '+00:00')).timestamp() * 1000)
+
+
+def ordered(records, key, sort, label):
+    """Pass records through in key order, sorting first only when asked to"""
+    if sort:
+        yield from sorted((r for r in records if key(r) is not None), key=key)
+        return
+    last = None
+    for record in records:
+        value = key(record)
+        if value is None:
+            continue
+        if last is not None and value < last:
+            print(f"❌ {label} export is not in time order; rerun with --sort")
+            sys.exit(1)
+        last = value
+        yield record
+
+
+class AttemptWindow:
+    __slots__ = ('attempt', 'start', 'end', 'events', 'switches', 'recent', 'max_burst')
+
+    def __init__(self, attempt, start, end):
+        self.attempt = attempt
+        self.start = start
+        self.end = end
+        self.events = 0
+        self.switches = 0
+        self.recent = deque()
+        self.max_burst = 0
+
+
+def analyze(logs, attempts, event_type, window_ms, burst_threshold, sink):
+    """Sorted merge of log events into attempt windows; finished windows go to sink()"""
+    attempts = iter(attempts)
+    next_attempt = next(attempts, None)
+    active = defaultdict(list)      # studentId -> [AttemptWindow]
+    ending = []                     # heap of (end, sequence, AttemptWindow)
+    sequence = 0
+    peak_active = 0
+
+    def finish_until(t):
+        while ending and ending[0][0] < t:
+            _, _, window = heapq.heappop(ending)
+            windows = active[window.attempt['studentId']]
+            windows.remove(window)
+            if not windows:
+                del active[window.attempt['studentId']]
+            sink(window)
+
+    def admit_until(t):
+        nonlocal next_attempt, sequence, peak_active
+        while next_attempt is not None and to_millis(next_attempt.get('startedAt')) <= t:
+            start = to_millis(next_attempt.get('startedAt'))
+            end = to_millis(next_attempt.get('submittedAt'))
+            if end is not None and end >= start:
+                window = AttemptWindow(next_attempt, start, end)
+                active[next_attempt['studentId']].append(window)
+                heapq.heappush(ending, (end, sequence, window))
+                sequence += 1
+                peak_active = max(peak_active, len(ending))
+            next_attempt = next(attempts, None)
+
+    for log in logs:
+        t = to_millis(log.get('timestamp'))
+        admit_until(t)
+        finish_until(t)
+        for window in active.get(log.get('studentId'), ()):
+            if not window.start <= t <= window.end:
+                continue
+            window.events += 1
+            if log.get('eventType') != event_type:
+                continue
+            window.switches += 1
+            window.recent.append(t)
+            while window.recent[0] < t - window_ms:
+                window.recent.popleft()
+            window.max_burst = max(window.max_burst, len(window.recent))
+
+    admit_until(float('inf'))
+    finish_until(float('inf'))
+    return peak_active
+
+
+def outlier_threshold(counts, z):
+    """Smallest tab-switch count considered an outlier for one exam"""
+    median = statistics.median(counts)
+    mad = statistics.median(abs(c - median) for c in counts)
+    if mad == 0:
+        # Everyone (nearly) identical: flag clear excess only
+        return median + max(3, z)
+    return median + z * mad / 0.6745
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Streaming proctoring-event analysis for student_logs')
+    parser.add_argument('logs', help='student_logs export (NDJSON)')
+    parser.add_argument('attempts', help='exam_attempts export (NDJSON or CSV)')
+    parser.add_argument('--event', default='Tab Change', help='eventType counted as a tab switch')
+    parser.add_argument('--window', type=float, default=60, help='burst window in seconds')
+    parser.add_argument('--burst-threshold', type=int, default=3, help='switches within the window to flag')
+    parser.add_argument('--z', type=float, default=3.5, help='robust z-score for per-exam outliers')
+    parser.add_argument('--sort', action='store_true', help='sort the exports in memory first')
+    parser.add_argument('--output', default='proctoring_report.csv')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("Analyzing proctoring events")
+    print("=" * 80)
+
+    # Per-attempt rows go to a temporary file; only tab-switch counts per exam
+    # stay in memory for the outlier pass
+    counts_by_exam = defaultdict(list)
+    temp = tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.ndjson', delete=False)
+
+    def sink(window):
+        attempt = window.attempt
+        counts_by_exam[attempt.get('examId', '')].append(window.switches)
+        temp.write(json.dumps({
+            'attemptId': attempt.get('id', ''),
+            'examId': attempt.get('examId', ''),
+            'studentId': attempt.get('studentId', ''),
+            'studentName': attempt.get('studentName', ''),
+            'startedAt': window.start,
+            'submittedAt': window.end,
+            'events': window.events,
+            'tabSwitches': window.switches,
+            'maxBurst': window.max_burst,
+            'burst': window.max_burst >= args.burst_threshold,
+        }, ensure_ascii=False) + '\n')
+
+    print("\n[1/2] Merging logs into attempt windows...")
+    started = time.perf_counter()
+    logs = ordered(read_records(args.logs), lambda r: to_millis(r.get('timestamp')), args.sort, 'student_logs')
+    attempts = ordered(read_records(args.attempts), lambda r: to_millis(r.get('startedAt')), args.sort,
+                       'exam_attempts')
+    peak_active = analyze(logs, attempts, args.event, args.window * 1000, args.burst_threshold, sink)
+    temp.close()
+    attempt_count = sum(len(c) for c in counts_by_exam.values())
+    print(f"✅ {attempt_count:,} attempts in {time.perf_counter() - started:.2f}s "
+          f"(at most {peak_active:,} active at once)")
+
+    print(f"\n[2/2] Flagging outliers and writing {args.output}...")
+    thresholds = {exam_id: outlier_threshold(counts, args.z) for exam_id, counts in counts_by_exam.items()}
+    bursts = outliers = 0
+    with open(temp.name, 'r', encoding='utf-8') as src, open(args.output, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        for line in src:
+            row = json.loads(line)
+            row['outlier'] = row['tabSwitches'] > 0 and row['tabSwitches'] >= thresholds[row['examId']]
+            bursts += row['burst']
+            outliers += row['outlier']
+            writer.writerow(row)
+    os.unlink(temp.name)
+
+    print("\n" + "=" * 80)
+    print("✅ COMPLETE!")
+    print(f"📋 Attempts analyzed: {attempt_count:,} across {len(counts_by_exam):,} exams")
+    print(f"📋 Attempts with bursts: {bursts:,}")
+    print(f"📋 Per-exam outliers: {outliers:,}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 package com.onlineexamination.data.model
 
+import java.security.MessageDigest
+
 data class Exam(
     val id: String = "",
     val title: String = "",
@@ -22,6 +24,69 @@ data class Exam(
     val term: String = ""
 )
 
+// Listing fields of an Exam, stored in exam_summaries/{examId} without the questions.
+// Like Exam, isActive is stored as "active" by the Firestore mapper.
+data class ExamSummary(
+    val id: String = "",
+    val title: String = "",
+    val subject: String = "",
+    val gradeLevel: String = "",
+    val teacherId: String = "",
+    val teacherName: String = "",
+    val createdAt: Long = 0,
+    val startDate: Long = 0,
+    val endDate: Long = 0,
+    val startTime: String = "",
+    val endTime: String = "",
+    val isActive: Boolean = true,
+    val durationMinutes: Int = 60,
+    val totalPoints: Int = 100,
+    val passingScore: Int = 60,
+    val questionCount: Int = 0,
+    val term: String = ""
+)
+
+fun Exam.toSummary() = ExamSummary(
+    id = id,
+    title = title,
+    subject = subject,
+    gradeLevel = gradeLevel,
+    teacherId = teacherId,
+    teacherName = teacherName,
+    createdAt = createdAt,
+    startDate = startDate,
+    endDate = endDate,
+    startTime = startTime,
+    endTime = endTime,
+    isActive = isActive,
+    durationMinutes = durationMinutes,
+    totalPoints = totalPoints,
+    passingScore = passingScore,
+    questionCount = questions.size,
+    term = term
+)
+
+// An Exam for list screens; questions stay empty until the exam is opened with getExamById
+fun ExamSummary.toExam() = Exam(
+    id = id,
+    title = title,
+    subject = subject,
+    gradeLevel = gradeLevel,
+    teacherId = teacherId,
+    teacherName = teacherName,
+    createdAt = createdAt,
+    startDate = startDate,
+    endDate = endDate,
+    startTime = startTime,
+    endTime = endTime,
+    isActive = isActive,
+    durationMinutes = durationMinutes,
+    totalPoints = totalPoints,
+    passingScore = passingScore,
+    questionCount = questionCount,
+    term = term
+)
+
 data class Question(
     val id: String = "",
     val questionText: String = "",
@@ -80,3 +145,97 @@ data class QuestionResult(
     val points: Int = 0,
     val maxPoints: Int = 10
 )
+
+// Materialized ExamResult, stored in exam_results/{attemptId} by submitExamAttempt and
+// materialize-exam-results.py. Question text and correct answer are not copied; they are
+// taken from the Exam, and answerKeyVersion tells whether the Exam still grades the same way.
+// The flags are named passed/correct, not isPassed/isCorrect: Firestore's class mapper stores an
+// "is" property under the name without the prefix, so this is the key on disk either way
+data class StoredExamResult(
+    val attemptId: String = "",
+    val examId: String = "",
+    val examTitle: String = "",
+    val studentId: String = "",
+    val studentName: String = "",
+    val score: Int = 0,
+    val totalPoints: Int = 100,
+    val percentage: Double = 0.0,
+    val passed: Boolean = false,
+    val submittedAt: Long = 0,
+    val timeSpentMinutes: Int = 0,
+    val answerKeyVersion: String = "",
+    val questionResults: List<StoredQuestionResult> = emptyList()
+)
+
+data class StoredQuestionResult(
+    val questionId: String = "",
+    val studentAnswer: String = "",
+    val correct: Boolean = false,
+    val points: Int = 0,
+    val maxPoints: Int = 10
+)
+
+// Hash of everything grading depends on (question ids, normalized correct answers, points).
+// materialize-exam-results.py computes the same value
+fun Exam.answerKeyVersion(): String {
+    val key = questions.joinToString("\u001e") { question ->
+        "${question.id}\u001f${question.correctAnswer.trim().lowercase()}\u001f${question.points}"
+    }
+    return MessageDigest.getInstance("SHA-256")
+        .digest(key.toByteArray(Charsets.UTF_8))
+        .joinToString("") { "%02x".format(it) }
+        .take(16)
+}
+
+fun ExamResult.toStored(exam: Exam) = StoredExamResult(
+    attemptId = attemptId,
+    examId = examId,
+    examTitle = examTitle,
+    studentId = studentId,
+    studentName = studentName,
+    score = score,
+    totalPoints = totalPoints,
+    percentage = percentage,
+    passed = isPassed,
+    submittedAt = submittedAt,
+    timeSpentMinutes = timeSpentMinutes,
+    answerKeyVersion = exam.answerKeyVersion(),
+    questionResults = questionResults.map {
+        StoredQuestionResult(
+            questionId = it.questionId,
+            studentAnswer = it.studentAnswer,
+            correct = it.isCorrect,
+            points = it.points,
+            maxPoints = it.maxPoints
+        )
+    }
+)
+
+fun StoredExamResult.toExamResult(exam: Exam): ExamResult {
+    val questionsById = exam.questions.associateBy { it.id }
+    return ExamResult(
+        attemptId = attemptId,
+        examId = examId,
+        examTitle = examTitle,
+        studentId = studentId,
+        studentName = studentName,
+        score = score,
+        totalPoints = totalPoints,
+        percentage = percentage,
+        isPassed = passed,
+        submittedAt = submittedAt,
+        timeSpentMinutes = timeSpentMinutes,
+        questionResults = questionResults.map {
+            val question = questionsById[it.questionId]
+            QuestionResult(
+                questionId = it.questionId,
+                questionText = question?.questionText ?: "",
+                studentAnswer = it.studentAnswer,
+                correctAnswer = question?.correctAnswer ?: "",
+                isCorrect = it.correct,
+                points = it.points,
+                maxPoints = it.maxPoints
+            )
+        }
+    )
+}
@@ -2,12 +2,16 @@ package com.onlineexamination.data.repository
 
 import com.google.firebase.auth.FirebaseAuth
 import com.google.firebase.auth.FirebaseUser
+import com.google.firebase.firestore.FieldValue
 import com.google.firebase.firestore.FirebaseFirestore
+import com.google.firebase.firestore.SetOptions
+import com.google.firebase.messaging.FirebaseMessaging
 import com.onlineexamination.data.model.StudentInfo
 import com.onlineexamination.data.model.TeacherInfo
 import com.onlineexamination.data.model.User
 import com.onlineexamination.data.model.UserRole
 import kotlinx.coroutines.tasks.await
+import java.util.zip.CRC32
 
 class AuthRepository {
     private val auth = FirebaseAuth.getInstance()
@@ -57,12 +61,50 @@ class AuthRepository {
             if (!user.isEmailVerified) {
                 throw Exception("Please verify your email before signing in.")
             }
+            // New sign-ups get their first token here, after email verification
+            try {
+                updateFcmToken(user.uid, FirebaseMessaging.getInstance().token.await())
+            } catch (e: Exception) {
+                println("Failed to register FCM token: ${e.message}")
+            }
             Result.success(user)
         } catch (e: Exception) {
             Result.failure(e)
         }
     }
 
+    /**
+     * Store the device token on the user and in the user's grade_tokens shard, so the
+     * index read by ExamRepository.getStudentTokensByGrade doesn't go stale between
+     * build-grade-tokens.py runs. The uid is removed from every other grade's shard, so
+     * a student whose grade changed stops getting the old grade's notifications. Grades
+     * without an index document are skipped; they are still served by the live users query.
+     */
+    suspend fun updateFcmToken(uid: String, token: String): Result<Unit> {
+        return try {
+            val userRef = firestore.collection("users").document(uid)
+            val batch = firestore.batch()
+                .update(userRef, mapOf("fcmToken" to token, "fcmTokenUpdatedAt" to System.currentTimeMillis()))
+
+            val profile = userRef.collection("profiles").document("student").get().await()
+            val gradeLevel = profile.getString("gradeLevelToEnroll") ?: ""
+            // Same placement as build-grade-tokens.py: crc32(uid) % shardCount
+            val crc = CRC32().apply { update(uid.toByteArray(Charsets.UTF_8)) }.value
+            val indexDocs = firestore.collection("grade_tokens").get().await()
+            for (indexDoc in indexDocs.documents) {
+                val shardCount = indexDoc.getLong("shardCount") ?: 0L
+                if (shardCount <= 0) continue
+                val shardRef = indexDoc.reference.collection("shards").document((crc % shardCount).toString())
+                val value: Any = if (indexDoc.id == gradeLevel) token else FieldValue.delete()
+                batch.set(shardRef, mapOf("tokens" to mapOf(uid to value)), SetOptions.merge())
+            }
+            batch.commit().await()
+            Result.success(Unit)
+        } catch (e: Exception) {
+            Result.failure(e)
+        }
+    }
+
     suspend fun sendPasswordResetEmail(email: String): Result<Unit> {
         return try {
             auth.sendPasswordResetEmail(email).await()
@@ -7,6 +7,13 @@ import com.google.firebase.functions.FirebaseFunctions
 import com.onlineexamination.data.model.Exam
 import com.onlineexamination.data.model.ExamAttempt
 import com.onlineexamination.data.model.ExamResult
+import com.onlineexamination.data.model.ExamSummary
+import com.onlineexamination.data.model.StoredExamResult
+import com.onlineexamination.data.model.answerKeyVersion
+import com.onlineexamination.data.model.toExam
+import com.onlineexamination.data.model.toExamResult
+import com.onlineexamination.data.model.toStored
+import com.onlineexamination.data.model.toSummary
 import kotlinx.coroutines.tasks.await
 
 class ExamRepository {
@@ -16,12 +23,19 @@ class ExamRepository {
     private val examsCollection = firestore.collection("exams")
     private val attemptsCollection = firestore.collection("exam_attempts")
     private val usersCollection = firestore.collection("users")
+    private val gradeTokensCollection = firestore.collection("grade_tokens")
+    private val examSummariesCollection = firestore.collection("exam_summaries")
+    private val examResultsCollection = firestore.collection("exam_results")
 
     suspend fun createExam(exam: Exam): Result<String> {
         return try {
             val docRef = examsCollection.document()
             val examWithQuestionCount = exam.copy(id = docRef.id, questionCount = exam.questions.size)
-            docRef.set(examWithQuestionCount).await()
+            firestore.batch()
+                .set(docRef, examWithQuestionCount)
+                .set(examSummariesCollection.document(docRef.id), examWithQuestionCount.toSummary())
+                .commit()
+                .await()
 
             // After creating the exam, send notifications in a separate try-catch block
             try {
@@ -50,6 +64,17 @@ class ExamRepository {
 
     suspend fun getStudentTokensByGrade(gradeLevel: String): Result<List<String>> {
         return try {
+            // Prefer the grade_tokens index (built by build-grade-tokens.py, kept current by
+            // AuthRepository.updateFcmToken); one query per grade
+            val indexDoc = gradeTokensCollection.document(gradeLevel).get().await()
+            if (indexDoc.exists()) {
+                val shards = indexDoc.reference.collection("shards").get().await()
+                val tokens = shards.documents.flatMap { shard ->
+                    (shard.get("tokens") as? Map<*, *>)?.values?.filterIsInstance<String>() ?: emptyList()
+                }.distinct()
+                return Result.success(tokens)
+            }
+
             val studentQuery = usersCollection
                 .whereEqualTo("role", "STUDENT")
                 .get()
@@ -98,15 +123,16 @@ class ExamRepository {
             }
 
             val now = System.currentTimeMillis()
+            // Exam.isActive is stored as "active"
             val gradeSpecificQuery = examsCollection
-                .whereEqualTo("isActive", true)
+                .whereEqualTo("active", true)
                 .whereGreaterThanOrEqualTo("endDate", now)
                 .whereEqualTo("gradeLevel", gradeLevel)
                 .get()
                 .await()
 
             val allGradesQuery = examsCollection
-                .whereEqualTo("isActive", true)
+                .whereEqualTo("active", true)
                 .whereGreaterThanOrEqualTo("endDate", now)
                 .whereEqualTo("gradeLevel", "")
                 .get()
@@ -125,16 +151,16 @@ class ExamRepository {
         }
     }
 
-    // Get exams by teacher
+    // Get exams by teacher (listing fields only, from exam_summaries)
     suspend fun getExamsByTeacher(teacherId: String): Result<List<Exam>> {
         return try {
-            val snapshot = examsCollection
+            val snapshot = examSummariesCollection
                 .whereEqualTo("teacherId", teacherId)
                 .orderBy("createdAt", Query.Direction.DESCENDING)
                 .get()
                 .await()
             
-            val exams = snapshot.documents.mapNotNull { it.toObject(Exam::class.java) }
+            val exams = snapshot.documents.mapNotNull { it.toObject(ExamSummary::class.java)?.toExam() }
             Result.success(exams)
         } catch (e: Exception) {
             Result.failure(e)
@@ -145,7 +171,11 @@ class ExamRepository {
     suspend fun updateExam(exam: Exam): Result<Unit> {
         return try {
             val examWithQuestionCount = exam.copy(questionCount = exam.questions.size)
-            examsCollection.document(exam.id).set(examWithQuestionCount).await()
+            firestore.batch()
+                .set(examsCollection.document(exam.id), examWithQuestionCount)
+                .set(examSummariesCollection.document(exam.id), examWithQuestionCount.toSummary())
+                .commit()
+                .await()
             Result.success(Unit)
         } catch (e: Exception) {
             Result.failure(e)
@@ -155,7 +185,11 @@ class ExamRepository {
     // Delete exam
     suspend fun deleteExam(examId: String): Result<Unit> {
         return try {
-            examsCollection.document(examId).delete().await()
+            firestore.batch()
+                .delete(examsCollection.document(examId))
+                .delete(examSummariesCollection.document(examId))
+                .commit()
+                .await()
             Result.success(Unit)
         } catch (e: Exception) {
             Result.failure(e)
@@ -210,35 +244,37 @@ class ExamRepository {
                 examTitle = exam.title
             )
             
-            // Use a transaction to save the attempt and update user stats atomically
-            val attemptId = firestore.runTransaction { transaction ->
+            // Use a transaction to save the attempt, its result and update user stats atomically
+            val result = firestore.runTransaction { transaction ->
                 // Save attempt
                 val docRef = attemptsCollection.document()
                 val attemptWithId = submittedAttempt.copy(id = docRef.id)
                 transaction.set(docRef, attemptWithId)
+
+                // Save the result so ResultDetailScreen reads it instead of re-grading
+                val examResult = ExamResult(
+                    attemptId = docRef.id,
+                    examId = exam.id,
+                    examTitle = exam.title,
+                    studentId = attempt.studentId,
+                    studentName = attempt.studentName,
+                    score = totalScore,
+                    totalPoints = exam.totalPoints,
+                    percentage = percentage,
+                    isPassed = isPassed,
+                    submittedAt = submittedAttempt.submittedAt ?: System.currentTimeMillis(),
+                    timeSpentMinutes = attempt.timeSpentMinutes,
+                    questionResults = questionResults
+                )
+                transaction.set(examResultsCollection.document(docRef.id), examResult.toStored(exam))
                 
                 // Update user stats for leaderboard
                 val userRef = usersCollection.document(attempt.studentId)
                 transaction.update(userRef, "totalScore", FieldValue.increment(totalScore.toLong()))
                 transaction.update(userRef, "examsTaken", FieldValue.increment(1))
                 
-                docRef.id // Return the ID to be used outside
+                examResult // Return the result to be used outside
             }.await()
-
-            val result = ExamResult(
-                attemptId = attemptId,
-                examId = exam.id,
-                examTitle = exam.title,
-                studentId = attempt.studentId,
-                studentName = attempt.studentName,
-                score = totalScore,
-                totalPoints = exam.totalPoints,
-                percentage = percentage,
-                isPassed = isPassed,
-                submittedAt = System.currentTimeMillis(),
-                timeSpentMinutes = attempt.timeSpentMinutes,
-                questionResults = questionResults
-            )
             
             Result.success(result)
         } catch (e: Exception) {
@@ -284,6 +320,13 @@ class ExamRepository {
     // Get result by attempt ID
     suspend fun getResultByAttemptId(attemptId: String, exam: Exam): Result<ExamResult> {
         return try {
+            // Materialized result (one read); re-grade only if it is missing or the answer key changed
+            val stored = examResultsCollection.document(attemptId).get().await()
+                .toObject(StoredExamResult::class.java)
+            if (stored != null && stored.answerKeyVersion == exam.answerKeyVersion()) {
+                return Result.success(stored.toExamResult(exam))
+            }
+
             val attemptDoc = attemptsCollection.document(attemptId).get().await()
             val attempt = attemptDoc.toObject(ExamAttempt::class.java)
                 ?: return Result.failure(Exception("Attempt not found"))
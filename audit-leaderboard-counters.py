@@ -0,0 +1,275 @@
+"""
+Audit the users.totalScore / users.examsTaken leaderboard counters
+
+submitExamAttempt maintains both counters with FieldValue.increment. Nothing
+ever recomputes them, so they drift: deleteExam leaves the points of its
+attempts on the students, retried transactions and manual fixes can count an
+attempt twice, and re-grades change scores after the fact. This script
+recomputes the counters from the attempts and emits only the corrections:
+
+    expected totalScore  = sum of score of the student's submitted attempts
+    expected examsTaken  = number of the student's submitted attempts
+
+With --exams, attempts whose exam no longer exists are not counted.
+
+The check is a hash join. The build side streams the attempts export once
+into per-student (totalScore, examsTaken) aggregates held in two integer
+arrays indexed through a studentId dictionary, so memory is proportional to
+the number of students, not attempts. The probe side streams the users
+export and compares each user's stored counters with the aggregate.
+
+Corrections are FieldValue.increment deltas rather than absolute values, so
+submissions that land while they are applied are not overwritten. Take the
+attempts and users exports at the same time; submissions between the two
+exports show up as drift.
+
+Increments are not idempotent, so every corrected user also gets
+counterAuditId = <hash of the delta set> in the same write. --apply skips users
+that already carry the id, so re-running it after a partial failure (same
+exports, same deltas) only applies what is missing. Fresh exports produce a
+new delta set and id.
+
+Export format:
+    attempts  NDJSON or CSV (studentId, score, submittedAt)
+    users     NDJSON (User documents, "uid" or "id")
+    exams     NDJSON (optional; only "id" is used)
+
+Requirements:
+    pip install google-cloud-firestore   (only for --apply)
+
+Usage:
+    python audit-leaderboard-counters.py <attempts.ndjson|csv> <users.ndjson>
+                                         [--exams exams.ndjson]
+                                         [--output counter_deltas.ndjson]
+                                         [--apply] [--project ID] [--emulator HOST:PORT]
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from array import array
+from pathlib import Path
+
+try:
+    import resource  # POSIX only; used for the peak memory line
+except ImportError:
+    resource = None
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_PROJECT = 'online-examination-8372d'
+MAX_BATCH_WRITES = 500
+GET_ALL_CHUNK = 100
+# Written with every correction: the id of the delta set it belongs to
+MARKER_FIELD = 'counterAuditId'
+
+
+def read_records(path):
+    """Yield documents from an NDJSON, JSON array or CSV export"""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.suffix.lower() == '.csv':
+            for row in csv.DictReader(f):
+                for key in ('score', 'totalScore', 'examsTaken'):
+                    if row.get(key) not in (None, ''):
+                        row[key] = int(row[key])
+                if row.get('submittedAt') in (None, ''):
+                    row['submittedAt'] = None
+                yield row
+        elif path.suffix.lower() == '.json':
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class StudentTotals:
+    """Per-student (totalScore, examsTaken) aggregates: studentId -> slot in two int64 arrays"""
+
+    def __init__(self):
+        self.slots = {}
+        self.scores = array('q')
+        self.counts = array('q')
+
+    def add(self, student_id, score):
+        slot = self.slots.get(student_id)
+        if slot is None:
+            slot = self.slots[student_id] = len(self.scores)
+            self.scores.append(0)
+            self.counts.append(0)
+        self.scores[slot] += score
+        self.counts[slot] += 1
+
+    def get(self, student_id):
+        slot = self.slots.get(student_id)
+        if slot is None:
+            return None, 0, 0
+        return slot, self.scores[slot], self.counts[slot]
+
+    def __len__(self):
+        return len(self.scores)
+
+
+def build(attempts_path, exam_ids):
+    """Build side: aggregate the submitted attempts per studentId"""
+    totals = StudentTotals()
+    counted = ignored = 0
+    for attempt in read_records(attempts_path):
+        if attempt.get('submittedAt') is None or not attempt.get('studentId'):
+            continue
+        if exam_ids is not None and attempt.get('examId') not in exam_ids:
+            ignored += 1
+            continue
+        totals.add(attempt['studentId'], int(attempt.get('score') or 0))
+        counted += 1
+    return totals, counted, ignored
+
+
+def probe(users_path, totals):
+    """Probe side: yield (uid, totalScore delta, examsTaken delta) for users whose counters drifted"""
+    matched = bytearray(len(totals))
+    for user in read_records(users_path):
+        uid = user.get('uid') or user.get('id')
+        if not uid:
+            continue
+        slot, score, count = totals.get(uid)
+        if slot is not None:
+            matched[slot] = 1
+        score_delta = score - int(user.get('totalScore') or 0)
+        count_delta = count - int(user.get('examsTaken') or 0)
+        if score_delta or count_delta:
+            yield uid, score_delta, count_delta
+    # Students with attempts but no user document cannot be corrected; report them
+    for student_id, slot in totals.slots.items():
+        if not matched[slot]:
+            yield student_id, None, None
+
+
+def firestore_client(project, emulator):
+    if emulator:
+        os.environ['FIRESTORE_EMULATOR_HOST'] = emulator
+    from google.cloud import firestore
+    return firestore.Client(project=project)
+
+
+def delta_set_id(deltas):
+    """Stable id of a delta set: the same exports give the same id"""
+    digest = hashlib.sha1()
+    for delta in sorted(deltas, key=lambda d: d['path']):
+        digest.update(json.dumps(delta, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def already_applied(client, deltas, audit_id):
+    """Paths whose user document already carries this delta set's marker"""
+    applied = set()
+    for start in range(0, len(deltas), GET_ALL_CHUNK):
+        refs = [client.document(d['path']) for d in deltas[start:start + GET_ALL_CHUNK]]
+        for snap in client.get_all(refs, field_paths=[MARKER_FIELD]):
+            if snap.exists and (snap.to_dict() or {}).get(MARKER_FIELD) == audit_id:
+                applied.add(snap.reference.path)
+    return applied
+
+
+def apply_deltas(client, deltas, audit_id):
+    """Commit the increments (with the marker) in batches of MAX_BATCH_WRITES; returns (batches, skipped)"""
+    from google.cloud import firestore
+
+    applied = already_applied(client, deltas, audit_id)
+    pending = [d for d in deltas if d['path'] not in applied]
+    batches = 0
+    for start in range(0, len(pending), MAX_BATCH_WRITES):
+        batch = client.batch()
+        for delta in pending[start:start + MAX_BATCH_WRITES]:
+            fields = {k: firestore.Increment(v) for k, v in delta['fields'].items()}
+            fields[MARKER_FIELD] = audit_id
+            batch.update(client.document(delta['path']), fields)
+        batch.commit()
+        batches += 1
+    return batches, len(applied)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconcile leaderboard counters with exam attempts')
+    parser.add_argument('attempts', help='exam_attempts export (NDJSON or CSV)')
+    parser.add_argument('users', help='users export (NDJSON)')
+    parser.add_argument('--exams', help='exams export; attempts of missing exams are not counted')
+    parser.add_argument('--output', default='counter_deltas.ndjson')
+    parser.add_argument('--apply', action='store_true', help='write the corrections to Firestore')
+    parser.add_argument('--project', default=DEFAULT_PROJECT)
+    parser.add_argument('--emulator', help='Firestore emulator host, e.g. localhost:8080')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("Auditing leaderboard counters")
+    print("=" * 80)
+
+    exam_ids = None
+    if args.exams:
+        exam_ids = {e['id'] for e in read_records(args.exams)}
+        print(f"\n📋 {len(exam_ids):,} existing exams")
+
+    print("\n[1/3] Aggregating attempts per student...")
+    started = time.perf_counter()
+    totals, counted, ignored = build(args.attempts, exam_ids)
+    seconds = time.perf_counter() - started
+    print(f"✅ {counted:,} attempts of {len(totals):,} students in {seconds:.2f}s")
+    if ignored:
+        print(f"📋 {ignored:,} attempts of deleted exams not counted")
+
+    print("\n[2/3] Joining with users...")
+    started = time.perf_counter()
+    deltas = []
+    orphans = 0
+    score_drift = count_drift = 0
+    for uid, score_delta, count_delta in probe(args.users, totals):
+        if score_delta is None:
+            orphans += 1
+            continue
+        fields = {}
+        if score_delta:
+            fields['totalScore'] = score_delta
+            score_drift += abs(score_delta)
+        if count_delta:
+            fields['examsTaken'] = count_delta
+            count_drift += abs(count_delta)
+        deltas.append({'op': 'increment', 'path': f'users/{uid}', 'fields': fields})
+    seconds = time.perf_counter() - started
+    if resource is not None:
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"✅ Joined in {seconds:.2f}s (peak memory {peak_mb:,.0f} MB)")
+    else:
+        print(f"✅ Joined in {seconds:.2f}s")
+    print(f"📋 Users to correct: {len(deltas):,}")
+    print(f"📋 Total drift: {score_drift:,} points, {count_drift:,} exams")
+    if orphans:
+        print(f"⚠️  {orphans:,} students have attempts but no user document")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        for delta in deltas:
+            f.write(json.dumps(delta) + '\n')
+    audit_id = delta_set_id(deltas)
+    print(f"✅ Deltas written to {args.output} (delta set {audit_id})")
+
+    print("\n[3/3] Firestore...")
+    if args.apply:
+        client = firestore_client(args.project, args.emulator)
+        batches, skipped = apply_deltas(client, deltas, audit_id)
+        print(f"✅ Applied {len(deltas) - skipped:,} corrections in {batches:,} batches")
+        if skipped:
+            print(f"📋 {skipped:,} users already had delta set {audit_id} (earlier partial run)")
+    else:
+        print("📋 Dry run, use --apply to write the corrections")
+
+    print("\n" + "=" * 80)
+    print("✅ COMPLETE!")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
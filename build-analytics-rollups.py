@@ -0,0 +1,407 @@
+"""
+Incrementally maintain per-exam and per-teacher analytics rollups
+
+AnalyticsScreen, TeacherAnalyticsScreen and ItemAnalysisScreen recompute
+everything from raw exam_attempts each time they open. This job keeps the
+aggregates materialized:
+
+    analytics_exams/{examId}         submissions, passed, scoreSum, percentageSum,
+                                     histogram (the TeacherAnalyticsScreen buckets),
+                                     questionCorrect {questionId: n},
+                                     optionCounts {questionId: {optionIndex: n}},
+                                     watermark (latest submittedAt folded in)
+    analytics_teachers/{teacherId}   submissions, passed, scoreSum, percentageSum,
+                                     histogram, examIds, watermark
+    analytics_state/rollups          watermark + watermarkIds (+ idsFrom) for the next run
+
+averageScore is percentageSum / submissions and passRate is
+passed / submissions * 100, exactly as the screens compute them (an
+attempt counts as passed by its "passed" field, which is how Firestore
+stores ExamAttempt.isPassed). Correct
+answers are counted like AnalyticsRepository.getItemAnalysis (equals with
+ignoreCase, no trim) and options by exact match.
+
+Every run reads only attempts with submittedAt >= watermark - --lookback
+(one query ordered by submittedAt) and skips the ids it already folded, so
+attempts written late by a device with a slow clock are still picked up.
+submittedAt is the device clock, so one phone with a fast clock could push
+the watermark into the future and hide every real attempt after it: the
+watermark never moves past the start of the run. A future-dated attempt is
+folded once and its id stays in watermarkIds until its submittedAt falls
+out of the lookback window. watermarkIds is rewritten with every chunk, so it
+keeps at most MAX_WATERMARK_IDS ids (a few hundred KB): in a burst the oldest
+ids are dropped and idsFrom moves past them, i.e. the next run looks back
+less far instead of folding those attempts again.
+All aggregates are additive: new attempts are merged with Increment
+transforms, so the stored rollups are never read back. A run with no new
+submissions costs the state read plus one (empty) query. --verify
+recomputes everything from all attempts and compares.
+
+Offline mode (--attempts) runs the same fold over an export and keeps the
+rollups in a --state JSON file instead of Firestore.
+
+Requirements:
+    pip install google-cloud-firestore   (not needed in offline mode)
+
+Usage:
+    python build-analytics-rollups.py [--project ID] [--emulator HOST:PORT]
+                                      [--lookback SECONDS] [--verify] [--dry-run]
+    python build-analytics-rollups.py --attempts <attempts.ndjson> --exams <exams.ndjson>
+                                      --state rollups.json [--lookback SECONDS]
+                                      [--verify FULL_EXPORT]
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_PROJECT = 'online-examination-8372d'
+MAX_BATCH_WRITES = 500
+STATE_DOCUMENT = 'analytics_state/rollups'
+# Keeps analytics_state/rollups far below the 1 MiB document limit
+MAX_WATERMARK_IDS = 10_000
+
+
+def read_records(path):
+    """Yield documents from an NDJSON, JSON array or CSV export"""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.suffix.lower() == '.csv':
+            for row in csv.DictReader(f):
+                if row.get('answers'):
+                    row['answers'] = json.loads(row['answers'])
+                for field in ('submittedAt', 'score'):
+                    if row.get(field):
+                        row[field] = int(row[field])
+                if row.get('percentage'):
+                    row['percentage'] = float(row['percentage'])
+                for field in ('passed', 'isPassed'):
+                    if field in row:
+                        row[field] = row[field] in ('True', 'true', '1')
+                yield row
+        elif path.suffix.lower() == '.json':
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def histogram_bucket(percentage):
+    if percentage >= 90:
+        return '90-100%'
+    if percentage >= 80:
+        return '80-89%'
+    if percentage >= 70:
+        return '70-79%'
+    if percentage >= 60:
+        return '60-69%'
+    return '<60%'
+
+
+def attempt_passed(attempt):
+    """ExamAttempt.isPassed, stored as "passed" by the app (older exports: "isPassed")"""
+    return bool(attempt.get('passed', attempt.get('isPassed', False)))
+
+
+def empty_rollup():
+    return {'submissions': 0, 'passed': 0, 'scoreSum': 0, 'percentageSum': 0.0,
+            'histogram': {}, 'watermark': 0}
+
+
+def fold(attempts, exams, watermark, watermark_ids, lookback_ms, now=None, ids_from=0):
+    """
+    Aggregate the attempts that are new since the last run.
+    watermarkIds maps the ids already folded within the lookback window to their
+    submittedAt; attempts before ids_from are never re-read because their ids
+    were dropped from it. The watermark is clamped to now (epoch millis, the run start).
+    Returns (exam deltas, teacher deltas, watermark, watermarkIds, idsFrom, folded).
+    """
+    if now is None:
+        now = int(time.time() * 1000)
+    since = max(watermark - lookback_ms, ids_from)
+    exam_deltas = defaultdict(lambda: {**empty_rollup(), 'questionCorrect': defaultdict(int),
+                                       'optionCounts': defaultdict(lambda: defaultdict(int))})
+    teacher_deltas = defaultdict(lambda: {**empty_rollup(), 'examIds': set()})
+    recent = {}
+    new_watermark = watermark
+    folded = 0
+    for attempt in attempts:
+        submitted_at = attempt.get('submittedAt')
+        if not submitted_at or submitted_at < since:
+            continue
+        attempt_id = attempt.get('id')
+        if attempt_id in watermark_ids:
+            continue
+        recent[attempt_id] = submitted_at
+        new_watermark = max(new_watermark, min(submitted_at, now))
+        folded += 1
+
+        exam_id = attempt.get('examId', '')
+        percentage = float(attempt.get('percentage') or 0)
+        bucket = histogram_bucket(percentage)
+        teacher_delta = teacher_deltas[attempt.get('teacherId', '')]
+        teacher_delta['examIds'].add(exam_id)
+        exam_delta = exam_deltas[exam_id]
+        for delta in (exam_delta, teacher_delta):
+            delta['submissions'] += 1
+            delta['passed'] += attempt_passed(attempt)
+            delta['scoreSum'] += int(attempt.get('score') or 0)
+            delta['percentageSum'] += percentage
+            delta['histogram'][bucket] = delta['histogram'].get(bucket, 0) + 1
+            delta['watermark'] = max(delta['watermark'], submitted_at)
+
+        answers = attempt.get('answers') or {}
+        for question in exams.get(exam_id, {}).get('questions') or []:
+            answer = answers.get(question['id'])
+            if answer is None:
+                continue
+            if answer.lower() == str(question.get('correctAnswer', '')).lower():
+                exam_delta['questionCorrect'][question['id']] += 1
+            options = question.get('options') or []
+            if answer in options:
+                exam_delta['optionCounts'][question['id']][str(options.index(answer))] += 1
+
+    # Remember every id inside the lookback window of the new watermark
+    cutoff = new_watermark - lookback_ms
+    new_ids = {i: t for i, t in watermark_ids.items() if t >= cutoff}
+    new_ids.update((i, t) for i, t in recent.items() if t >= cutoff)
+    if len(new_ids) > MAX_WATERMARK_IDS:
+        # Drop whole timestamps, oldest first, so everything before idsFrom is known
+        ids_from = sorted(new_ids.values(), reverse=True)[MAX_WATERMARK_IDS] + 1
+        new_ids = {i: t for i, t in new_ids.items() if t >= ids_from}
+    return exam_deltas, teacher_deltas, new_watermark, new_ids, ids_from, folded
+
+
+def plain(value):
+    """defaultdicts / sets -> JSON-friendly dicts and sorted lists"""
+    if isinstance(value, dict):
+        return {k: plain(v) for k, v in value.items()}
+    if isinstance(value, set):
+        return sorted(value)
+    return value
+
+
+def merge(stored, delta):
+    """Add a delta into a stored rollup (offline mode and --verify)"""
+    for key, value in delta.items():
+        if key == 'watermark':
+            stored[key] = max(stored.get(key, 0), value)
+        elif key == 'examIds':
+            stored[key] = sorted(set(stored.get(key, [])) | set(value))
+        elif isinstance(value, dict):
+            merge(stored.setdefault(key, {}), value)
+        else:
+            stored[key] = stored.get(key, 0) + value
+    return stored
+
+
+def to_transforms(delta, firestore):
+    """A delta as a set(merge=True) payload of Increment / ArrayUnion transforms"""
+    payload = {}
+    for key, value in delta.items():
+        if key == 'watermark':
+            payload[key] = firestore.Maximum(value)
+        elif key == 'examIds':
+            payload[key] = firestore.ArrayUnion(sorted(value))
+        elif isinstance(value, dict):
+            payload[key] = to_transforms(value, firestore)
+        elif value:
+            payload[key] = firestore.Increment(value)
+    return payload
+
+
+def same(a, b, path=''):
+    """Compare two rollups; floats with a tolerance. Returns the first difference or None"""
+    if isinstance(a, dict) or isinstance(b, dict):
+        a, b = a or {}, b or {}
+        for key in set(a) | set(b):
+            # Zero counters may be absent on one side
+            difference = same(a.get(key, 0), b.get(key, 0), f'{path}.{key}')
+            if difference:
+                return difference
+        return None
+    if isinstance(a, list) or isinstance(b, list):
+        return None if sorted(a or []) == sorted(b or []) else f'{path}: {a} != {b}'
+    if isinstance(a, float) or isinstance(b, float):
+        return None if math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6) else f'{path}: {a} != {b}'
+    return None if a == b else f'{path}: {a} != {b}'
+
+
+def full_recompute(attempts, exams):
+    exam_deltas, teacher_deltas, *_ = fold(attempts, exams, 0, {}, 0)
+    return ({k: plain(v) for k, v in exam_deltas.items()},
+            {k: plain(v) for k, v in teacher_deltas.items()})
+
+
+def verify(stored_exams, stored_teachers, expected_exams, expected_teachers):
+    mismatches = 0
+    for label, stored, expected in (('exam', stored_exams, expected_exams),
+                                    ('teacher', stored_teachers, expected_teachers)):
+        for key in set(stored) | set(expected):
+            difference = same(stored.get(key), expected.get(key))
+            if difference:
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f"  ❌ {label} {key}{difference}")
+    return mismatches
+
+
+def chunks(attempts, max_documents):
+    """Split attempts so that each part touches at most max_documents exam + teacher rollups"""
+    chunk, exams, teachers = [], set(), set()
+    for attempt in attempts:
+        exam_id, teacher_id = attempt.get('examId', ''), attempt.get('teacherId', '')
+        grows = (exam_id not in exams) + (teacher_id not in teachers)
+        if chunk and len(exams) + len(teachers) + grows > max_documents:
+            yield chunk
+            chunk, exams, teachers = [], set(), set()
+        chunk.append(attempt)
+        exams.add(exam_id)
+        teachers.add(teacher_id)
+    if chunk:
+        yield chunk
+
+
+def run_offline(args):
+    exams = {e['id']: e for e in read_records(args.exams)}
+    state = {'watermark': 0, 'watermarkIds': {}, 'idsFrom': 0, 'exams': {}, 'teachers': {}}
+    if Path(args.state).exists():
+        with open(args.state, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    ids_from = state.get('idsFrom', 0)
+    if state['watermark']:
+        print(f"📋 Incremental run from submittedAt >= {max(state['watermark'] - args.lookback * 1000, ids_from)}")
+
+    print(f"\n[1/2] Folding new attempts from {args.attempts}...")
+    started = time.perf_counter()
+    exam_deltas, teacher_deltas, watermark, watermark_ids, ids_from, folded = fold(
+        read_records(args.attempts), exams, state['watermark'], state['watermarkIds'], args.lookback * 1000,
+        int(time.time() * 1000), ids_from)
+    for exam_id, delta in exam_deltas.items():
+        merge(state['exams'].setdefault(exam_id, {}), plain(delta))
+    for teacher_id, delta in teacher_deltas.items():
+        merge(state['teachers'].setdefault(teacher_id, {}), plain(delta))
+    state['watermark'], state['watermarkIds'], state['idsFrom'] = watermark, watermark_ids, ids_from
+    print(f"✅ {folded:,} new attempts into {len(exam_deltas):,} exams / {len(teacher_deltas):,} teachers "
+          f"in {time.perf_counter() - started:.2f}s")
+
+    tmp = Path(str(args.state) + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, args.state)
+
+    print("\n[2/2] Verifying...")
+    if not args.verify:
+        print("📋 Skipped (give --verify FULL_EXPORT)")
+        return 0
+    expected_exams, expected_teachers = full_recompute(read_records(args.verify), exams)
+    return verify(state['exams'], state['teachers'], expected_exams, expected_teachers)
+
+
+def run_firestore(args):
+    if args.emulator:
+        os.environ['FIRESTORE_EMULATOR_HOST'] = args.emulator
+    from google.cloud import firestore
+    client = firestore.Client(project=args.project)
+    reads = 0
+    run_started = int(time.time() * 1000)
+
+    state_ref = client.document(STATE_DOCUMENT)
+    snap = state_ref.get()
+    reads += 1
+    state = snap.to_dict() if snap.exists else {'watermark': 0, 'watermarkIds': {}}
+    ids_from = state.get('idsFrom', 0)
+    since = max(state['watermark'] - args.lookback * 1000, ids_from)
+
+    print(f"\n[1/2] Reading attempts with submittedAt >= {since}...")
+    query = client.collection('exam_attempts').where('submittedAt', '>=', since).order_by('submittedAt')
+    attempts = []
+    for doc in query.stream():
+        attempts.append({**doc.to_dict(), 'id': doc.id})
+    reads += max(1, len(attempts))
+
+    exams = {}
+    exam_ids = sorted({a.get('examId') for a in attempts if a.get('id') not in state['watermarkIds']} - {None})
+    for snap in client.get_all([client.collection('exams').document(e) for e in exam_ids]):
+        reads += 1
+        if snap.exists:
+            exams[snap.id] = snap.to_dict()
+
+    # Commit in chunks of attempts (in submittedAt order) that touch at most
+    # MAX_BATCH_WRITES - 1 rollups, each together with its own watermark: a
+    # failed run leaves the state consistent and is simply repeated
+    watermark, watermark_ids = state['watermark'], state['watermarkIds']
+    folded = touched_exams = touched_teachers = 0
+    for chunk in chunks(attempts, MAX_BATCH_WRITES - 1):
+        exam_deltas, teacher_deltas, watermark, watermark_ids, ids_from, count = fold(
+            chunk, exams, watermark, watermark_ids, args.lookback * 1000, run_started, ids_from)
+        folded += count
+        touched_exams += len(exam_deltas)
+        touched_teachers += len(teacher_deltas)
+        if not count or args.dry_run:
+            continue
+        batch = client.batch()
+        for collection, deltas in (('analytics_exams', exam_deltas), ('analytics_teachers', teacher_deltas)):
+            for key, delta in deltas.items():
+                batch.set(client.collection(collection).document(key), to_transforms(plain(delta), firestore),
+                          merge=True)
+        batch.set(state_ref, {'watermark': watermark, 'watermarkIds': watermark_ids, 'idsFrom': ids_from,
+                              'updatedAt': firestore.SERVER_TIMESTAMP})
+        batch.commit()
+    print(f"✅ {folded:,} new attempts into {touched_exams:,} exam / {touched_teachers:,} teacher rollups "
+          f"({reads:,} document reads)")
+    if folded and not args.dry_run:
+        print(f"✅ Rollups updated, watermark {watermark}")
+
+    print("\n[2/2] Verifying...")
+    if not args.verify:
+        print("📋 Skipped (use --verify)")
+        return 0
+    all_attempts = [{**d.to_dict(), 'id': d.id} for d in client.collection('exam_attempts').stream()]
+    all_exams = {d.id: d.to_dict() for d in client.collection('exams').stream()}
+    stored_exams = {d.id: d.to_dict() for d in client.collection('analytics_exams').stream()}
+    stored_teachers = {d.id: d.to_dict() for d in client.collection('analytics_teachers').stream()}
+    expected_exams, expected_teachers = full_recompute(all_attempts, all_exams)
+    return verify(stored_exams, stored_teachers, expected_exams, expected_teachers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Watermark-driven incremental analytics rollups')
+    parser.add_argument('--attempts', help='offline mode: attempts export (NDJSON or CSV)')
+    parser.add_argument('--exams', help='offline mode: exams export (NDJSON)')
+    parser.add_argument('--state', default='analytics_rollups.json', help='offline mode: rollup state file')
+    parser.add_argument('--lookback', type=int, default=600, help='seconds re-read before the watermark')
+    parser.add_argument('--verify', nargs='?', const=True, help='compare with a full recompute')
+    parser.add_argument('--dry-run', action='store_true', help='Firestore mode: do not write')
+    parser.add_argument('--project', default=DEFAULT_PROJECT)
+    parser.add_argument('--emulator', help='Firestore emulator host, e.g. localhost:8080')
+    args = parser.parse_args()
+
+    if args.attempts and not args.exams:
+        parser.error('offline mode needs --exams')
+
+    print("=" * 80)
+    print("Updating analytics rollups")
+    print("=" * 80)
+
+    mismatches = run_offline(args) if args.attempts else run_firestore(args)
+
+    print("\n" + "=" * 80)
+    if mismatches:
+        print(f"❌ {mismatches:,} rollups differ from a full recompute")
+        sys.exit(1)
+    print("✅ COMPLETE!")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
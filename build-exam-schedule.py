@@ -0,0 +1,219 @@
+"""
+Build a per-grade exam availability index ("what is open for grade G at time T")
+
+getActiveExamsForStudent runs two queries (grade-specific exams and
+gradeLevel == "" exams) filtered only by isActive and endDate >= now, merges
+them and never looks at startDate. This script builds, per gradeLevel, a
+precomputed schedule from an exams export:
+
+    boundaries  sorted distinct startDate / endDate+1 instants
+    segments    for each [boundaries[i], boundaries[i+1]) the exams open in it
+
+startDate and endDate already include the picked time of day
+(parseDateTimeToMillis in CreateExamScreen), and endDate is inclusive like the
+app's endDate >= now. Exams with gradeLevel "" are merged into every grade.
+A lookup is one binary search plus the size of the answer.
+
+With --apply the schedule is written to exam_schedules/{gradeLevel} (the
+all-grades schedule as exam_schedules/ALL) so the app can resolve active
+exams with a single document get. Firestore has no nested arrays, so each
+segment is stored as a comma separated list of indexes into "exams".
+
+Exams that closed before --since (default: now) are left out; they can never
+be open again and would otherwise grow every segment forever. Lookups with
+--at before --since are therefore incomplete. A schedule document is limited
+to 1 MiB: --apply refuses to write anything when a grade's document is
+larger (narrow the exams with a later --since).
+
+Requirements:
+    pip install google-cloud-firestore   (only for --apply)
+
+Usage:
+    python build-exam-schedule.py <exams.ndjson> [--since MILLIS] [--grade G --at MILLIS]
+                                  [--output exam_schedules.json] [--verify]
+                                  [--apply] [--project ID] [--emulator HOST:PORT]
+"""
+
+import argparse
+import bisect
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_PROJECT = 'online-examination-8372d'
+ALL_GRADES = 'ALL'
+# Firestore's document size limit, less room for the name and updatedAt
+MAX_DOCUMENT_BYTES = 1_048_576 - 1_024
+SUMMARY_FIELDS = ['id', 'title', 'subject', 'gradeLevel', 'teacherName', 'startDate', 'endDate', 'createdAt']
+
+
+def read_records(path):
+    """Yield documents from an NDJSON or JSON array export"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if Path(path).suffix.lower() == '.json':
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def newest_first(exam):
+    return -int(exam.get('createdAt', 0)), exam.get('id', '')
+
+
+class Schedule:
+    """Open exams of one grade as constant segments between sorted boundaries"""
+
+    def __init__(self, exams):
+        # Newest first, the order getActiveExamsForStudent returns
+        self.exams = sorted(exams, key=newest_first)
+        events = defaultdict(list)
+        for index, exam in enumerate(self.exams):
+            events[int(exam['startDate'])].append((index, True))
+            events[int(exam['endDate']) + 1].append((index, False))
+        self.boundaries = sorted(events)
+        self.segments = []
+        open_now = set()
+        for boundary in self.boundaries:
+            for index, opening in events[boundary]:
+                if opening:
+                    open_now.add(index)
+                else:
+                    open_now.discard(index)
+            self.segments.append(tuple(sorted(open_now)))
+
+    def open_at(self, t):
+        position = bisect.bisect_right(self.boundaries, t) - 1
+        if position < 0:
+            return []
+        return [self.exams[i] for i in self.segments[position]]
+
+    def to_document(self, grade):
+        return {
+            'gradeLevel': grade,
+            'exams': [{k: e.get(k) for k in SUMMARY_FIELDS} for e in self.exams],
+            'boundaries': self.boundaries,
+            'segments': [','.join(map(str, s)) for s in self.segments],
+        }
+
+
+def open_at_linear(exams, grade, t):
+    """Reference answer: scan every exam"""
+    matches = [e for e in exams
+               if e.get('gradeLevel', '') in (grade, '') and int(e['startDate']) <= t <= int(e['endDate'])]
+    return sorted(matches, key=newest_first)
+
+
+def build_schedules(exams):
+    by_grade = defaultdict(list)
+    for exam in exams:
+        by_grade[exam.get('gradeLevel', '')].append(exam)
+    all_grades = by_grade.pop('', [])
+    schedules = {grade: Schedule(grade_exams + all_grades) for grade, grade_exams in by_grade.items()}
+    schedules[ALL_GRADES] = Schedule(all_grades)
+    return schedules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-grade exam availability index')
+    parser.add_argument('exams', help='exams export (NDJSON)')
+    parser.add_argument('--since', type=int, help='leave out exams that ended before this time (ms, default now)')
+    parser.add_argument('--grade', help='answer a single lookup for this grade...')
+    parser.add_argument('--at', type=int, help='...at this time (epoch millis, default now)')
+    parser.add_argument('--output', default='exam_schedules.json')
+    parser.add_argument('--verify', action='store_true', help='compare random lookups with a linear scan')
+    parser.add_argument('--apply', action='store_true', help='write exam_schedules/{grade} to Firestore')
+    parser.add_argument('--project', default=DEFAULT_PROJECT)
+    parser.add_argument('--emulator', help='Firestore emulator host, e.g. localhost:8080')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("Building exam schedules")
+    print("=" * 80)
+
+    print("\n[1/3] Loading exams...")
+    since = args.since if args.since is not None else int(time.time() * 1000)
+    exams = []
+    ended = 0
+    for exam in read_records(args.exams):
+        if not exam.get('active', exam.get('isActive', True)):
+            continue
+        if int(exam['endDate']) < since:
+            ended += 1
+            continue
+        exams.append(exam)
+    print(f"✅ {len(exams):,} active exams open at or after {since} ({ended:,} already ended left out)")
+
+    print("\n[2/3] Building per-grade schedules...")
+    started = time.perf_counter()
+    schedules = build_schedules(exams)
+    print(f"✅ Built in {time.perf_counter() - started:.3f}s")
+    for grade, schedule in sorted(schedules.items()):
+        print(f"  {grade:<12} {len(schedule.exams):>7,} exams, {len(schedule.boundaries):>7,} boundaries")
+
+    if args.grade:
+        at = args.at if args.at is not None else int(time.time() * 1000)
+        schedule = schedules.get(args.grade, schedules[ALL_GRADES])
+        print(f"\n📋 Open for {args.grade} at {at}:")
+        for exam in schedule.open_at(at):
+            print(f"  {exam['id']}  {exam.get('title', '')}")
+
+    if args.verify:
+        print("\n📋 Verifying against a linear scan...")
+        rng = random.Random(0)
+        lo = min((int(e['startDate']) for e in exams), default=0)
+        hi = max((int(e['endDate']) for e in exams), default=0)
+        probes = [(rng.choice(list(schedules)), rng.randint(lo - 1, hi + 1)) for _ in range(2000)]
+        started = time.perf_counter()
+        indexed = [[e['id'] for e in schedules[g].open_at(t)] for g, t in probes]
+        indexed_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        linear = [[e['id'] for e in open_at_linear(exams, '' if g == ALL_GRADES else g, t)] for g, t in probes]
+        linear_seconds = time.perf_counter() - started
+        if indexed != linear:
+            print("❌ Index and linear scan disagree")
+            sys.exit(1)
+        print(f"✅ {len(probes):,} lookups match "
+              f"({indexed_seconds / len(probes) * 1e6:.1f}µs indexed vs {linear_seconds / len(probes) * 1e6:.1f}µs linear)")
+
+    print(f"\n[3/3] Writing {args.output}...")
+    documents = {grade: schedule.to_document(grade) for grade, schedule in schedules.items()}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(documents, f, ensure_ascii=False)
+    oversized = []
+    for grade, document in sorted(documents.items()):
+        size = len(json.dumps(document, ensure_ascii=False).encode('utf-8'))
+        if size > MAX_DOCUMENT_BYTES:
+            oversized.append(grade)
+        print(f"  {'❌ ' if size > MAX_DOCUMENT_BYTES else ''}{grade:<12} {size:>10,} bytes")
+
+    if args.apply and oversized:
+        print(f"❌ {', '.join(oversized)} over the {MAX_DOCUMENT_BYTES:,} byte document limit; nothing written "
+              f"(use a later --since)")
+        sys.exit(1)
+    if args.apply:
+        if args.emulator:
+            os.environ['FIRESTORE_EMULATOR_HOST'] = args.emulator
+        from google.cloud import firestore
+        client = firestore.Client(project=args.project)
+        batch = client.batch()
+        for grade, document in documents.items():
+            batch.set(client.collection('exam_schedules').document(grade),
+                      {**document, 'updatedAt': firestore.SERVER_TIMESTAMP})
+        batch.commit()
+        print(f"✅ Wrote {len(documents):,} exam_schedules documents")
+
+    print("\n" + "=" * 80)
+    print("✅ COMPLETE!")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""
+Build the grade_tokens index used for new-exam notifications
+
+ExamRepository.getStudentTokensByGrade used to read every STUDENT user and
+then await one profiles/student read per user, one at a time. This job reads
+the users and their profiles in bulk (batched gets, several in flight) and
+writes a compact index:
+
+    grade_tokens/{gradeLevel}                 { gradeLevel, shardCount, updatedAt }
+    grade_tokens/{gradeLevel}/shards/{n}      { tokens: { uid: fcmToken, ... } }
+
+A user lives in shard crc32(uid) % shardCount, so the app reads one grade with
+a single shards query, and incremental refreshes can rewrite a single user
+without reading the index first. Shards are kept far below the 1 MiB document
+limit; an incremental refresh that would outgrow a grade's shards rewrites
+that grade with more shards. Shards are only ever written with merge and
+explicit deletes, so tokens the app writes during a run are not lost.
+
+Between runs the app keeps the index current itself: AuthRepository.updateFcmToken
+(called on sign-in and from MyFirebaseMessagingService.onNewToken) writes the
+user's token into its grade's shard, removes it from the other grades' shards
+and stamps users/{uid}.fcmTokenUpdatedAt.
+
+Requirements:
+    pip install google-cloud-firestore
+
+Usage:
+    python build-grade-tokens.py [--project ID] [--emulator HOST:PORT]
+                                 [--concurrency N] [--since MILLIS] [--uids FILE]
+                                 [--seed N] [--benchmark] [--verify]
+
+    --since      incremental refresh of users created, or whose token changed,
+                 at or after MILLIS
+    --uids       incremental refresh of the uids listed in FILE (one per line)
+    --seed       create N synthetic students first (emulator only)
+    --benchmark  time the one-by-one profile reads against the bulk reads
+    --verify     read the index back and compare it with the source documents
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import string
+import sys
+import time
+import zlib
+from collections import defaultdict
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_PROJECT = 'online-examination-8372d'
+# Target shard size; leaves room for hash skew under the 1 MiB document limit
+SHARD_BYTES = 500_000
+GET_ALL_CHUNK = 100
+MAX_BATCH_WRITES = 500
+GRADE_LEVELS = ["Grade 7", "Grade 8", "Grade 9", "Grade 10"]
+
+
+def shard_of(uid, shard_count):
+    return zlib.crc32(uid.encode('utf-8')) % shard_count
+
+
+def shard_count_for(tokens):
+    size = sum(len(uid) + len(token) + 16 for uid, token in tokens.items())
+    return max(1, math.ceil(size / SHARD_BYTES))
+
+
+async def read_student_users(client, since=None, uids=None):
+    """Return {uid: fcmToken} for STUDENT users (optionally only some of them)"""
+    users = {}
+    if uids is not None:
+        refs = [client.collection('users').document(uid) for uid in uids]
+        async for snap in client.get_all(refs):
+            data = snap.to_dict() if snap.exists else None
+            if data and data.get('role') == 'STUDENT':
+                users[snap.id] = data.get('fcmToken', '')
+            else:
+                users[snap.id] = ''
+        return users
+
+    query = client.collection('users').where('role', '==', 'STUDENT')
+    if since is None:
+        queries = [query]
+    else:
+        # New sign-ups and rotated tokens (stamped by AuthRepository.updateFcmToken)
+        queries = [query.where('createdAt', '>=', since), query.where('fcmTokenUpdatedAt', '>=', since)]
+    for q in queries:
+        async for snap in q.stream():
+            users[snap.id] = snap.to_dict().get('fcmToken', '')
+    return users
+
+
+async def read_grades_bulk(client, uids, concurrency):
+    """Read profiles/student for every uid with batched gets, `concurrency` at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+    grades = {}
+
+    async def fetch(chunk):
+        async with semaphore:
+            refs = [client.document(f'users/{uid}/profiles/student') for uid in chunk]
+            async for snap in client.get_all(refs):
+                if snap.exists:
+                    grades[snap.reference.parent.parent.id] = snap.to_dict().get('gradeLevelToEnroll', '')
+
+    uids = list(uids)
+    await asyncio.gather(*(fetch(uids[i:i + GET_ALL_CHUNK]) for i in range(0, len(uids), GET_ALL_CHUNK)))
+    return grades
+
+
+async def read_grades_sequential(client, uids):
+    """The pattern getStudentTokensByGrade used: one awaited read per student"""
+    grades = {}
+    for uid in uids:
+        snap = await client.document(f'users/{uid}/profiles/student').get()
+        if snap.exists:
+            grades[uid] = snap.to_dict().get('gradeLevelToEnroll', '')
+    return grades
+
+
+def group_by_grade(users, grades):
+    index = defaultdict(dict)
+    for uid, token in users.items():
+        grade = grades.get(uid)
+        if token and grade:
+            index[grade][uid] = token
+    return index
+
+
+async def read_existing(client, grades=None):
+    """{grade: (shardCount, {uid: (shard, token)})} of the stored index"""
+    existing = {}
+    async for snap in client.collection('grade_tokens').stream():
+        if grades is not None and snap.id not in grades:
+            continue
+        entries = {}
+        async for shard in snap.reference.collection('shards').stream():
+            for uid, token in (shard.to_dict().get('tokens') or {}).items():
+                entries[uid] = (int(shard.id), token)
+        existing[snap.id] = (snap.to_dict().get('shardCount', 0), entries)
+    return existing
+
+
+async def write_full_index(client, index, existing, grades=None):
+    """Rewrite the shards of every (or the given) grade, dropping shards no longer used
+
+    Shards are written with merge: uids that left a shard since `existing` was read
+    are deleted explicitly, so tokens AuthRepository.updateFcmToken merged in after
+    that read are kept. Read `existing` before the users.
+    """
+    from google.cloud import firestore
+
+    writes = 0
+    for grade in sorted(set(existing) | set(index) if grades is None else grades):
+        tokens = index.get(grade, {})
+        old_count, old_entries = existing.get(grade, (0, {}))
+        shard_count = shard_count_for(tokens)
+        shards = [dict() for _ in range(shard_count)]
+        for uid, token in tokens.items():
+            shards[shard_of(uid, shard_count)][uid] = token
+        for uid, (n, _) in old_entries.items():
+            if n < shard_count and uid not in shards[n]:
+                shards[n][uid] = firestore.DELETE_FIELD
+
+        grade_ref = client.collection('grade_tokens').document(grade)
+        # Shards can be large, so each one is committed on its own
+        written = [(n, shard) for n, shard in enumerate(shards) if shard or n >= old_count]
+        await asyncio.gather(*(
+            grade_ref.collection('shards').document(str(n)).set({'tokens': shard}, merge=True)
+            for n, shard in written
+        ))
+        batch = client.batch()
+        for n in range(shard_count, old_count):
+            batch.delete(grade_ref.collection('shards').document(str(n)))
+        batch.set(grade_ref, {'gradeLevel': grade, 'shardCount': shard_count,
+                              'updatedAt': firestore.SERVER_TIMESTAMP})
+        await batch.commit()
+        writes += len(written) + 1 + max(0, old_count - shard_count)
+    return writes
+
+
+async def write_incremental(client, users, grades):
+    """Move each refreshed uid into its current grade's shard and out of all others
+
+    A grade that would outgrow its shards (or does not exist yet) is rewritten with
+    write_full_index instead, so no shard grows past the document limit.
+    """
+    from google.cloud import firestore
+
+    shard_counts = {}
+    async for snap in client.collection('grade_tokens').stream():
+        shard_counts[snap.id] = snap.to_dict().get('shardCount', 1)
+
+    targets = {grades.get(uid) for uid, token in users.items() if token} - {None, ''}
+    existing = await read_existing(client, targets)
+    reshard = {}
+    for grade in targets:
+        old_count, old_entries = existing.get(grade, (0, {}))
+        merged = {uid: token for uid, (_, token) in old_entries.items() if uid not in users}
+        merged.update({uid: token for uid, token in users.items() if token and grades.get(uid) == grade})
+        if grade not in shard_counts or shard_count_for(merged) > old_count:
+            reshard[grade] = merged
+
+    operations = []
+    for uid, token in users.items():
+        grade = grades.get(uid) if token else None
+        for known_grade, shard_count in shard_counts.items():
+            if known_grade in reshard:
+                continue
+            ref = client.document(f'grade_tokens/{known_grade}/shards/{shard_of(uid, shard_count)}')
+            value = token if known_grade == grade else firestore.DELETE_FIELD
+            operations.append((ref, {'tokens': {uid: value}}))
+
+    for start in range(0, len(operations), MAX_BATCH_WRITES):
+        batch = client.batch()
+        for ref, data in operations[start:start + MAX_BATCH_WRITES]:
+            batch.set(ref, data, merge=True)
+        await batch.commit()
+    writes = len(operations)
+    if reshard:
+        print(f"📋 Resharding {', '.join(sorted(reshard))}")
+        writes += await write_full_index(client, reshard, existing, grades=sorted(reshard))
+    return writes
+
+
+async def read_index(client):
+    index = defaultdict(dict)
+    async for grade_snap in client.collection('grade_tokens').stream():
+        async for shard in grade_snap.reference.collection('shards').stream():
+            index[grade_snap.id].update(shard.to_dict().get('tokens', {}))
+    return index
+
+
+async def seed_students(client, count):
+    """Create synthetic students with profiles and FCM tokens (emulator only)"""
+    sections = {"Grade 7": ["Sapphire", "Ruby", "Emerald"], "Grade 8": ["Diamond", "Gold", "Silver"],
+                "Grade 9": ["Bronze", "Copper", "Steel"], "Grade 10": ["Jade", "Pearl", "Opal"]}
+    rng = random.Random(count)
+    operations = []
+    for i in range(count):
+        uid = f'seed{i:07d}'
+        grade = rng.choice(GRADE_LEVELS)
+        token = ''.join(rng.choices(string.ascii_letters + string.digits, k=152))
+        operations.append((f'users/{uid}', {'uid': uid, 'role': 'STUDENT', 'fcmToken': token,
+                                            'createdAt': 1_700_000_000_000 + i}))
+        operations.append((f'users/{uid}/profiles/student', {'gradeLevelToEnroll': grade,
+                                                             'section': rng.choice(sections[grade])}))
+    semaphore = asyncio.Semaphore(8)
+
+    async def commit(chunk):
+        async with semaphore:
+            batch = client.batch()
+            for path, data in chunk:
+                batch.set(client.document(path), data)
+            await batch.commit()
+
+    await asyncio.gather(*(commit(operations[i:i + MAX_BATCH_WRITES])
+                           for i in range(0, len(operations), MAX_BATCH_WRITES)))
+
+
+async def run(args):
+    if args.emulator:
+        os.environ['FIRESTORE_EMULATOR_HOST'] = args.emulator
+    from google.cloud import firestore
+    client = firestore.AsyncClient(project=args.project)
+
+    if args.seed:
+        if not args.emulator:
+            print("❌ --seed is only allowed with --emulator")
+            sys.exit(1)
+        print(f"\n📋 Seeding {args.seed:,} students...")
+        await seed_students(client, args.seed)
+
+    incremental = args.since is not None or args.uids is not None
+    uids = None
+    if args.uids:
+        with open(args.uids, 'r', encoding='utf-8') as f:
+            uids = [line.strip() for line in f if line.strip()]
+
+    # Taken before the users are read, so a full rebuild only deletes uids that
+    # were in the index before the read (see write_full_index)
+    existing = None if incremental else await read_existing(client)
+
+    print("\n[1/3] Reading student users...")
+    started = time.perf_counter()
+    users = await read_student_users(client, since=args.since, uids=uids)
+    print(f"✅ {len(users):,} users in {time.perf_counter() - started:.2f}s")
+
+    with_token = [uid for uid, token in users.items() if token]
+    print(f"\n[2/3] Reading {len(with_token):,} student profiles ({args.concurrency} concurrent batches)...")
+    started = time.perf_counter()
+    grades = await read_grades_bulk(client, with_token, args.concurrency)
+    bulk_seconds = time.perf_counter() - started
+    print(f"✅ Bulk reads: {bulk_seconds:.2f}s")
+
+    if args.benchmark:
+        started = time.perf_counter()
+        sequential = await read_grades_sequential(client, with_token)
+        sequential_seconds = time.perf_counter() - started
+        speedup = sequential_seconds / bulk_seconds if bulk_seconds else float('inf')
+        print(f"📋 One-by-one reads: {sequential_seconds:.2f}s ({speedup:.1f}x slower)")
+        if sequential != grades:
+            print("❌ Sequential and bulk reads disagree")
+            sys.exit(1)
+
+    print("\n[3/3] Writing grade_tokens...")
+    started = time.perf_counter()
+    if incremental:
+        writes = await write_incremental(client, users, grades)
+    else:
+        index = group_by_grade(users, grades)
+        writes = await write_full_index(client, index, existing)
+        for grade in sorted(index):
+            print(f"  {grade:<12} {len(index[grade]):>8,} tokens, {shard_count_for(index[grade])} shard(s)")
+    print(f"✅ {writes:,} document writes in {time.perf_counter() - started:.2f}s")
+
+    if args.verify:
+        print("\n📋 Verifying index against source documents...")
+        all_users = await read_student_users(client)
+        all_grades = await read_grades_bulk(client, [u for u, t in all_users.items() if t], args.concurrency)
+        expected = group_by_grade(all_users, all_grades)
+        actual = await read_index(client)
+        if {g: t for g, t in actual.items() if t} != dict(expected):
+            print("❌ grade_tokens does not match users/profiles")
+            sys.exit(1)
+        print("✅ grade_tokens matches users/profiles")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the grade_tokens notification index')
+    parser.add_argument('--project', default=DEFAULT_PROJECT)
+    parser.add_argument('--emulator', help='Firestore emulator host, e.g. localhost:8080')
+    parser.add_argument('--concurrency', type=int, default=16, help='batched profile reads in flight')
+    parser.add_argument('--since', type=int, help='only refresh users created or with a token updated at or after this time (ms)')
+    parser.add_argument('--uids', help='only refresh the uids listed in this file')
+    parser.add_argument('--seed', type=int, help='create N synthetic students first (emulator only)')
+    parser.add_argument('--benchmark', action='store_true', help='compare with one-by-one profile reads')
+    parser.add_argument('--verify', action='store_true', help='read the index back and check it')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("Building grade_tokens index")
+    print("=" * 80)
+
+    asyncio.run(run(args))
+
+    print("\n" + "=" * 80)
+    print("✅ COMPLETE!")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
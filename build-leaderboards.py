@@ -0,0 +1,307 @@
+"""
+Build per-term leaderboards from exported exam_attempts
+
+LeaderboardRepository.getLeaderboard ranks students by the global totalScore,
+although the Leaderboard model is per term. This script reads the attempts
+export once and produces one Leaderboard document per
+(term, gradeLevel, section) with the top K students by their summed score
+for that term.
+
+    term        exam.term of the attempted exam
+    gradeLevel  gradeLevelToEnroll of the student profile (falls back to exam.gradeLevel)
+    section     section of the student profile
+
+Only a bounded heap of K entries is kept per group. With --sorted (attempts
+export ordered by ascending studentId) each student's totals are flushed into
+the heaps as soon as the next student starts, so memory is proportional to
+K x groups. The order is checked while streaming: a student that shows up
+again after a later one would get two heap entries, so the run stops instead.
+Without --sorted the per-student totals are kept until the end of the file.
+--sorted cannot be combined with --state, which needs every student's totals.
+
+Incremental mode (--state FILE) keeps the per-student term totals and a
+submittedAt watermark, so the next run only folds in newer attempts. Like
+build-analytics-rollups.py it re-reads attempts with submittedAt >=
+watermark - --lookback and skips the ids it already folded (watermarkIds),
+so attempts that arrive late from a device with a slow clock are still
+counted. submittedAt is the device clock: the watermark never moves past
+the start of the run, so a phone with a fast clock cannot hide later
+attempts.
+
+Export format:
+    exams     NDJSON (Exam documents; only id, term and gradeLevel are used)
+    profiles  NDJSON (StudentInfo documents with a "userId" field)
+    attempts  NDJSON or CSV
+
+Requirements:
+    pip install google-cloud-firestore   (only for --apply)
+
+Usage:
+    python build-leaderboards.py <exams.ndjson> <profiles.ndjson> <attempts.ndjson|csv>
+                                 [--top K] [--sorted] [--state FILE] [--lookback SECONDS]
+                                 [--output leaderboards.ndjson]
+                                 [--apply] [--project ID] [--emulator HOST:PORT]
+"""
+
+import argparse
+import csv
+import heapq
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_PROJECT = 'online-examination-8372d'
+MAX_BATCH_WRITES = 500
+
+
+def read_records(path):
+    """Yield documents from an NDJSON, JSON array or CSV export"""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.suffix.lower() == '.csv':
+            for row in csv.DictReader(f):
+                if row.get('score') not in (None, ''):
+                    row['score'] = int(row['score'])
+                if row.get('submittedAt') not in (None, ''):
+                    row['submittedAt'] = int(row['submittedAt'])
+                yield row
+        elif path.suffix.lower() == '.json':
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class TopK:
+    """Min-heap holding the K best (score, studentId, studentName) of one group"""
+
+    def __init__(self, k):
+        self.k = k
+        self.heap = []
+
+    def push(self, score, student_id, student_name):
+        # Ties are broken by studentId so the kept set is deterministic
+        item = (score, _Reverse(student_id), student_name)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, item)
+        elif item > self.heap[0]:
+            heapq.heapreplace(self.heap, item)
+
+    def entries(self):
+        ranked = sorted(self.heap, reverse=True)
+        entries = []
+        for position, (score, student_id, student_name) in enumerate(ranked):
+            # Competition ranking: equal scores share a rank (1, 2, 2, 4)
+            if entries and entries[-1]['score'] == score:
+                rank = entries[-1]['rank']
+            else:
+                rank = position + 1
+            entries.append({'rank': rank, 'studentId': student_id.value, 'studentName': student_name, 'score': score})
+        return entries
+
+
+class _Reverse:
+    """Inverts ordering so that smaller studentIds win ties in the min-heap"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return self.value > other.value
+
+    def __gt__(self, other):
+        return self.value < other.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def group_key(attempt, exams, profiles):
+    exam = exams.get(attempt.get('examId'))
+    if exam is None:
+        return None
+    profile = profiles.get(attempt.get('studentId'), {})
+    grade = profile.get('gradeLevelToEnroll') or exam.get('gradeLevel', '')
+    return exam.get('term', ''), grade, profile.get('section', '')
+
+
+def load_state(path):
+    if not path or not Path(path).exists():
+        return {'watermark': 0, 'watermarkIds': {}, 'totals': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    # Older state files list only the ids stamped exactly at the watermark
+    if isinstance(state['watermarkIds'], list):
+        state['watermarkIds'] = {i: state['watermark'] for i in state['watermarkIds']}
+    return state
+
+
+def save_state(path, state):
+    tmp = Path(str(path) + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def leaderboard_id(key):
+    return '_'.join(part.replace('/', '-').replace(' ', '') or 'ALL' for part in key)
+
+
+def build(attempts, exams, profiles, k, sorted_input, state, lookback_ms=0, now=None):
+    """Stream attempts into per-group heaps; returns (heaps, attempts folded in)"""
+    heaps = defaultdict(lambda: TopK(k))
+    if now is None:
+        now = int(time.time() * 1000)
+    watermark = state['watermark'] if state else 0
+    watermark_ids = state['watermarkIds'] if state else {}
+    since = watermark - lookback_ms if watermark else 0
+    # "term|grade|section" -> studentId -> [score, name]
+    totals = defaultdict(dict)
+    if state:
+        totals.update(state['totals'])
+
+    new_watermark = watermark
+    recent = {}
+    current_student = None
+    current_totals = {}
+    folded = 0
+
+    def flush(student_id, student_totals):
+        for key, (score, name) in student_totals.items():
+            heaps[tuple(key.split('|'))].push(score, student_id, name)
+
+    for attempt in attempts:
+        submitted_at = attempt.get('submittedAt')
+        if not submitted_at:
+            continue
+        if submitted_at < since or attempt.get('id') in watermark_ids:
+            continue
+        key = group_key(attempt, exams, profiles)
+        if key is None:
+            continue
+
+        student_id = attempt['studentId']
+        if sorted_input:
+            if current_student is not None and student_id < current_student:
+                raise ValueError(f'attempts are not ordered by studentId: {student_id!r} '
+                                 f'after {current_student!r}')
+            if student_id != current_student:
+                flush(current_student, current_totals)
+                current_student, current_totals = student_id, {}
+            entry = current_totals.setdefault('|'.join(key), [0, attempt.get('studentName', '')])
+        else:
+            entry = totals['|'.join(key)].setdefault(student_id, [0, attempt.get('studentName', '')])
+        entry[0] += int(attempt.get('score', 0))
+        folded += 1
+
+        recent[attempt.get('id')] = submitted_at
+        new_watermark = max(new_watermark, min(submitted_at, now))
+
+    flush(current_student, current_totals)
+    for key, students in totals.items():
+        heap = heaps[tuple(key.split('|'))]
+        for student_id, (score, name) in students.items():
+            heap.push(score, student_id, name)
+
+    if state is not None:
+        # Incremental runs need every student's running total next time
+        # Remember every id inside the lookback window of the new watermark
+        cutoff = new_watermark - lookback_ms
+        state['watermark'] = new_watermark
+        state['watermarkIds'] = {i: t for i, t in {**watermark_ids, **recent}.items() if t >= cutoff}
+        state['totals'] = dict(totals)
+
+    return heaps, folded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Streaming top-K leaderboards per term, grade and section')
+    parser.add_argument('exams', help='exams export (NDJSON)')
+    parser.add_argument('profiles', help='student profiles export (NDJSON with userId)')
+    parser.add_argument('attempts', help='exam_attempts export (NDJSON or CSV)')
+    parser.add_argument('--top', type=int, default=20, help='entries per leaderboard (default 20, like the app)')
+    parser.add_argument('--sorted', action='store_true',
+                        help='attempts export is ordered by studentId (checked; not with --state)')
+    parser.add_argument('--state', help='state file for incremental runs')
+    parser.add_argument('--lookback', type=int, default=600, help='seconds re-read before the watermark')
+    parser.add_argument('--output', default='leaderboards.ndjson')
+    parser.add_argument('--apply', action='store_true', help='write leaderboards/{id} documents to Firestore')
+    parser.add_argument('--project', default=DEFAULT_PROJECT)
+    parser.add_argument('--emulator', help='Firestore emulator host, e.g. localhost:8080')
+    args = parser.parse_args()
+
+    if args.state and args.sorted:
+        parser.error("--state keeps every student's totals, it cannot be combined with --sorted")
+
+    print("=" * 80)
+    print("Building leaderboards")
+    print("=" * 80)
+
+    print("\n[1/3] Loading exams and profiles...")
+    exams = {e['id']: {'term': e.get('term', ''), 'gradeLevel': e.get('gradeLevel', '')}
+             for e in read_records(args.exams)}
+    profiles = {p['userId']: {'gradeLevelToEnroll': p.get('gradeLevelToEnroll', ''), 'section': p.get('section', '')}
+                for p in read_records(args.profiles) if p.get('userId')}
+    print(f"✅ {len(exams):,} exams, {len(profiles):,} student profiles")
+
+    state = load_state(args.state) if args.state else None
+    if state and state['watermark']:
+        print(f"📋 Incremental run from submittedAt >= {state['watermark'] - args.lookback * 1000}")
+
+    print("\n[2/3] Streaming attempts...")
+    started = time.perf_counter()
+    try:
+        heaps, folded = build(read_records(args.attempts), exams, profiles, args.top, args.sorted, state,
+                              args.lookback * 1000)
+    except ValueError as e:
+        print(f"❌ {e}; sort the export by studentId or run without --sorted")
+        sys.exit(1)
+    seconds = time.perf_counter() - started
+    print(f"✅ Folded {folded:,} attempts into {len(heaps):,} leaderboards in {seconds:.2f}s")
+
+    documents = []
+    for key in sorted(heaps):
+        term, grade, section = key
+        documents.append({
+            'id': leaderboard_id(key),
+            'term': term,
+            'gradeLevel': grade,
+            'section': section,
+            'entries': heaps[key].entries(),
+        })
+
+    print(f"\n[3/3] Writing {args.output}...")
+    with open(args.output, 'w', encoding='utf-8') as f:
+        for document in documents:
+            f.write(json.dumps(document, ensure_ascii=False) + '\n')
+    if args.state:
+        save_state(args.state, state)
+        print(f"✅ State saved to {args.state}")
+
+    if args.apply:
+        if args.emulator:
+            os.environ['FIRESTORE_EMULATOR_HOST'] = args.emulator
+        from google.cloud import firestore
+        client = firestore.Client(project=args.project)
+        for start in range(0, len(documents), MAX_BATCH_WRITES):
+            batch = client.batch()
+            for document in documents[start:start + MAX_BATCH_WRITES]:
+                batch.set(client.collection('leaderboards').document(document['id']), document)
+            batch.commit()
+        print(f"✅ Wrote {len(documents):,} leaderboards to Firestore")
+
+    print("\n" + "=" * 80)
+    print("✅ COMPLETE!")
+    print(f"📋 Leaderboards: {len(documents):,}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
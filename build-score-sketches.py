@@ -0,0 +1,379 @@
+"""
+Build mergeable quantile sketches of attempt percentage and timeSpentMinutes
+
+Percentiles of ExamAttempt.percentage or timeSpentMinutes otherwise need
+every attempt. This script streams an attempts export once and keeps, per
+group, a small log-bucketed histogram (the DDSketch scheme) for each metric:
+
+    exam:{examId}
+    section:{gradeLevel}|{section}|{term}
+    term:{term}
+
+Value v > 0 goes to bucket ceil(log_gamma(v)) with gamma = (1 + a) / (1 - a);
+zeros are counted separately. A quantile is answered with the bucket midpoint
+2 gamma^i / (gamma + 1).
+
+Error bound: for the q-quantile, defined as the sorted value at rank
+floor(q * (n - 1)), the answer x' satisfies |x' - x| <= a * x, where a is the
+--accuracy (default 0.01, i.e. within 1% of the exact value; exact for 0).
+This holds for any data and any number of merges, because merging adds
+bucket counts and is therefore exact: merge(sketch(A), sketch(B)) equals
+sketch(A + B). With a = 0.01 a 0..100 percentage range needs at most ~460
+buckets, in practice a few dozen, i.e. a few kilobytes per group.
+
+--apply adds the bins and counts to analytics_sketches/{group} with
+increments, so sketches of different shards or days add up server-side.
+Increments are not idempotent: each build gets buildId = <hash of the sketch
+file> and every group document records the ids applied to it in "buildIds"
+in the same write. --apply skips groups that already list the id, so
+re-running it (or re-applying the same file) does not count anything twice.
+
+--verify recomputes every group's p50/p90/p99 exactly, checks the bound and
+checks that sketches built from shards and merged equal the single pass.
+
+Export format:
+    exams     NDJSON (Exam documents; id, term and gradeLevel are used)
+    profiles  NDJSON (StudentInfo documents with a "userId" field), optional
+    attempts  NDJSON or CSV
+
+Requirements:
+    pip install google-cloud-firestore   (only for --apply)
+
+Usage:
+    python build-score-sketches.py build <exams.ndjson> <attempts.ndjson|csv> [--profiles FILE]
+                                   [--accuracy 0.01] [--output sketches.json] [--verify]
+                                   [--apply] [--project ID] [--emulator HOST:PORT]
+    python build-score-sketches.py merge <sketches.json>... --output merged.json
+    python build-score-sketches.py query <sketches.json> <group> [--quantiles 0.5,0.9,0.99]
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_PROJECT = 'online-examination-8372d'
+MAX_BATCH_WRITES = 500
+GET_ALL_CHUNK = 300
+MARKER_FIELD = 'buildIds'
+METRICS = ['percentage', 'timeSpentMinutes']
+DEFAULT_QUANTILES = [0.5, 0.9, 0.99]
+
+
+def read_records(path):
+    """Yield documents from an NDJSON, JSON array or CSV export"""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.suffix.lower() == '.csv':
+            yield from csv.DictReader(f)
+        elif path.suffix.lower() == '.json':
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class QuantileSketch:
+    """Log-bucketed histogram with relative accuracy `accuracy`; merging adds counts"""
+
+    def __init__(self, accuracy):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = defaultdict(int)
+        self.zero = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        if value < 0:
+            raise ValueError(f'negative value {value}')
+        if value == 0:
+            self.zero += 1
+        else:
+            self.bins[math.ceil(math.log(value) / self.log_gamma)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        if other.accuracy != self.accuracy:
+            raise ValueError('cannot merge sketches with different accuracy')
+        for index, count in other.bins.items():
+            self.bins[index] += count
+        self.zero += other.zero
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = math.floor(q * (self.count - 1))
+        if rank < self.zero:
+            return 0.0
+        seen = self.zero
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                # Clamping to the observed range never moves the answer away from the true value
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {'accuracy': self.accuracy, 'count': self.count, 'zero': self.zero, 'sum': self.total,
+                'min': self.min if self.count else None, 'max': self.max if self.count else None,
+                'bins': {str(k): v for k, v in sorted(self.bins.items())}}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['accuracy'])
+        sketch.bins.update({int(k): v for k, v in data['bins'].items()})
+        sketch.zero, sketch.count, sketch.total = data['zero'], data['count'], data['sum']
+        if data['count']:
+            sketch.min, sketch.max = data['min'], data['max']
+        return sketch
+
+
+def group_keys(attempt, exams, profiles):
+    exam = exams.get(attempt.get('examId'), {})
+    term = exam.get('term', '') or 'NONE'
+    profile = profiles.get(attempt.get('studentId'), {})
+    grade = profile.get('gradeLevelToEnroll') or exam.get('gradeLevel', '')
+    keys = [f"exam:{attempt.get('examId', '')}", f'term:{term}']
+    if profile.get('section'):
+        keys.append(f"section:{grade}|{profile['section']}|{term}")
+    return keys
+
+
+def build(attempts, exams, profiles, accuracy, on_values=None):
+    """One pass over the attempts; returns {group: {metric: QuantileSketch}}"""
+    sketches = defaultdict(lambda: {m: QuantileSketch(accuracy) for m in METRICS})
+    for attempt in attempts:
+        if not attempt.get('submittedAt'):
+            continue
+        values = {m: float(attempt.get(m) or 0) for m in METRICS}
+        for key in group_keys(attempt, exams, profiles):
+            for metric, value in values.items():
+                sketches[key][metric].add(value)
+            if on_values:
+                on_values(key, values)
+    return sketches
+
+
+def save(path, sketches):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({key: {m: s.to_dict() for m, s in metrics.items()} for key, metrics in sketches.items()},
+                  f, ensure_ascii=False)
+
+
+def load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return {key: {m: QuantileSketch.from_dict(s) for m, s in metrics.items()} for key, metrics in data.items()}
+
+
+def merge_into(target, source):
+    for key, metrics in source.items():
+        if key not in target:
+            target[key] = metrics
+            continue
+        for metric, sketch in metrics.items():
+            target[key][metric].merge(sketch)
+    return target
+
+
+def exact_quantile(sorted_values, q):
+    return sorted_values[math.floor(q * (len(sorted_values) - 1))]
+
+
+def verify(args, exams, profiles, sketches):
+    """Check the error bound against exact quantiles and shard-merge equality"""
+    values = defaultdict(lambda: defaultdict(list))
+
+    def collect(key, metric_values):
+        for metric, value in metric_values.items():
+            values[key][metric].append(value)
+
+    # Shard the same input randomly into 4 parts and merge the partial sketches
+    shards = [[] for _ in range(4)]
+    rng = random.Random(0)
+    for attempt in read_records(args.attempts):
+        shards[rng.randrange(4)].append(attempt)
+    merged = {}
+    for shard in shards:
+        merge_into(merged, build(shard, exams, profiles, args.accuracy, collect))
+
+    checked = violations = 0
+    worst = 0.0
+    for key, metrics in values.items():
+        for metric, observed in metrics.items():
+            observed.sort()
+            for q in DEFAULT_QUANTILES:
+                exact = exact_quantile(observed, q)
+                estimate = sketches[key][metric].quantile(q)
+                error = abs(estimate - exact) / exact if exact else abs(estimate)
+                worst = max(worst, error)
+                checked += 1
+                if error > args.accuracy + 1e-12:
+                    violations += 1
+                    if violations <= 5:
+                        print(f"  ❌ {key} {metric} p{q * 100:g}: {estimate} vs exact {exact}")
+    same = all(merged[key][m].to_dict()['bins'] == sketches[key][m].to_dict()['bins'] and
+               merged[key][m].count == sketches[key][m].count for key in sketches for m in METRICS)
+    print(f"{'✅' if not violations else '❌'} {checked:,} quantiles checked, worst relative error "
+          f"{worst:.4%} (bound {args.accuracy:.2%})")
+    print(f"{'✅' if same else '❌'} Sketches merged from 4 shards {'equal' if same else 'differ from'} "
+          f"the single pass")
+    return violations == 0 and same
+
+
+def build_id(sketches):
+    """Stable id of a sketch file: the same input gives the same id"""
+    digest = hashlib.sha1()
+    for key in sorted(sketches):
+        digest.update(key.encode('utf-8'))
+        digest.update(json.dumps({m: s.to_dict() for m, s in sketches[key].items()}, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def document_id(key):
+    return key.replace('/', '-')
+
+
+def already_applied(client, keys, applied_id):
+    """Groups whose document already lists this build id"""
+    applied = set()
+    collection = client.collection('analytics_sketches')
+    for start in range(0, len(keys), GET_ALL_CHUNK):
+        refs = [collection.document(document_id(k)) for k in keys[start:start + GET_ALL_CHUNK]]
+        for snap in client.get_all(refs, field_paths=[MARKER_FIELD]):
+            if snap.exists and applied_id in ((snap.to_dict() or {}).get(MARKER_FIELD) or []):
+                applied.add(snap.id)
+    return applied
+
+
+def apply(args, sketches):
+    """Merge into analytics_sketches/{group} server-side, so shards and days just add up"""
+    if args.emulator:
+        os.environ['FIRESTORE_EMULATOR_HOST'] = args.emulator
+    from google.cloud import firestore
+    client = firestore.Client(project=args.project)
+    applied_id = build_id(sketches)
+    applied = already_applied(client, list(sketches), applied_id)
+    items = [(key, metrics) for key, metrics in sketches.items() if document_id(key) not in applied]
+    for start in range(0, len(items), MAX_BATCH_WRITES):
+        batch = client.batch()
+        for key, metrics in items[start:start + MAX_BATCH_WRITES]:
+            payload = {'group': key, MARKER_FIELD: firestore.ArrayUnion([applied_id])}
+            for metric, sketch in metrics.items():
+                if not sketch.count:
+                    continue
+                payload[metric] = {
+                    'accuracy': sketch.accuracy,
+                    'count': firestore.Increment(sketch.count),
+                    'zero': firestore.Increment(sketch.zero),
+                    'sum': firestore.Increment(sketch.total),
+                    'min': firestore.Minimum(sketch.min),
+                    'max': firestore.Maximum(sketch.max),
+                    'bins': {str(k): firestore.Increment(v) for k, v in sketch.bins.items()},
+                }
+            batch.set(client.collection('analytics_sketches').document(document_id(key)), payload, merge=True)
+        batch.commit()
+    print(f"✅ Merged {len(items):,} groups into analytics_sketches (build {applied_id})")
+    if applied:
+        print(f"📋 {len(applied):,} groups already carried build {applied_id}; skipped")
+
+
+def print_quantiles(key, metrics, quantiles):
+    for metric, sketch in metrics.items():
+        parts = '  '.join(f'p{q * 100:g} {sketch.quantile(q):.1f}' for q in quantiles) if sketch.count else '-'
+        print(f"  {key:<40} {metric:<17} n={sketch.count:<8,} {parts}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mergeable quantile sketches for attempt scores and times')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help='one streaming pass over an attempts export')
+    build_parser.add_argument('exams', help='exams export (NDJSON)')
+    build_parser.add_argument('attempts', help='exam_attempts export (NDJSON or CSV)')
+    build_parser.add_argument('--profiles', help='student profiles export (NDJSON with userId) for sections')
+    build_parser.add_argument('--accuracy', type=float, default=0.01, help='relative accuracy of quantiles')
+    build_parser.add_argument('--output', default='sketches.json')
+    build_parser.add_argument('--verify', action='store_true', help='check the error bound and merging')
+    build_parser.add_argument('--apply', action='store_true', help='merge into analytics_sketches in Firestore')
+    build_parser.add_argument('--project', default=DEFAULT_PROJECT)
+    build_parser.add_argument('--emulator', help='Firestore emulator host, e.g. localhost:8080')
+    merge_parser = commands.add_parser('merge', help='combine sketch files from shards or days')
+    merge_parser.add_argument('inputs', nargs='+')
+    merge_parser.add_argument('--output', required=True)
+    query_parser = commands.add_parser('query', help='print quantiles of one group')
+    query_parser.add_argument('sketches')
+    query_parser.add_argument('group', help='e.g. exam:abc123, term:Prelim, "section:Grade 7|Ruby|Prelim"')
+    query_parser.add_argument('--quantiles', default='0.5,0.9,0.99')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("Score and time-spent quantile sketches")
+    print("=" * 80)
+
+    if args.command == 'merge':
+        merged = {}
+        for path in args.inputs:
+            merge_into(merged, load(path))
+            print(f"  merged {path}")
+        save(args.output, merged)
+        print(f"✅ {len(merged):,} groups written to {args.output}")
+    elif args.command == 'query':
+        sketches = load(args.sketches)
+        if args.group not in sketches:
+            print(f"❌ No group {args.group}")
+            sys.exit(1)
+        print_quantiles(args.group, sketches[args.group], [float(q) for q in args.quantiles.split(',')])
+    else:
+        exams = {e['id']: e for e in read_records(args.exams)}
+        profiles = {p['userId']: p for p in read_records(args.profiles)} if args.profiles else {}
+
+        print(f"\n[1/2] Sketching {args.attempts}...")
+        started = time.perf_counter()
+        sketches = build(read_records(args.attempts), exams, profiles, args.accuracy)
+        elapsed = time.perf_counter() - started
+        save(args.output, sketches)
+        size = Path(args.output).stat().st_size
+        print(f"✅ {len(sketches):,} groups in {elapsed:.2f}s, {size:,} bytes "
+              f"({size / max(1, len(sketches)):,.0f} bytes per group)")
+        for key in sorted(k for k in sketches if k.startswith('term:')):
+            print_quantiles(key, sketches[key], DEFAULT_QUANTILES)
+
+        print("\n[2/2] Verifying...")
+        if args.verify:
+            if not verify(args, exams, profiles, sketches):
+                sys.exit(1)
+        else:
+            print("📋 Skipped (use --verify)")
+        if args.apply:
+            apply(args, sketches)
+
+    print("\n" + "=" * 80)
+    print("✅ COMPLETE!")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
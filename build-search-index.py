@@ -0,0 +1,654 @@
+"""
+Build a BM25 search index over study materials and the question bank
+
+StudyMaterialsScreen and the exam screens have no search, and filtering on
+the client means downloading every StudyMaterial and Exam. This script
+builds an inverted index offline:
+
+    material:{id}                 StudyMaterial title (counted twice), description, subject
+    question:{examId}/{questionId}  Question questionText, exam subject
+
+Text is folded (case, accents), split on non-alphanumerics and common
+English/Filipino stop words are dropped. Documents are ranked with BM25
+(k1 = 1.2, b = 0.75, idf = ln(1 + (N - df + 0.5) / (df + 0.5))).
+
+An index is a directory of segments, each one memory-mappable file pair
+like export-attempts-columnar.py:
+
+    <index>/manifest.json           segments and their deleted documents
+    <index>/<segment>/meta.json     sizes, facet dictionaries, chunk layout
+    <index>/<segment>/data.bin      64-byte aligned chunks:
+        terms      sorted 64-bit term hashes (blake2b), with df and postings start
+        postings   doc numbers (uint32, ascending per term) and term frequencies (uint16)
+        docs       length, kind / gradeLevel / subject codes, key and title strings
+        facets     one bitmap per kind, gradeLevel and subject value
+
+A term is found by binary search over the mapped hash array, its postings
+are a slice, and a facet filter is a bit test on the precomputed bitmap, so
+a query touches only the postings of its terms.
+
+Incremental updates (update) index the changed documents into a new segment
+and mark their older copies (and --delete keys) as deleted in the manifest;
+queries combine all segments with global N, average length and df. Deleted
+documents stay in df until compact rewrites everything into one segment,
+as in Lucene. Updating an exam deletes all of its previously indexed
+questions, so questions removed from the exam disappear too.
+
+Export format:
+    materials  NDJSON (StudyMaterial documents)
+    exams      NDJSON (Exam documents including "questions")
+
+Requirements:
+    pip install numpy
+
+Usage:
+    python build-search-index.py build [--materials FILE] [--exams FILE] [--output search.index]
+    python build-search-index.py update <index> [--materials FILE] [--exams FILE] [--delete KEY ...]
+    python build-search-index.py compact <index>
+    python build-search-index.py query <index> <text> [--grade-level G] [--subject S]
+                                       [--kind material|question] [--top 10]
+    python build-search-index.py benchmark [--documents 500000] [--queries 2000] [--output bench.index]
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import shutil
+import sys
+import time
+import unicodedata
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+K1 = 1.2
+B = 0.75
+TITLE_BOOST = 2
+TITLE_CHARS = 120
+TOKEN = re.compile(r'[a-z0-9]+')
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from in is it of on or the this that to what which who with '
+    'ang ng mga sa na ay at si ni kay ano sino saan para ito iyan'.split())
+FACETS = ('kind', 'gradeLevel', 'subject')
+
+
+def read_records(path):
+    """Yield documents from an NDJSON or JSON array export"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if Path(path).suffix.lower() == '.json':
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def tokenize(text):
+    folded = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii').lower()
+    return [t for t in TOKEN.findall(folded) if len(t) > 1 and t not in STOP_WORDS]
+
+
+_hashes = {}
+
+
+def term_hash(term):
+    value = _hashes.get(term)
+    if value is None:
+        value = _hashes[term] = int.from_bytes(hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest(),
+                                               'little')
+    return value
+
+
+def documents_from(materials_path, exams_path):
+    """Yield (key, kind, title, tokens, gradeLevel, subject) for every searchable document"""
+    if materials_path:
+        for m in read_records(materials_path):
+            title = m.get('title', '')
+            tokens = tokenize(title) * TITLE_BOOST + tokenize(m.get('description', '')) + tokenize(m.get('subject', ''))
+            yield f"material:{m['id']}", 'material', title, tokens, m.get('gradeLevel', ''), m.get('subject', '')
+    if exams_path:
+        for exam in read_records(exams_path):
+            subject = exam.get('subject', '')
+            for q in exam.get('questions') or []:
+                text = q.get('questionText', '')
+                yield (f"question:{exam['id']}/{q['id']}", 'question', text, tokenize(text) + tokenize(subject),
+                       exam.get('gradeLevel', ''), subject)
+
+
+class Dictionary:
+    """String -> small integer code, in first-seen order"""
+
+    def __init__(self, values=()):
+        self.codes = {}
+        self.values = []
+        for value in values:
+            self.encode(value)
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class SegmentData:
+    """Column arrays of one segment before it is written"""
+
+    def __init__(self):
+        self.keys, self.titles = [], []
+        self.dictionaries = {facet: Dictionary() for facet in FACETS}
+        self.codes = {facet: [] for facet in FACETS}
+        self.lengths = []
+        self.posting_hashes, self.posting_docs, self.posting_tfs = [], [], []
+
+    def add(self, key, kind, title, tokens, grade_level, subject):
+        doc = len(self.keys)
+        self.keys.append(key)
+        self.titles.append(title[:TITLE_CHARS])
+        for facet, value in zip(FACETS, (kind, grade_level, subject)):
+            self.codes[facet].append(self.dictionaries[facet].encode(value or ''))
+        self.lengths.append(len(tokens))
+        counts = Counter(tokens)
+        self.posting_hashes.append(np.fromiter((term_hash(t) for t in counts), dtype=np.uint64, count=len(counts)))
+        self.posting_docs.append(np.full(len(counts), doc, dtype=np.uint32))
+        self.posting_tfs.append(np.fromiter(counts.values(), dtype=np.uint16, count=len(counts)))
+
+
+class ChunkWriter:
+    """Appends aligned chunks to data.bin and records where they are"""
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = 0
+
+    def write(self, array):
+        array = np.ascontiguousarray(array)
+        padding = -self.offset % ALIGNMENT
+        self.f.write(b'\0' * padding)
+        self.offset += padding
+        chunk = {'offset': self.offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+        self.f.write(array.tobytes())
+        self.offset += array.nbytes
+        return chunk
+
+    def write_strings(self, values):
+        encoded = [v.encode('utf-8') for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return {
+            'offsets': self.write(offsets),
+            'data': self.write(np.frombuffer(b''.join(encoded), dtype='|u1')),
+        }
+
+
+def write_segment(path, keys, titles, facet_values, facet_codes, lengths, hashes, docs, tfs):
+    """Sort the postings by (term, doc) and write meta.json + data.bin"""
+    path.mkdir(parents=True, exist_ok=True)
+    order = np.lexsort((docs, hashes))
+    hashes, docs, tfs = hashes[order], docs[order], tfs[order]
+    boundaries = np.flatnonzero(np.diff(hashes)) + 1 if len(hashes) else np.array([], dtype=np.int64)
+    starts = np.concatenate(([0], boundaries)).astype('<i8') if len(hashes) else np.zeros(0, dtype='<i8')
+    terms = hashes[starts] if len(hashes) else np.zeros(0, dtype=np.uint64)
+    df = np.diff(np.concatenate((starts, [len(hashes)]))).astype('<u4')
+
+    count = len(keys)
+    meta = {'version': FORMAT_VERSION, 'documents': count, 'totalLength': int(np.sum(lengths, dtype=np.int64)),
+            'terms': len(terms), 'postings': len(hashes), 'facets': {}, 'chunks': {}}
+    with open(path / 'data.bin', 'wb') as f:
+        writer = ChunkWriter(f)
+        chunks = meta['chunks']
+        chunks['termHashes'] = writer.write(terms.astype('<u8'))
+        chunks['termStarts'] = writer.write(starts)
+        chunks['termDf'] = writer.write(df)
+        chunks['postingDocs'] = writer.write(docs.astype('<u4'))
+        chunks['postingTfs'] = writer.write(tfs.astype('<u2'))
+        chunks['lengths'] = writer.write(np.asarray(lengths, dtype='<u4'))
+        chunks['keys'] = writer.write_strings(keys)
+        chunks['titles'] = writer.write_strings(titles)
+        for facet in FACETS:
+            codes = np.asarray(facet_codes[facet], dtype='<u2')
+            chunks[f'{facet}Codes'] = writer.write(codes)
+            meta['facets'][facet] = {value: writer.write(np.packbits(codes == code))
+                                     for code, value in enumerate(facet_values[facet])}
+    with open(path / 'meta.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return meta
+
+
+def write_segment_data(path, data):
+    def concat(arrays, dtype):
+        return np.concatenate(arrays) if arrays else np.zeros(0, dtype=dtype)
+
+    return write_segment(path, data.keys, data.titles,
+                         {facet: d.values for facet, d in data.dictionaries.items()}, data.codes, data.lengths,
+                         concat(data.posting_hashes, np.uint64), concat(data.posting_docs, np.uint32),
+                         concat(data.posting_tfs, np.uint16))
+
+
+class Segment:
+    """Read side of one segment: every array is a view into the mapped data.bin"""
+
+    def __init__(self, path, deleted=()):
+        self.path = Path(path)
+        with open(self.path / 'meta.json', 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta['version'] != FORMAT_VERSION:
+            raise ValueError(f"unsupported format version {self.meta['version']}")
+        self.data = np.memmap(self.path / 'data.bin', dtype='|u1', mode='r') if self.meta['documents'] else None
+        self.count = self.meta['documents']
+        chunk = self.meta['chunks']
+        self.live = np.ones(self.count, dtype=bool)
+        self.live[list(deleted)] = False
+        self._keys = None
+        if self.data is None:
+            return
+        self.term_hashes = self._chunk(chunk['termHashes'])
+        self.term_starts = self._chunk(chunk['termStarts'])
+        self.term_df = self._chunk(chunk['termDf'])
+        self.posting_docs = self._chunk(chunk['postingDocs'])
+        self.posting_tfs = self._chunk(chunk['postingTfs'])
+        self.lengths = self._chunk(chunk['lengths'])
+
+    def _chunk(self, chunk):
+        dtype = np.dtype(chunk['dtype'])
+        count = int(np.prod(chunk['shape'], dtype=np.int64))
+        view = self.data[chunk['offset']:chunk['offset'] + count * dtype.itemsize]
+        return view.view(dtype).reshape(chunk['shape'])
+
+    def strings(self, name):
+        chunk = self.meta['chunks'][name]
+        offsets = self._chunk(chunk['offsets'])
+        data = self._chunk(chunk['data']).tobytes()
+        return [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+    def string(self, name, doc):
+        chunk = self.meta['chunks'][name]
+        offsets = self._chunk(chunk['offsets'])
+        data = self._chunk(chunk['data'])
+        return data[offsets[doc]:offsets[doc + 1]].tobytes().decode('utf-8')
+
+    def keys(self):
+        if self._keys is None:
+            self._keys = self.strings('keys') if self.data is not None else []
+        return self._keys
+
+    def facet_values(self, facet):
+        return list(self.meta['facets'][facet])
+
+    def facet_codes(self, facet):
+        return self._chunk(self.meta['chunks'][f'{facet}Codes'])
+
+    def bitmap(self, facet, value):
+        """Packed bitmap of the documents with this facet value, or None if no document has it"""
+        chunk = self.meta['facets'][facet].get(value)
+        return None if chunk is None else self._chunk(chunk)
+
+    def postings(self, hashed):
+        """(doc numbers, term frequencies) of one term hash; empty if absent"""
+        if self.data is None:
+            return None
+        i = int(np.searchsorted(self.term_hashes, np.uint64(hashed)))
+        if i == len(self.term_hashes) or self.term_hashes[i] != hashed:
+            return None
+        start = int(self.term_starts[i])
+        end = start + int(self.term_df[i])
+        return self.posting_docs[start:end], self.posting_tfs[start:end]
+
+    def df(self, hashed):
+        postings = self.postings(hashed)
+        return 0 if postings is None else len(postings[0])
+
+
+class SearchIndex:
+    """All segments of an index, queried with global BM25 statistics"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / 'manifest.json', 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.segments = [Segment(self.path / s['name'], s.get('deleted', [])) for s in self.manifest['segments']]
+        self.segments = [s for s in self.segments if s.count]
+        self.documents = sum(int(s.live.sum()) for s in self.segments)
+        total = sum(int(s.lengths[s.live].sum(dtype=np.int64)) for s in self.segments)
+        self.average_length = total / self.documents if self.documents else 0.0
+
+    def search(self, text, top=10, **facets):
+        hashed = [term_hash(t) for t in dict.fromkeys(tokenize(text))]
+        if not hashed or not self.documents:
+            return []
+        idf = {}
+        for h in hashed:
+            df = sum(s.df(h) for s in self.segments)
+            if df:
+                idf[h] = np.log(1 + (self.documents - df + 0.5) / (df + 0.5))
+        hits = []
+        for segment in self.segments:
+            bitmaps = []
+            for facet, value in facets.items():
+                if value is None:
+                    continue
+                bitmap = segment.bitmap(facet, value)
+                if bitmap is None:
+                    break
+                bitmaps.append(bitmap)
+            else:
+                hits.extend(self._search_segment(segment, idf, bitmaps, top))
+        hits.sort(key=lambda hit: -hit[0])
+        return [(score, segment.string('keys', doc), segment.string('titles', doc))
+                for score, segment, doc in hits[:top]]
+
+    def _search_segment(self, segment, idf, bitmaps, top):
+        doc_parts, score_parts = [], []
+        for h, weight in idf.items():
+            postings = segment.postings(h)
+            if postings is None:
+                continue
+            docs, tfs = postings
+            keep = segment.live[docs]
+            for bitmap in bitmaps:
+                keep &= ((bitmap[docs >> 3] >> (7 - (docs & 7))) & 1).astype(bool)
+            docs, tfs = docs[keep], tfs[keep].astype(np.float32)
+            norm = K1 * (1 - B + B * segment.lengths[docs] / self.average_length)
+            doc_parts.append(docs)
+            score_parts.append(weight * tfs * (K1 + 1) / (tfs + norm))
+        if not doc_parts:
+            return []
+        docs = np.concatenate(doc_parts)
+        scores = np.concatenate(score_parts)
+        if len(doc_parts) > 1 and len(docs) > segment.count // 16:
+            # Common terms: summing into a dense per-document array beats sorting the candidates
+            scores = np.bincount(docs, weights=scores, minlength=segment.count)
+            docs = np.flatnonzero(scores)
+            scores = scores[docs]
+        elif len(doc_parts) > 1:
+            docs, inverse = np.unique(docs, return_inverse=True)
+            scores = np.bincount(inverse, weights=scores)
+        if len(docs) > top:
+            best = np.argpartition(-scores, top)[:top]
+            docs, scores = docs[best], scores[best]
+        return [(float(s), segment, int(d)) for s, d in zip(scores, docs)]
+
+
+def save_manifest(path, manifest):
+    tmp = Path(path) / 'manifest.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    tmp.replace(Path(path) / 'manifest.json')
+
+
+def build_segment(path, documents):
+    """Index documents into a new segment; a repeated key replaces the earlier copy"""
+    latest = {}
+    for document in documents:
+        latest[document[0]] = document
+    data = SegmentData()
+    for document in latest.values():
+        data.add(*document)
+    return write_segment_data(path, data)
+
+
+def build(output, documents):
+    output = Path(output)
+    if output.exists():
+        shutil.rmtree(output)
+    output.mkdir(parents=True)
+    meta = build_segment(output / 'seg-000001', documents)
+    save_manifest(output, {'version': FORMAT_VERSION, 'nextSegment': 2,
+                           'segments': [{'name': 'seg-000001', 'deleted': []}]})
+    return meta
+
+
+def update(path, documents, delete_keys, delete_prefixes=()):
+    """Add a segment with the changed documents and delete their older copies
+
+    delete_prefixes removes whole groups, e.g. every question of a re-indexed
+    exam, so questions dropped from the exam disappear too.
+    """
+    path = Path(path)
+    with open(path / 'manifest.json', 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    name = f"seg-{manifest['nextSegment']:06d}"
+    meta = build_segment(path / name, documents)
+    replaced = set(Segment(path / name).keys()) | set(delete_keys)
+    prefixes = tuple(delete_prefixes)
+    deleted = 0
+    for entry in manifest['segments']:
+        segment = Segment(path / entry['name'], entry['deleted'])
+        if not segment.count:
+            continue
+        already = set(entry['deleted'])
+        for doc, key in enumerate(segment.keys()):
+            if (key in replaced or (prefixes and key.startswith(prefixes))) and doc not in already:
+                entry['deleted'].append(doc)
+                deleted += 1
+    manifest['segments'].append({'name': name, 'deleted': []})
+    manifest['nextSegment'] += 1
+    save_manifest(path, manifest)
+    return meta, deleted
+
+
+def compact(path):
+    """Rewrite the live documents of all segments into one segment, renumbered in order"""
+    path = Path(path)
+    with open(path / 'manifest.json', 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    keys, titles, lengths = [], [], []
+    dictionaries = {facet: Dictionary() for facet in FACETS}
+    codes = {facet: [] for facet in FACETS}
+    hashes, docs, tfs = [], [], []
+    base = 0
+    for entry in manifest['segments']:
+        segment = Segment(path / entry['name'], entry['deleted'])
+        if not segment.count:
+            continue
+        live = segment.live
+        renumber = np.cumsum(live, dtype=np.int64) - 1 + base
+        keys += [k for k, alive in zip(segment.keys(), live) if alive]
+        titles += [t for t, alive in zip(segment.strings('titles'), live) if alive]
+        lengths.append(np.asarray(segment.lengths)[live])
+        for facet in FACETS:
+            recode = np.array([dictionaries[facet].encode(v) for v in segment.facet_values(facet)], dtype=np.int64)
+            codes[facet].extend(recode[np.asarray(segment.facet_codes(facet))[live]].tolist())
+        term_of_posting = np.repeat(np.asarray(segment.term_hashes), np.asarray(segment.term_df, dtype=np.int64))
+        posting_docs = np.asarray(segment.posting_docs)
+        keep = live[posting_docs]
+        hashes.append(term_of_posting[keep])
+        docs.append(renumber[posting_docs[keep]].astype(np.uint32))
+        tfs.append(np.asarray(segment.posting_tfs)[keep])
+        base += int(live.sum())
+
+    name = f"seg-{manifest['nextSegment']:06d}"
+    meta = write_segment(path / name, keys, titles, {f: d.values for f, d in dictionaries.items()}, codes,
+                         np.concatenate(lengths) if lengths else [],
+                         np.concatenate(hashes) if hashes else np.zeros(0, np.uint64),
+                         np.concatenate(docs) if docs else np.zeros(0, np.uint32),
+                         np.concatenate(tfs) if tfs else np.zeros(0, np.uint16))
+    old = [entry['name'] for entry in manifest['segments']]
+    save_manifest(path, {'version': FORMAT_VERSION, 'nextSegment': manifest['nextSegment'] + 1,
+                         'segments': [{'name': name, 'deleted': []}]})
+    # Old segments are removed only after the manifest no longer lists them
+    for segment_name in old:
+        shutil.rmtree(path / segment_name, ignore_errors=True)
+    return meta
+
+
+def index_size(path):
+    return sum(p.stat().st_size for p in Path(path).rglob('*') if p.is_file())
+
+
+def synthetic_documents(count, seed):
+    """Materials (10%) and questions (90%) with Zipf-distributed words"""
+    rng = np.random.default_rng(seed)
+    syllables = np.array(['ka', 'ma', 'na', 'pa', 'ta', 'sa', 'la', 'ba', 'ga', 'da', 'ri', 'lo', 'to', 'ne',
+                          'mi', 'se', 'ko', 'bu', 'pi', 'tu', 'on', 'an', 'in', 'ay', 'ro'])
+    vocabulary = sorted({''.join(rng.choice(syllables, rng.integers(2, 5))) for _ in range(60_000)})
+    vocabulary = np.array(vocabulary)
+    rng.shuffle(vocabulary)
+    grades = ['Grade 7', 'Grade 8', 'Grade 9', 'Grade 10']
+    subjects = ['Mathematics', 'Science', 'English', 'Filipino', 'Araling Panlipunan', 'MAPEH', 'TLE', 'ESP']
+
+    def words(n):
+        picks = np.minimum(rng.zipf(1.15, n), len(vocabulary)) - 1
+        return ' '.join(vocabulary[picks])
+
+    for i in range(count):
+        grade, subject = grades[i % 4], subjects[(i // 4) % len(subjects)]
+        if i % 10 == 0:
+            material = {'id': f'm{i:07d}', 'title': words(int(rng.integers(3, 8))),
+                        'description': words(int(rng.integers(20, 60))), 'subject': subject, 'gradeLevel': grade}
+            title = material['title']
+            tokens = tokenize(title) * TITLE_BOOST + tokenize(material['description']) + tokenize(subject)
+            yield f"material:{material['id']}", 'material', title, tokens, grade, subject
+        else:
+            text = words(int(rng.integers(8, 30)))
+            yield f'question:e{i // 40:06d}/q{i:07d}', 'question', text, tokenize(text) + tokenize(subject), grade, subject
+
+
+def benchmark(args):
+    print(f"\n[1/3] Building an index of {args.documents:,} synthetic documents...")
+    started = time.perf_counter()
+    documents = list(synthetic_documents(args.documents, args.seed))
+    generated = time.perf_counter() - started
+    started = time.perf_counter()
+    meta = build(args.output, documents)
+    seconds = time.perf_counter() - started
+    text_bytes = sum(len(' '.join(d[3]).encode('utf-8')) for d in documents)
+    size = index_size(args.output)
+    print(f"✅ Generated in {generated:.1f}s, indexed in {seconds:.1f}s: {meta['terms']:,} terms, "
+          f"{meta['postings']:,} postings")
+    print(f"📋 Index {size / 1e6:,.1f} MB for {text_bytes / 1e6:,.1f} MB of tokenized text "
+          f"({size / len(documents):,.0f} bytes per document)")
+
+    print(f"\n[2/3] Timing {args.queries:,} queries...")
+    index = SearchIndex(args.output)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = []
+    for _ in range(args.queries):
+        tokens = documents[int(rng.integers(len(documents)))][3]
+        picks = rng.choice(len(tokens), min(len(tokens), int(rng.integers(1, 4))), replace=False)
+        queries.append(' '.join(tokens[p] for p in picks))
+    for label, facets in (('no filter', {}), ('gradeLevel', {'gradeLevel': 'Grade 8'}),
+                          ('gradeLevel + subject', {'gradeLevel': 'Grade 8', 'subject': 'Science'})):
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, top=10, **facets)
+            latencies.append((time.perf_counter() - started) * 1000)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"  {label:<22} p50 {p50:6.2f} ms   p95 {p95:6.2f} ms   p99 {p99:6.2f} ms")
+
+    print("\n[3/3] Checking ranking against a brute-force BM25 on 20 queries...")
+    mismatches = 0
+    counts = [Counter(d[3]) for d in documents]
+    for query in queries[:20]:
+        got = [score for score, _, _ in index.search(query, top=5)]
+        # Compared by score: documents with equal scores may come in any order
+        if not np.allclose(got, brute_force(documents, counts, query, 5), rtol=1e-5):
+            mismatches += 1
+    print(f"{'✅' if not mismatches else '❌'} {20 - mismatches}/20 top-5 score lists identical")
+
+    started = time.perf_counter()
+    update(args.output, documents[:1000], [])
+    print(f"\n📋 Update of 1,000 documents: {time.perf_counter() - started:.2f}s")
+    started = time.perf_counter()
+    compact(args.output)
+    print(f"📋 Compaction: {time.perf_counter() - started:.2f}s")
+    return mismatches
+
+
+def brute_force(documents, counts, query, top):
+    """Top scores of a plain Python BM25 over all documents (reference for the benchmark)"""
+    terms = list(dict.fromkeys(tokenize(query)))
+    n = len(documents)
+    average = sum(len(d[3]) for d in documents) / n
+    df = {t: sum(1 for c in counts if t in c) for t in terms}
+    scores = []
+    for document, c in zip(documents, counts):
+        score = 0.0
+        for t in terms:
+            if c.get(t):
+                idf = np.log(1 + (n - df[t] + 0.5) / (df[t] + 0.5))
+                score += idf * c[t] * (K1 + 1) / (c[t] + K1 * (1 - B + B * len(document[3]) / average))
+        if score:
+            scores.append(score)
+    scores.sort(reverse=True)
+    return scores[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BM25 search index over study materials and questions')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help='index exports into a new index')
+    build_parser.add_argument('--materials', help='study_materials export (NDJSON)')
+    build_parser.add_argument('--exams', help='exams export (NDJSON)')
+    build_parser.add_argument('--output', default='search.index')
+    update_parser = commands.add_parser('update', help='add changed documents as a new segment')
+    update_parser.add_argument('index')
+    update_parser.add_argument('--materials', help='changed study_materials (NDJSON)')
+    update_parser.add_argument('--exams', help='changed exams (NDJSON); all their questions are re-indexed')
+    update_parser.add_argument('--delete', nargs='*', default=[], help='keys to remove, e.g. material:abc')
+    compact_parser = commands.add_parser('compact', help='merge all segments into one')
+    compact_parser.add_argument('index')
+    query_parser = commands.add_parser('query', help='search an index')
+    query_parser.add_argument('index')
+    query_parser.add_argument('text')
+    query_parser.add_argument('--grade-level')
+    query_parser.add_argument('--subject')
+    query_parser.add_argument('--kind', choices=['material', 'question'])
+    query_parser.add_argument('--top', type=int, default=10)
+    bench_parser = commands.add_parser('benchmark', help='build and query a synthetic corpus')
+    bench_parser.add_argument('--documents', type=int, default=500_000)
+    bench_parser.add_argument('--queries', type=int, default=2000)
+    bench_parser.add_argument('--output', default='bench.index')
+    bench_parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.command == 'query':
+        index = SearchIndex(args.index)
+        started = time.perf_counter()
+        hits = index.search(args.text, top=args.top, kind=args.kind, gradeLevel=args.grade_level,
+                            subject=args.subject)
+        print(f"{len(hits)} results in {(time.perf_counter() - started) * 1000:.2f} ms")
+        for score, key, title in hits:
+            print(f"  {score:7.3f}  {key:<40} {title}")
+        return
+
+    print("=" * 80)
+    print("Search index")
+    print("=" * 80)
+
+    failures = 0
+    if args.command == 'build':
+        if not args.materials and not args.exams:
+            parser.error('give --materials and/or --exams')
+        started = time.perf_counter()
+        meta = build(args.output, documents_from(args.materials, args.exams))
+        print(f"\n✅ {meta['documents']:,} documents, {meta['terms']:,} terms, {meta['postings']:,} postings "
+              f"in {time.perf_counter() - started:.2f}s ({index_size(args.output):,} bytes)")
+    elif args.command == 'update':
+        exam_prefixes = [f"question:{e['id']}/" for e in read_records(args.exams)] if args.exams else []
+        meta, deleted = update(args.index, documents_from(args.materials, args.exams), args.delete, exam_prefixes)
+        print(f"\n✅ {meta['documents']:,} documents added, {deleted:,} older copies deleted")
+    elif args.command == 'compact':
+        meta = compact(args.index)
+        print(f"\n✅ Compacted into {meta['documents']:,} documents ({index_size(args.index):,} bytes)")
+    else:
+        failures = benchmark(args)
+
+    print("\n" + "=" * 80)
+    if failures:
+        print(f"❌ {failures} rankings differ from brute force")
+        sys.exit(1)
+    print("✅ COMPLETE!")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
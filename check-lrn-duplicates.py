@@ -0,0 +1,171 @@
+"""
+Check an enrollment roster for LRN problems before a bulk import
+
+LRN uniqueness is enforced at signup with one lrn_index/{lrn} read per
+student (see LRN_INDEX_SOLUTION.md). For a whole school roster this script
+instead loads an lrn_index export once into a sorted NumPy array of the
+12-digit LRNs packed as int64, then checks the roster in a single pass for:
+
+    format     LRN is not exactly 12 digits
+    roster     the same LRN appears more than once in the roster
+    existing   the LRN is already in lrn_index
+
+Only the conflicting rows are written out.
+
+Index formats:
+    NDJSON/JSON  lrn_index documents ({"id": lrn, "userId": ...} or {"lrn": ...})
+    CSV/TXT      an "lrn" (or "id") column, or one LRN per line
+    NPY          a sorted array saved earlier with --save-index (loads instantly)
+
+Requirements:
+    pip install numpy
+
+Usage:
+    python check-lrn-duplicates.py <lrn_index export> <roster.csv|ndjson>
+                                   [--output lrn_conflicts.csv] [--save-index lrn_index.npy]
+"""
+
+import argparse
+import csv
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+LRN_PATTERN = re.compile(r'^\d{12}$')
+# Pull LRNs out of lrn_index documents without a full JSON parse per line
+DOCUMENT_LRN = re.compile(rb'"(?:id|lrn)"\s*:\s*"(\d{12})"')
+
+
+def load_index(path):
+    """Return a sorted, de-duplicated int64 array of every LRN in the export"""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == '.npy':
+        return np.load(path)
+
+    if suffix in ('.ndjson', '.jsonl', '.json'):
+        values = DOCUMENT_LRN.findall(path.read_bytes())
+    else:
+        lines = path.read_text(encoding='utf-8').splitlines()
+        header = lines[0].split(',') if lines else []
+        column = next((i for i, name in enumerate(header) if name.strip().lower() in ('lrn', 'id')), None)
+        if column is None:
+            values = [line.strip() for line in lines if LRN_PATTERN.match(line.strip())]
+        else:
+            values = [v for v in (line.split(',')[column].strip() for line in lines[1:]) if LRN_PATTERN.match(v)]
+    packed = np.fromiter(map(int, values), dtype=np.int64, count=len(values))
+    packed.sort()
+    if len(packed) > 1:
+        packed = packed[np.concatenate(([True], packed[1:] != packed[:-1]))]
+    return packed
+
+
+def read_roster(path):
+    """Yield (row_number, lrn, record) from a CSV or NDJSON roster"""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.suffix.lower() == '.csv':
+            # Row numbers match the spreadsheet (header is row 1)
+            for row_number, row in enumerate(csv.DictReader(f), start=2):
+                yield row_number, str(row.get('lrn') or '').strip(), row
+        else:
+            for row_number, line in enumerate(f, start=1):
+                if line.strip():
+                    record = json.loads(line)
+                    profile = record.get('profile') or record
+                    yield row_number, str(profile.get('lrn') or '').strip(), record
+
+
+def describe(record):
+    profile = record.get('profile') or record
+    name = ', '.join(p for p in (profile.get('lastName', ''), profile.get('firstName', '')) if p)
+    return record.get('uid', ''), name
+
+
+def check_roster(index, roster_path):
+    """Single pass over the roster; returns (conflicts, rows checked)"""
+    conflicts = []
+    first_seen = {}
+    valid_rows = []
+    valid_lrns = []
+    rows = 0
+    for row_number, lrn, record in read_roster(roster_path):
+        rows += 1
+        uid, name = describe(record)
+        if not LRN_PATTERN.match(lrn):
+            conflicts.append({'row': row_number, 'lrn': lrn, 'uid': uid, 'name': name,
+                              'reason': 'format', 'detail': 'LRN must be exactly 12 digits'})
+            continue
+        if lrn in first_seen:
+            conflicts.append({'row': row_number, 'lrn': lrn, 'uid': uid, 'name': name,
+                              'reason': 'roster', 'detail': f'same LRN as row {first_seen[lrn]}'})
+            continue
+        first_seen[lrn] = row_number
+        valid_rows.append((row_number, lrn, uid, name))
+        valid_lrns.append(lrn)
+
+    if valid_lrns and len(index):
+        packed = np.array(valid_lrns).astype(np.int64)
+        positions = np.searchsorted(index, packed)
+        positions[positions == len(index)] = 0
+        existing = index[positions] == packed
+        for i in np.nonzero(existing)[0]:
+            row_number, lrn, uid, name = valid_rows[i]
+            conflicts.append({'row': row_number, 'lrn': lrn, 'uid': uid, 'name': name,
+                              'reason': 'existing', 'detail': 'already registered in lrn_index'})
+
+    conflicts.sort(key=lambda c: c['row'])
+    return conflicts, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk LRN duplicate and format check for enrollment rosters')
+    parser.add_argument('index', help='lrn_index export (NDJSON, CSV, TXT or NPY)')
+    parser.add_argument('roster', help='roster to check (CSV or NDJSON)')
+    parser.add_argument('--output', default='lrn_conflicts.csv')
+    parser.add_argument('--save-index', help='save the packed index as .npy for faster reloads')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("Checking roster LRNs")
+    print("=" * 80)
+
+    print(f"\n[1/3] Loading {args.index}...")
+    started = time.perf_counter()
+    index = load_index(args.index)
+    print(f"✅ {len(index):,} LRNs in {time.perf_counter() - started:.2f}s ({index.nbytes / 1_048_576:.1f} MiB)")
+    if args.save_index:
+        np.save(args.save_index, index)
+        print(f"✅ Packed index saved to {args.save_index}")
+
+    print(f"\n[2/3] Checking {args.roster}...")
+    started = time.perf_counter()
+    conflicts, rows = check_roster(index, args.roster)
+    print(f"✅ {rows:,} rows checked in {time.perf_counter() - started:.2f}s")
+    for reason in ('format', 'roster', 'existing'):
+        count = sum(1 for c in conflicts if c['reason'] == reason)
+        print(f"  {reason:<10} {count:>8,}")
+
+    print(f"\n[3/3] Writing {args.output}...")
+    with open(args.output, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['row', 'lrn', 'uid', 'name', 'reason', 'detail'])
+        writer.writeheader()
+        writer.writerows(conflicts)
+
+    print("\n" + "=" * 80)
+    if conflicts:
+        print(f"❌ {len(conflicts):,} conflicting rows, see {args.output}")
+    else:
+        print("✅ No LRN conflicts")
+    print("=" * 80)
+    sys.exit(1 if conflicts else 0)
+
+
+if __name__ == "__main__":
+    main()
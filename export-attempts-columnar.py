@@ -0,0 +1,353 @@
+"""
+Convert an exam_attempts export into a columnar, dictionary-encoded format
+
+Every attempt document repeats its question IDs and the answer strings in
+the answers map. This exporter writes the attempts column by column into a
+single data file that can be memory-mapped:
+
+    <output>/meta.json   row groups, column layout and dictionaries
+    <output>/data.bin    column chunks, each aligned to 64 bytes
+
+Rows are grouped per exam (one row group per examId, rows kept in export
+order within a group). Inside a row group the answers are a dense
+(rows x questions) matrix of small integer codes, 0 meaning unanswered; the
+question IDs and the answer strings of that exam are stored once as its
+dictionaries. Repeated strings (studentId, studentName, examTitle, ...) are
+dictionary-encoded over the whole file; numbers are stored as fixed-width
+arrays; attempt IDs are stored as a plain string column.
+
+A reader opens meta.json and maps just the columns it needs, e.g. only
+"score" and "studentId" for leaderboards or one exam's answer matrix for
+item analysis. See AttemptColumns below.
+
+Requirements:
+    pip install numpy
+
+Usage:
+    python export-attempts-columnar.py <attempts.ndjson|csv> [--output attempts.cols]
+                                       [--exams exams.ndjson] [--verify]
+
+    --exams   order each row group's question columns like the exam
+    --verify  decode every row again and compare it with the export
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+NULL_LONG = np.iinfo(np.int64).min
+
+# Typed ExamAttempt fields; anything else is kept in the dictionary-encoded "extra" column
+NUMERIC_FIELDS = {
+    'startedAt': '<i8',
+    'submittedAt': '<i8',
+    'score': '<i4',
+    'totalPoints': '<i4',
+    'percentage': '<f8',
+    'passed': '|u1',
+    'timeSpentMinutes': '<i4',
+}
+DICTIONARY_FIELDS = ['examId', 'examTitle', 'teacherId', 'studentId', 'studentName', 'studentEmail']
+
+
+def read_records(path):
+    """Yield documents from an NDJSON, JSON array or CSV export"""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.suffix.lower() == '.csv':
+            for row in csv.DictReader(f):
+                if row.get('answers'):
+                    row['answers'] = json.loads(row['answers'])
+                yield row
+        elif path.suffix.lower() == '.json':
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class Dictionary:
+    """String -> small integer code, in first-seen order"""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def code_dtype(size):
+    """Narrowest unsigned type for codes 0..size"""
+    for dtype in ('|u1', '<u2', '<u4'):
+        if size <= np.iinfo(np.dtype(dtype)).max:
+            return dtype
+    raise ValueError(f'dictionary too large: {size:,}')
+
+
+def to_number(field, value):
+    if value is None or value == '':
+        return NULL_LONG if field == 'submittedAt' else 0
+    if field == 'passed':
+        return int(value in (True, 'true', 'True', 1))
+    if field == 'percentage':
+        return float(value)
+    return int(value)
+
+
+class ColumnWriter:
+    """Appends aligned chunks to data.bin and records where they are"""
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = 0
+
+    def write(self, array):
+        array = np.ascontiguousarray(array)
+        padding = -self.offset % ALIGNMENT
+        self.f.write(b'\0' * padding)
+        self.offset += padding
+        chunk = {'offset': self.offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+        self.f.write(array.tobytes())
+        self.offset += array.nbytes
+        return chunk
+
+    def write_strings(self, values):
+        encoded = [v.encode('utf-8') for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return {
+            'offsets': self.write(offsets),
+            'data': self.write(np.frombuffer(b''.join(encoded), dtype='|u1')),
+        }
+
+
+def export(records, output, exam_questions):
+    """Encode the attempts and write meta.json + data.bin; returns the row count"""
+    dictionaries = {field: Dictionary() for field in DICTIONARY_FIELDS + ['extra']}
+    groups = defaultdict(lambda: {
+        'ids': [], 'columns': defaultdict(list), 'answers': [],
+        'questions': Dictionary(), 'values': Dictionary(),
+    })
+    known = set(NUMERIC_FIELDS) | set(DICTIONARY_FIELDS) | {'id', 'answers'}
+
+    for record in records:
+        exam_id = record.get('examId', '')
+        group = groups[exam_id]
+        if not group['ids'] and exam_id in exam_questions:
+            for question_id in exam_questions[exam_id]:
+                group['questions'].encode(question_id)
+        group['ids'].append(str(record.get('id', '')))
+        for field in DICTIONARY_FIELDS:
+            group['columns'][field].append(dictionaries[field].encode(str(record.get(field) or '')))
+        for field in NUMERIC_FIELDS:
+            group['columns'][field].append(to_number(field, record.get(field)))
+        extra = {k: v for k, v in record.items() if k not in known}
+        extra = json.dumps(extra, ensure_ascii=False, sort_keys=True) if extra else ''
+        group['columns']['extra'].append(dictionaries['extra'].encode(extra))
+        # Answer codes start at 1 so that 0 can mean "no answer"
+        group['answers'].append([(group['questions'].encode(q), group['values'].encode(a) + 1)
+                                 for q, a in (record.get('answers') or {}).items() if a is not None])
+
+    output.mkdir(parents=True, exist_ok=True)
+    meta = {'version': FORMAT_VERSION, 'rows': 0, 'rowGroups': [], 'dictionaries': {}, 'columns': {}}
+    columns = defaultdict(list)
+    with open(output / 'data.bin', 'wb') as f:
+        writer = ColumnWriter(f)
+        for exam_id, group in groups.items():
+            rows = len(group['ids'])
+            question_count = len(group['questions'].values)
+            matrix = np.zeros((rows, question_count), dtype=code_dtype(len(group['values'].values)))
+            for i, pairs in enumerate(group['answers']):
+                for j, code in pairs:
+                    matrix[i, j] = code
+            meta['rowGroups'].append({
+                'examId': exam_id,
+                'start': meta['rows'],
+                'rows': rows,
+                'questionIds': group['questions'].values,
+                'answerValues': group['values'].values,
+                'answers': writer.write(matrix),
+            })
+            meta['rows'] += rows
+            columns['id'].extend(group['ids'])
+            for field, values in group['columns'].items():
+                columns[field].extend(values)
+
+        meta['columns']['id'] = writer.write_strings(columns['id'])
+        for field in DICTIONARY_FIELDS + ['extra']:
+            dictionary = dictionaries[field].values
+            meta['columns'][field] = writer.write(np.array(columns[field], dtype=code_dtype(len(dictionary))))
+            meta['dictionaries'][field] = writer.write_strings(dictionary)
+        for field, dtype in NUMERIC_FIELDS.items():
+            meta['columns'][field] = writer.write(np.array(columns[field], dtype=dtype))
+
+    with open(output / 'meta.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return meta['rows']
+
+
+class AttemptColumns:
+    """Read side: maps data.bin once and hands out zero-copy column views"""
+
+    def __init__(self, path):
+        path = Path(path)
+        with open(path / 'meta.json', 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta['version'] != FORMAT_VERSION:
+            raise ValueError(f"unsupported format version {self.meta['version']}")
+        self.data = np.memmap(path / 'data.bin', dtype='|u1', mode='r')
+        self.rows = self.meta['rows']
+        self.row_groups = self.meta['rowGroups']
+
+    def _chunk(self, chunk):
+        dtype = np.dtype(chunk['dtype'])
+        count = int(np.prod(chunk['shape'], dtype=np.int64))
+        view = self.data[chunk['offset']:chunk['offset'] + count * dtype.itemsize]
+        return view.view(dtype).reshape(chunk['shape'])
+
+    def _strings(self, chunk):
+        offsets = self._chunk(chunk['offsets'])
+        data = self._chunk(chunk['data']).tobytes()
+        return [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+    def column(self, name):
+        """Numeric values, or dictionary codes for string columns"""
+        if name == 'id':
+            return self._strings(self.meta['columns']['id'])
+        return self._chunk(self.meta['columns'][name])
+
+    def dictionary(self, name):
+        return self._strings(self.meta['dictionaries'][name])
+
+    def answers(self, group):
+        """(rows x questions) answer codes of one row group; code c is group['answerValues'][c - 1]"""
+        return self._chunk(group['answers'])
+
+    def iter_records(self):
+        """Decode back to ExamAttempt dicts (slow path, for --verify and tools that need documents)"""
+        ids = self.column('id')
+        strings = {field: (self.column(field), self.dictionary(field)) for field in DICTIONARY_FIELDS + ['extra']}
+        numbers = {field: self.column(field) for field in NUMERIC_FIELDS}
+        for group in self.row_groups:
+            matrix = self.answers(group)
+            question_ids = group['questionIds']
+            values = group['answerValues']
+            for r in range(group['rows']):
+                row = group['start'] + r
+                record = {'id': ids[row]}
+                for field, (codes, dictionary) in strings.items():
+                    value = dictionary[codes[row]]
+                    if field == 'extra':
+                        record.update(json.loads(value) if value else {})
+                    else:
+                        record[field] = value
+                for field, column in numbers.items():
+                    value = column[row].item()
+                    if field == 'passed':
+                        value = bool(value)
+                    elif field == 'submittedAt' and value == NULL_LONG:
+                        value = None
+                    record[field] = value
+                record['answers'] = {question_ids[j]: values[code - 1]
+                                     for j, code in enumerate(matrix[r].tolist()) if code}
+                yield record
+
+
+def comparable(record):
+    """An export record in the shape iter_records() returns"""
+    known = dict(record)
+    for field in DICTIONARY_FIELDS:
+        known[field] = str(record.get(field) or '')
+    for field in NUMERIC_FIELDS:
+        value = to_number(field, record.get(field))
+        known[field] = None if field == 'submittedAt' and value == NULL_LONG else value
+    known['passed'] = bool(known['passed'])
+    known['id'] = str(record.get('id', ''))
+    known['answers'] = {q: a for q, a in (record.get('answers') or {}).items() if a is not None}
+    return known
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Columnar dictionary-encoded export of exam_attempts')
+    parser.add_argument('attempts', help='exam_attempts export (NDJSON or CSV)')
+    parser.add_argument('--output', default='attempts.cols')
+    parser.add_argument('--exams', help='exams export (NDJSON), for question column order')
+    parser.add_argument('--verify', action='store_true', help='decode every row and compare with the export')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("Columnar attempts export")
+    print("=" * 80)
+
+    exam_questions = {}
+    if args.exams:
+        exam_questions = {e['id']: [q['id'] for q in e.get('questions') or []] for e in read_records(args.exams)}
+
+    print(f"\n[1/3] Encoding {args.attempts}...")
+    started = time.perf_counter()
+    output = Path(args.output)
+    rows = export(read_records(args.attempts), output, exam_questions)
+    print(f"✅ {rows:,} attempts in {time.perf_counter() - started:.2f}s")
+
+    print("\n[2/3] Sizes...")
+    source_size = Path(args.attempts).stat().st_size
+    columnar_size = sum(p.stat().st_size for p in output.iterdir())
+    print(f"  Export:   {source_size:>14,} bytes")
+    print(f"  Columnar: {columnar_size:>14,} bytes ({source_size / columnar_size:.1f}x smaller)")
+    columns = AttemptColumns(output)
+    def nbytes(chunk):
+        if 'offsets' in chunk:
+            return nbytes(chunk['offsets']) + nbytes(chunk['data'])
+        return int(np.prod(chunk['shape'])) * np.dtype(chunk['dtype']).itemsize
+
+    sizes = {name: nbytes(chunk) for name, chunk in columns.meta['columns'].items()}
+    sizes['answers'] = sum(nbytes(g['answers']) for g in columns.row_groups)
+    for name, size in sorted(sizes.items(), key=lambda item: -item[1]):
+        print(f"    {name:<18} {size:>12,} bytes")
+
+    print("\n[3/3] Scanning one column...")
+    started = time.perf_counter()
+    total = int(columns.column('score').sum(dtype=np.int64))
+    print(f"✅ sum(score) = {total:,} in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    if args.verify:
+        print("\n📋 Verifying round trip...")
+        mismatches = 0
+        decoded = columns.iter_records()
+        by_exam = defaultdict(list)
+        for record in read_records(args.attempts):
+            by_exam[record.get('examId', '')].append(record)
+        expected = (comparable(r) for group in columns.row_groups for r in by_exam[group['examId']])
+        for want, got in zip(expected, decoded):
+            if want != got:
+                mismatches += 1
+                if mismatches <= 3:
+                    print(f"  ❌ {want.get('id')}: {json.dumps(want)[:200]} != {json.dumps(got)[:200]}")
+        if mismatches:
+            print(f"❌ {mismatches:,} rows differ")
+            sys.exit(1)
+        print(f"✅ All {rows:,} rows decode to the exported documents")
+
+    print("\n" + "=" * 80)
+    print("✅ COMPLETE!")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,436 @@
+"""
+Incrementally export Firestore collections to local NDJSON
+
+The offline tools (item-analysis.py, regrade-attempts.py, build-leaderboards.py,
+audit-leaderboard-counters.py, ...) all start from exports. Re-downloading
+whole collections for every run is slow and bills every document again.
+This exporter keeps a local copy and only fetches what is new, tracked by a
+per-collection watermark on the field each document gets when it is written:
+
+    exams                  createdAt     (epoch millis)
+    exam_attempts          submittedAt   (epoch millis)
+    users                  createdAt     (epoch millis)
+    special_exam_requests  requestedAt   (epoch millis)
+    student_logs           timestamp     (Firestore Timestamp)
+    profiles               users/{uid}/profiles/* of every exported user, with "userId"
+
+Every run queries field >= watermark - --lookback, so documents written late
+by a device with a slow clock are still picked up. The range up to now is
+split into --slices time slices that are paged through concurrently
+(ordered by the field, start_after the last snapshot of the previous page,
+--page-size documents per page), --concurrency pages in flight overall.
+
+The fields are stamped by the device, so a fast clock can date a document
+in the future. The watermark never moves past the start of the run,
+otherwise one such document would hide every later one; a future-dated
+document is fetched again by each run until its time has passed
+(compaction keeps one copy).
+
+Each run appends one segment per collection:
+
+    <out>/<collection>/segment-<runId>.ndjson
+    <out>/<collection>.ndjson          compacted snapshot
+    <out>/export_state.json            watermarks and pending segments
+
+A document fetched again (lookback) is simply written again; compaction
+merges the snapshot and the segments, the newest copy of each document id
+wins, and runs automatically once --compact-every segments are pending
+(--compact forces it). The compacted <collection>.ndjson files are what the
+other tools read. The state file is replaced atomically after the segments
+are written, so an interrupted run is repeated from the old watermark.
+
+The watermark fields are creation times: later edits (an exam changed in
+EditExamScreen, counters on users) and deletes are not seen. Use
+--full COLLECTION to re-export a collection from scratch and replace its
+snapshot.
+
+Requirements:
+    pip install google-cloud-firestore
+
+Usage:
+    python export-firestore-changes.py [--out firestore_export] [--collections exams,exam_attempts,...]
+                                       [--lookback SECONDS] [--slices N] [--page-size N]
+                                       [--concurrency N] [--compact] [--compact-every N]
+                                       [--full COLLECTION ...]
+                                       [--project ID] [--emulator HOST:PORT] [--emulator-test]
+
+    --emulator-test  seed the emulator in three waves (late and fast-clock
+                     stamps included), export after each, compact and
+                     compare the snapshots with the collections
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_PROJECT = 'online-examination-8372d'
+GET_ALL_CHUNK = 100
+MAX_BATCH_WRITES = 500
+# collection -> (watermark field, stored as Firestore Timestamp)
+COLLECTIONS = {
+    'exams': ('createdAt', False),
+    'exam_attempts': ('submittedAt', False),
+    'users': ('createdAt', False),
+    'special_exam_requests': ('requestedAt', False),
+    'student_logs': ('timestamp', True),
+}
+PROFILES = 'profiles'
+STATE_FILE = 'export_state.json'
+
+
+def to_millis(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp() * 1000)
+    if isinstance(value, (int, float)):
+        return int(value)
+    return None
+
+
+def encode(value):
+    """JSON encoding for Firestore values: timestamps become epoch millis"""
+    if isinstance(value, datetime):
+        return to_millis(value)
+    return str(value)
+
+
+def document_key(name, document):
+    return f"{document['userId']}/{document['id']}" if name == PROFILES else document['id']
+
+
+class ExportState:
+    """Watermarks and pending segments per collection, persisted as JSON"""
+
+    def __init__(self, out):
+        self.path = Path(out) / STATE_FILE
+        self.data = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+
+    def collection(self, name):
+        return self.data.setdefault(name, {'watermark': None, 'segments': [], 'documents': 0})
+
+    def save(self):
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+async def oldest_value(client, name):
+    """Watermark field of the oldest document, where the first run starts"""
+    field = COLLECTIONS[name][0]
+    query = client.collection(name).order_by(field).limit(1)
+    async for snap in query.stream():
+        return to_millis(snap.to_dict().get(field))
+    return None
+
+
+async def fetch_collection(client, name, since, args, semaphore, stats):
+    """All documents with field >= since, read as concurrent paginated slices"""
+    field, is_timestamp = COLLECTIONS[name]
+    start = since if since is not None else await oldest_value(client, name)
+    if start is None:
+        return []
+    now = int(time.time() * 1000)
+    width = max(1, (now - start) // args.slices)
+    bounds = [start + i * width for i in range(args.slices)] if now > start else [start]
+
+    def value(millis):
+        return datetime.fromtimestamp(millis / 1000, tz=timezone.utc) if is_timestamp else millis
+
+    async def read_slice(low, high):
+        documents = []
+        last = None
+        while True:
+            query = client.collection(name).where(field, '>=', value(low))
+            if high is not None:
+                query = query.where(field, '<', value(high))
+            query = query.order_by(field).limit(args.page_size)
+            if last is not None:
+                query = query.start_after(last)
+            async with semaphore:
+                page = [snap async for snap in query.stream()]
+            stats['pages'] += 1
+            stats['reads'] += max(1, len(page))
+            for snap in page:
+                documents.append({**snap.to_dict(), 'id': snap.id})
+            if len(page) < args.page_size:
+                return documents
+            last = page[-1]
+
+    # The last slice is open-ended so documents stamped ahead of this machine's clock are included
+    highs = bounds[1:] + [None]
+    parts = await asyncio.gather(*(read_slice(low, high) for low, high in zip(bounds, highs)))
+    return [document for part in parts for document in part]
+
+
+async def fetch_profiles(client, users, semaphore, stats):
+    """users/{uid}/profiles/{student|teacher} of the exported users, with "userId" added"""
+    refs = []
+    for user in users:
+        role = user.get('role', '')
+        if role in ('STUDENT', 'TEACHER'):
+            refs.append(client.document(f"users/{user['id']}/profiles/{role.lower()}"))
+    profiles = []
+
+    async def fetch(chunk):
+        async with semaphore:
+            async for snap in client.get_all(chunk):
+                stats['reads'] += 1
+                if snap.exists:
+                    profiles.append({**snap.to_dict(), 'id': snap.id, 'userId': snap.reference.parent.parent.id})
+
+    await asyncio.gather(*(fetch(refs[i:i + GET_ALL_CHUNK]) for i in range(0, len(refs), GET_ALL_CHUNK)))
+    return profiles
+
+
+def write_segment(out, name, run_id, documents):
+    directory = Path(out) / name
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'segment-{run_id}.ndjson'
+    with open(path, 'w', encoding='utf-8') as f:
+        for document in documents:
+            f.write(json.dumps(document, ensure_ascii=False, default=encode) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    return path.name
+
+
+def compact(out, name, entry, full_segment=False):
+    """Merge the snapshot and pending segments (newest copy of each id wins) into <name>.ndjson
+
+    With full_segment the snapshot is rebuilt from the segment of a --full run
+    (or empty if it found nothing) and everything older is dropped.
+    """
+    snapshot = Path(out) / f'{name}.ndjson'
+    if full_segment is not False:
+        sources = [Path(out) / name / full_segment] if full_segment else []
+    else:
+        sources = [snapshot] if snapshot.exists() else []
+        sources += [Path(out) / name / segment for segment in entry['segments']]
+    latest = {}
+    for source in sources:
+        with open(source, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    latest[document_key(name, json.loads(line))] = line if line.endswith('\n') else line + '\n'
+    tmp = snapshot.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.writelines(latest.values())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, snapshot)
+    done = entry['segments']
+    entry['segments'] = []
+    entry['documents'] = len(latest)
+    return done, len(latest)
+
+
+def remove_segments(out, name, segments):
+    for segment in segments:
+        (Path(out) / name / segment).unlink(missing_ok=True)
+
+
+async def export(client, args):
+    """One incremental export run; returns {collection: documents fetched}"""
+    state = ExportState(args.out)
+    run_started = datetime.now(timezone.utc)
+    run_id = run_started.strftime('%Y%m%dT%H%M%S%f')
+    run_started_ms = int(run_started.timestamp() * 1000)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    stats = {'pages': 0, 'reads': 0}
+    full = set(args.full or [])
+    # Profiles are fetched for the exported users, so one is only complete with the other
+    if full & {'users', PROFILES}:
+        full |= {'users', PROFILES}
+
+    async def run_collection(name):
+        entry = state.collection(name)
+        since = None if name in full or entry['watermark'] is None else entry['watermark'] - args.lookback * 1000
+        return name, await fetch_collection(client, name, since, args, semaphore, stats)
+
+    names = [n for n in args.collections if n != PROFILES]
+    fetched = dict(await asyncio.gather(*(run_collection(n) for n in names)))
+    if PROFILES in args.collections:
+        fetched[PROFILES] = await fetch_profiles(client, fetched.get('users', []), semaphore, stats)
+
+    counts = {}
+    finished = []
+    for name, documents in fetched.items():
+        entry = state.collection(name)
+        counts[name] = len(documents)
+        segment = None
+        if documents:
+            segment = write_segment(args.out, name, run_id, documents)
+            entry['segments'].append(segment)
+        if name in COLLECTIONS:
+            field = COLLECTIONS[name][0]
+            newest = max((m for m in (to_millis(d.get(field)) for d in documents) if m is not None), default=None)
+            if newest is not None:
+                newest = min(newest, run_started_ms)
+                entry['watermark'] = max(entry['watermark'] or newest, newest)
+        if name in full or args.compact or len(entry['segments']) >= args.compact_every:
+            done, total = compact(args.out, name, entry, full_segment=segment if name in full else False)
+            finished.append((name, done))
+            print(f"  🗜️  {name}: compacted {len(done)} segments into {total:,} documents")
+    state.save()
+    # Segments are removed only after the state no longer lists them
+    for name, done in finished:
+        remove_segments(args.out, name, done)
+    return counts, stats, state
+
+
+def seed_documents(rng, wave, count, base_ms):
+    """Synthetic documents for every exported collection (emulator only)"""
+    operations = []
+    for i in range(count):
+        created = base_ms + i * 1000
+        uid = f'w{wave}u{i:05d}'
+        role = 'STUDENT' if i % 10 else 'TEACHER'
+        operations.append((f'users/{uid}', {'uid': uid, 'role': role, 'createdAt': created,
+                                            'totalScore': 0, 'examsTaken': 0}))
+        operations.append((f'users/{uid}/profiles/{role.lower()}',
+                           {'lastName': f'Last{i}', 'firstName': f'First{i}', 'gradeLevelToEnroll': 'Grade 7'}))
+        operations.append((f'exams/w{wave}e{i:05d}', {'title': f'Exam {i}', 'createdAt': created,
+                                                     'gradeLevel': 'Grade 7', 'questions': []}))
+        operations.append((f'exam_attempts/w{wave}a{i:05d}', {'examId': f'w{wave}e{i:05d}', 'studentId': uid,
+                                                             'score': rng.randint(0, 100), 'submittedAt': created}))
+        operations.append((f'special_exam_requests/w{wave}r{i:05d}', {'examId': f'w{wave}e{i:05d}', 'studentId': uid,
+                                                                     'status': 'PENDING', 'requestedAt': created}))
+        operations.append((f'student_logs/w{wave}l{i:05d}', {
+            'studentId': uid, 'eventType': 'Login',
+            'timestamp': datetime.fromtimestamp(created / 1000, tz=timezone.utc)}))
+    return operations
+
+
+async def write_operations(client, operations):
+    semaphore = asyncio.Semaphore(8)
+
+    async def commit(chunk):
+        async with semaphore:
+            batch = client.batch()
+            for path, data in chunk:
+                batch.set(client.document(path), data)
+            await batch.commit()
+
+    await asyncio.gather(*(commit(operations[i:i + MAX_BATCH_WRITES])
+                           for i in range(0, len(operations), MAX_BATCH_WRITES)))
+
+
+async def emulator_test(client, args):
+    """Seed three waves, export after each, compact and compare with the collections"""
+    rng = random.Random(7)
+    now = int(time.time() * 1000)
+    print("\n📋 Wave 1: seeding and exporting...")
+    await write_operations(client, seed_documents(rng, 1, 1200, now - 3_600_000))
+    await export(client, args)
+    print("📋 Wave 2: seeding (including late-stamped documents) and exporting...")
+    # Wave 2 starts inside the lookback window of wave 1, like a device with a slow clock
+    await write_operations(client, seed_documents(rng, 2, 1200, now - 3_600_000 + 1100 * 1000))
+    # ...and one document per collection from a device whose clock is a month fast
+    await write_operations(client, seed_documents(rng, 9, 1, now + 30 * 86_400_000))
+    await export(client, args)
+    print("📋 Wave 3: seeding after the fast-clock documents and exporting...")
+    await write_operations(client, seed_documents(rng, 3, 300, int(time.time() * 1000)))
+    args.compact = True
+    await export(client, args)
+
+    failures = 0
+    for name in args.collections:
+        with open(Path(args.out) / f'{name}.ndjson', 'r', encoding='utf-8') as f:
+            exported = {document_key(name, d): d for d in map(json.loads, f)}
+        if name == PROFILES:
+            expected = {}
+            async for snap in client.collection_group(PROFILES).stream():
+                document = {**snap.to_dict(), 'id': snap.id, 'userId': snap.reference.parent.parent.id}
+                expected[document_key(name, document)] = document
+        else:
+            expected = {snap.id: {**snap.to_dict(), 'id': snap.id}
+                        async for snap in client.collection(name).stream()}
+        expected = {k: json.loads(json.dumps(v, ensure_ascii=False, default=encode)) for k, v in expected.items()}
+        if exported != expected:
+            failures += 1
+            missing = len(set(expected) - set(exported))
+            print(f"  ❌ {name}: {len(exported):,} exported, {len(expected):,} stored, {missing:,} missing")
+        else:
+            print(f"  ✅ {name}: {len(exported):,} documents match")
+    return failures
+
+
+async def run(args):
+    if args.emulator:
+        os.environ['FIRESTORE_EMULATOR_HOST'] = args.emulator
+    from google.cloud import firestore
+    client = firestore.AsyncClient(project=args.project)
+    Path(args.out).mkdir(parents=True, exist_ok=True)
+
+    if args.emulator_test:
+        return await emulator_test(client, args)
+
+    print(f"\n[1/1] Exporting {', '.join(args.collections)}...")
+    started = time.perf_counter()
+    counts, stats, state = await export(client, args)
+    seconds = time.perf_counter() - started
+    for name, count in counts.items():
+        entry = state.collection(name)
+        print(f"  {name:<24} {count:>10,} fetched  {len(entry['segments']):>3} pending segments"
+              f"  watermark {entry.get('watermark')}")
+    print(f"✅ {sum(counts.values()):,} documents, {stats['pages']:,} pages, "
+          f"{stats['reads']:,} document reads in {seconds:.2f}s")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental Firestore export to NDJSON')
+    parser.add_argument('--out', default='firestore_export')
+    parser.add_argument('--collections', default=','.join(list(COLLECTIONS) + [PROFILES]))
+    parser.add_argument('--lookback', type=int, default=600, help='seconds re-read before the watermark')
+    parser.add_argument('--slices', type=int, default=8, help='time slices read concurrently per collection')
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16, help='pages in flight')
+    parser.add_argument('--compact', action='store_true', help='compact every collection after this run')
+    parser.add_argument('--compact-every', type=int, default=8, help='compact once this many segments are pending')
+    parser.add_argument('--full', nargs='+', metavar='COLLECTION', help='re-export from scratch')
+    parser.add_argument('--project', default=DEFAULT_PROJECT)
+    parser.add_argument('--emulator', help='Firestore emulator host, e.g. localhost:8080')
+    parser.add_argument('--emulator-test', action='store_true', help='end-to-end test against the emulator')
+    args = parser.parse_args()
+
+    args.collections = [c.strip() for c in args.collections.split(',') if c.strip()]
+    unknown = [c for c in args.collections + (args.full or []) if c not in COLLECTIONS and c != PROFILES]
+    if unknown:
+        parser.error(f"unknown collections: {', '.join(unknown)}")
+    if PROFILES in args.collections and 'users' not in args.collections:
+        parser.error('profiles are exported with users; add users to --collections')
+    if args.emulator_test and not args.emulator:
+        parser.error('--emulator-test needs --emulator HOST:PORT')
+
+    print("=" * 80)
+    print("Exporting Firestore changes")
+    print("=" * 80)
+
+    failures = asyncio.run(run(args))
+
+    print("\n" + "=" * 80)
+    if failures:
+        print(f"❌ {failures} collections differ from Firestore")
+        sys.exit(1)
+    print("✅ COMPLETE!")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,523 @@
+"""
+Send a notification to many students: chunked, deduplicated, stale tokens pruned
+
+notifyNewExam (functions/index.js) and the sendNotification callable that
+ExamRepository.createExam calls hand every collected token to FCM in one
+list. Nothing is chunked, two accounts signed in on the same device get the
+notification twice, and tokens FCM reports as invalid are never removed,
+so each send is slower than the last. This service:
+
+    1. collects (uid, fcmToken) recipients from the grade_tokens index
+       (--grade), all STUDENT users (--all-students) or an export (--recipients)
+    2. sends each distinct token once, in chunks of 500 (the multicast limit);
+       --concurrency chunks are in flight, each token is one FCM HTTP v1
+       messages:send request over --connections persistent connections
+    3. retries UNAVAILABLE / INTERNAL / QUOTA_EXCEEDED (429, 5xx) with
+       exponential backoff, honouring Retry-After
+    4. folds per-token failures into a prune list: UNREGISTERED,
+       SENDER_ID_MISMATCH and INVALID_ARGUMENT about the registration token
+    5. removes pruned tokens from users/{uid}.fcmToken (only if the user has
+       not registered a new token since the send) and from the grade_tokens
+       shards, in batches of 500 writes; a batch that hits a concurrent write
+       is retried one user per transaction
+
+--stand-in runs a local HTTP server that implements messages:send (with
+latency, stale tokens, and transient 503s) and points the sender at it.
+--self-test N generates N recipients with shared and stale tokens, fans out
+to the stand-in and checks that every valid token was delivered exactly
+once and that exactly the stale tokens were pruned.
+
+Requirements:
+    pip install google-auth               (for the real FCM endpoint)
+    pip install google-cloud-firestore    (for --grade / --all-students / --apply)
+
+Usage:
+    python fan-out-notifications.py (--grade G | --all-students | --recipients users.ndjson)
+                                    --title TEXT --body TEXT [--data KEY=VALUE ...]
+                                    [--concurrency 4] [--connections 64] [--retries 4]
+                                    [--prune-output pruned_tokens.ndjson] [--apply]
+                                    [--endpoint URL] [--stand-in] [--project ID] [--emulator HOST:PORT]
+    python fan-out-notifications.py --prune-only pruned_tokens.ndjson [--project ID] [--emulator HOST:PORT]
+    python fan-out-notifications.py --self-test 20000 [--stand-in-latency 20]
+
+    --apply        write the prune list to Firestore (otherwise it is only
+                   written to --prune-output)
+    --prune-only   apply a prune list written by an earlier dry run, without
+                   sending anything
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import random
+import string
+import sys
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_PROJECT = 'online-examination-8372d'
+FCM_ENDPOINT = 'https://fcm.googleapis.com'
+FCM_SCOPE = 'https://www.googleapis.com/auth/firebase.messaging'
+MULTICAST_LIMIT = 500
+MAX_BATCH_WRITES = 500
+GET_ALL_CHUNK = 100
+PRUNE_CODES = {'UNREGISTERED', 'SENDER_ID_MISMATCH'}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def read_records(path):
+    """Yield documents from an NDJSON or JSON array export"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if Path(path).suffix.lower() == '.json':
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def shard_of(uid, shard_count):
+    """Same placement as build-grade-tokens.py"""
+    return zlib.crc32(uid.encode('utf-8')) % shard_count
+
+
+class FcmSender:
+    """FCM HTTP v1 messages:send with one persistent connection per worker thread"""
+
+    def __init__(self, endpoint, project, retries, timeout=30):
+        parts = urlsplit(endpoint)
+        self.secure = parts.scheme == 'https'
+        self.host = parts.netloc
+        self.path = f'/v1/projects/{project}/messages:send'
+        self.retries = retries
+        self.timeout = timeout
+        self.local = threading.local()
+        self.credentials = None
+        self.credentials_lock = threading.Lock()
+        if endpoint == FCM_ENDPOINT:
+            import google.auth
+            self.credentials, _ = google.auth.default(scopes=[FCM_SCOPE])
+
+    def _connection(self):
+        if getattr(self.local, 'connection', None) is None:
+            cls = http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+            self.local.connection = cls(self.host, timeout=self.timeout)
+        return self.local.connection
+
+    def _headers(self):
+        headers = {'Content-Type': 'application/json; UTF-8'}
+        if self.credentials is not None:
+            with self.credentials_lock:
+                if not self.credentials.valid:
+                    import google.auth.transport.requests
+                    self.credentials.refresh(google.auth.transport.requests.Request())
+                headers['Authorization'] = f'Bearer {self.credentials.token}'
+        return headers
+
+    def _post(self, body):
+        connection = self._connection()
+        try:
+            connection.request('POST', self.path, body=body, headers=self._headers())
+            response = connection.getresponse()
+            return response.status, response.getheader('Retry-After'), response.read()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            self.local.connection = None
+            return None, None, b''
+
+    def send(self, token, message):
+        """Send to one token; returns (ok, errorCode, attempts)"""
+        body = json.dumps({'message': {**message, 'token': token}}).encode('utf-8')
+        for attempt in range(1, self.retries + 2):
+            status, retry_after, payload = self._post(body)
+            if status == 200:
+                return True, None, attempt
+            if status is not None and status not in RETRY_STATUSES:
+                return False, error_code(status, payload), attempt
+            if attempt <= self.retries:
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else 0.2 * 2 ** (attempt - 1)
+                time.sleep(delay * (0.5 + random.random()))
+        return False, 'UNAVAILABLE' if status is None else error_code(status, payload), attempt
+
+
+def error_code(status, payload):
+    """FcmError errorCode of an HTTP v1 error response; INVALID_TOKEN for bad registration tokens"""
+    try:
+        error = json.loads(payload or b'{}').get('error', {})
+    except ValueError:
+        error = {}
+    for detail in error.get('details', []):
+        if detail.get('errorCode'):
+            code = detail['errorCode']
+            break
+    else:
+        code = error.get('status') or f'HTTP_{status}'
+    # INVALID_ARGUMENT is also returned for a bad payload; only a token complaint means the token is bad
+    if code == 'INVALID_ARGUMENT' and 'registration token' in error.get('message', ''):
+        return 'INVALID_TOKEN'
+    return code
+
+
+async def fan_out(sender, tokens, message, concurrency, connections):
+    """Send to every token in chunks of MULTICAST_LIMIT; returns {token: (ok, errorCode, attempts)}"""
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {}
+    with ThreadPoolExecutor(max_workers=connections) as pool:
+
+        async def send_chunk(chunk):
+            async with semaphore:
+                outcomes = await asyncio.gather(*(loop.run_in_executor(pool, sender.send, t, message)
+                                                  for t in chunk))
+            results.update(zip(chunk, outcomes))
+
+        await asyncio.gather(*(send_chunk(tokens[i:i + MULTICAST_LIMIT])
+                               for i in range(0, len(tokens), MULTICAST_LIMIT)))
+    return results
+
+
+def dedupe(recipients):
+    """{token: [uids]} from (uid, token, grade) recipients; a shared device is notified once"""
+    holders = defaultdict(list)
+    for uid, token, _ in recipients:
+        if token:
+            holders[token].append(uid)
+    return holders
+
+
+def firestore_client(project, emulator):
+    if emulator:
+        os.environ['FIRESTORE_EMULATOR_HOST'] = emulator
+    from google.cloud import firestore
+    return firestore.Client(project=project)
+
+
+def recipients_from_index(client, grade):
+    """(uid, token, grade) from grade_tokens/{grade}/shards, as ExamRepository reads them"""
+    recipients = []
+    for shard in client.collection('grade_tokens').document(grade).collection('shards').stream():
+        for uid, token in (shard.to_dict().get('tokens') or {}).items():
+            recipients.append((uid, token, grade))
+    return recipients
+
+
+def recipients_from_users(client):
+    """(uid, token, None) for every STUDENT with a token, as notifyNewExam collects them"""
+    query = client.collection('users').where('role', '==', 'STUDENT')
+    return [(snap.id, snap.get('fcmToken'), None) for snap in query.stream() if snap.to_dict().get('fcmToken')]
+
+
+def recipients_from_export(path):
+    recipients = []
+    for record in read_records(path):
+        uid = record.get('uid') or record.get('id') or record.get('userId')
+        grade = record.get('gradeLevel') or (record.get('profile') or {}).get('gradeLevelToEnroll')
+        if uid and record.get('fcmToken'):
+            recipients.append((uid, record['fcmToken'], grade))
+    return recipients
+
+
+def prune_user(client, uid, token, shard_refs):
+    """Clear one user's token in a transaction (re-reads it); returns False if it changed"""
+    from google.cloud import firestore
+
+    ref = client.collection('users').document(uid)
+
+    @firestore.transactional
+    def clear(transaction):
+        snap = ref.get(field_paths=['fcmToken'], transaction=transaction)
+        if not snap.exists or (snap.to_dict() or {}).get('fcmToken') != token:
+            return False
+        transaction.update(ref, {'fcmToken': firestore.DELETE_FIELD})
+        for shard in shard_refs:
+            transaction.set(shard, {'tokens': {uid: firestore.DELETE_FIELD}}, merge=True)
+        return True
+
+    return clear(client.transaction())
+
+
+def prune(client, pruned, holders, grades):
+    """Clear pruned tokens from users and grade_tokens; returns (users cleared, skipped, batches, retried)
+
+    Each user's writes stay in one batch of at most 500. The user update carries a
+    last_update_time precondition, so a user who writes in between fails the whole
+    batch; that batch's users are then re-read and pruned one transaction each, and
+    the remaining batches carry on.
+    """
+    from google.api_core.exceptions import FailedPrecondition
+    from google.cloud import firestore
+
+    uids = sorted({uid for token in pruned for uid in holders[token]})
+    token_of = {uid: token for token in pruned for uid in holders[token]}
+    shard_counts = {snap.id: snap.to_dict().get('shardCount', 1)
+                    for snap in client.collection('grade_tokens').stream()}
+
+    def shard_refs(uid):
+        return [client.document(f'grade_tokens/{grade}/shards/{shard_of(uid, shard_counts[grade])}')
+                for grade in ([grades[uid]] if grades.get(uid) in shard_counts else shard_counts)]
+
+    units = []
+    skipped = 0
+    for start in range(0, len(uids), GET_ALL_CHUNK):
+        refs = [client.collection('users').document(uid) for uid in uids[start:start + GET_ALL_CHUNK]]
+        for snap in client.get_all(refs, field_paths=['fcmToken']):
+            if not snap.exists:
+                continue
+            # A user who signed in again since the send has a new token; keep it
+            if (snap.to_dict() or {}).get('fcmToken') != token_of[snap.id]:
+                skipped += 1
+                continue
+            units.append((snap.id, snap.reference, snap.update_time, shard_refs(snap.id)))
+
+    batches = []
+    for unit in units:
+        if not batches or sum(1 + len(u[3]) for u in batches[-1]) + 1 + len(unit[3]) > MAX_BATCH_WRITES:
+            batches.append([])
+        batches[-1].append(unit)
+
+    cleared = 0
+    retried = 0
+    for group in batches:
+        batch = client.batch()
+        for uid, ref, update_time, shards in group:
+            batch.update(ref, {'fcmToken': firestore.DELETE_FIELD},
+                         option=client.write_option(last_update_time=update_time))
+            for shard in shards:
+                batch.set(shard, {'tokens': {uid: firestore.DELETE_FIELD}}, merge=True)
+        try:
+            batch.commit()
+            cleared += len(group)
+        except FailedPrecondition:
+            # Nothing in the batch was written; retry its users one by one
+            retried += len(group)
+            for uid, _, _, shards in group:
+                if prune_user(client, uid, token_of[uid], shards):
+                    cleared += 1
+                else:
+                    skipped += 1
+    return cleared, skipped, len(batches), retried
+
+
+def read_prune_list(path):
+    """(pruned tokens, {token: [uids]}, {uid: grade}) from a --prune-output file"""
+    pruned, holders, grades = [], {}, {}
+    for record in read_records(path):
+        pruned.append(record['token'])
+        holders[record['token']] = record['uids']
+        grades.update(record.get('grades') or {})
+    return pruned, holders, grades
+
+
+class StandIn:
+    """Local messages:send stand-in: latency, stale/invalid tokens, transient 503s"""
+
+    def __init__(self, latency_ms, transient_rate, seed=1):
+        self.received = Counter()
+        self.delivered = Counter()
+        self.lock = threading.Lock()
+        rng = random.Random(seed)
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                token = body['message']['token']
+                if latency_ms:
+                    time.sleep(latency_ms / 1000)
+                with stand_in.lock:
+                    stand_in.received[token] += 1
+                    transient = rng.random() < transient_rate
+                if transient:
+                    self.reply(503, {'error': {'code': 503, 'status': 'UNAVAILABLE', 'message': 'try again'}},
+                               retry_after='0')
+                elif token.startswith('stale'):
+                    self.reply(404, {'error': {'code': 404, 'status': 'NOT_FOUND', 'message': 'entity not found',
+                                               'details': [{'errorCode': 'UNREGISTERED'}]}})
+                elif token.startswith('bad'):
+                    self.reply(400, {'error': {'code': 400, 'status': 'INVALID_ARGUMENT',
+                                               'message': 'The registration token is not a valid FCM registration token',
+                                               'details': [{'errorCode': 'INVALID_ARGUMENT'}]}})
+                else:
+                    with stand_in.lock:
+                        stand_in.delivered[token] += 1
+                    self.reply(200, {'name': f'projects/stand-in/messages/{token[:12]}'})
+
+            def reply(self, status, payload, retry_after=None):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                if retry_after is not None:
+                    self.send_header('Retry-After', retry_after)
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.endpoint = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def synthetic_recipients(count, seed):
+    """Students with realistic tokens; some share a device, some tokens are stale or invalid"""
+    rng = random.Random(seed)
+    recipients = []
+    previous = None
+    for i in range(count):
+        roll = rng.random()
+        if previous and roll < 0.05:
+            token = previous
+        elif roll < 0.08:
+            token = 'stale' + ''.join(rng.choices(string.ascii_letters + string.digits, k=147))
+        elif roll < 0.09:
+            token = 'bad' + ''.join(rng.choices(string.ascii_letters, k=20))
+        else:
+            token = ''.join(rng.choices(string.ascii_letters + string.digits, k=152))
+        recipients.append((f'seed{i:07d}', token, rng.choice(['Grade 7', 'Grade 8', 'Grade 9', 'Grade 10'])))
+        previous = token
+    return recipients
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Chunked, deduplicated notification fan-out with token pruning')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--grade', help='notify the students of one grade (grade_tokens index)')
+    source.add_argument('--all-students', action='store_true', help='notify every STUDENT user')
+    source.add_argument('--recipients', help='users export (NDJSON with uid and fcmToken)')
+    source.add_argument('--self-test', type=int, metavar='N', help='N synthetic recipients against the stand-in')
+    source.add_argument('--prune-only', metavar='FILE',
+                        help='apply an existing --prune-output file without sending')
+    parser.add_argument('--title', default='New Exam Available!')
+    parser.add_argument('--body', default='')
+    parser.add_argument('--data', nargs='*', default=[], metavar='KEY=VALUE')
+    parser.add_argument('--concurrency', type=int, default=4, help='chunks of 500 tokens in flight')
+    parser.add_argument('--connections', type=int, default=64, help='parallel HTTP connections')
+    parser.add_argument('--retries', type=int, default=4)
+    parser.add_argument('--prune-output', default='pruned_tokens.ndjson')
+    parser.add_argument('--apply', action='store_true', help='remove pruned tokens in Firestore')
+    parser.add_argument('--endpoint', default=FCM_ENDPOINT)
+    parser.add_argument('--stand-in', action='store_true', help='send to a local messages:send stand-in')
+    parser.add_argument('--stand-in-latency', type=float, default=20, help='stand-in latency per request (ms)')
+    parser.add_argument('--project', default=DEFAULT_PROJECT)
+    parser.add_argument('--emulator', help='Firestore emulator host, e.g. localhost:8080')
+    args = parser.parse_args()
+    if not (args.grade or args.all_students or args.recipients or args.self_test or args.prune_only):
+        parser.error('give --grade, --all-students, --recipients, --self-test or --prune-only')
+
+    print("=" * 80)
+    print("Notification fan-out")
+    print("=" * 80)
+
+    if args.prune_only:
+        pruned, holders, grades = read_prune_list(args.prune_only)
+        print(f"\n📋 {len(pruned):,} tokens ({sum(len(u) for u in holders.values()):,} users) "
+              f"read from {args.prune_only}")
+        client = firestore_client(args.project, args.emulator)
+        cleared, skipped, batches, retried = prune(client, pruned, holders, grades)
+        print(f"✅ Cleared {cleared:,} users in {batches:,} batches ({skipped:,} had a newer token, "
+              f"{retried:,} retried one by one)")
+        print("\n" + "=" * 80)
+        print("✅ COMPLETE!")
+        print("=" * 80)
+        return
+
+    print("\n[1/3] Collecting recipients...")
+    client = None
+    if args.grade or args.all_students or args.apply:
+        client = firestore_client(args.project, args.emulator)
+    if args.self_test:
+        recipients = synthetic_recipients(args.self_test, seed=1)
+    elif args.recipients:
+        recipients = recipients_from_export(args.recipients)
+    elif args.grade:
+        recipients = recipients_from_index(client, args.grade)
+    else:
+        recipients = recipients_from_users(client)
+    holders = dedupe(recipients)
+    grades = {uid: grade for uid, _, grade in recipients if grade}
+    tokens = list(holders)
+    print(f"✅ {len(recipients):,} recipients, {len(tokens):,} distinct tokens "
+          f"({len(recipients) - len(tokens):,} duplicates dropped), {-(-len(tokens) // MULTICAST_LIMIT):,} chunks")
+
+    stand_in = None
+    endpoint = args.endpoint
+    if args.stand_in or args.self_test:
+        stand_in = StandIn(args.stand_in_latency, transient_rate=0.01)
+        endpoint = stand_in.endpoint
+        print(f"📋 Stand-in messaging endpoint at {endpoint}")
+
+    print("\n[2/3] Sending...")
+    message = {'notification': {'title': args.title, 'body': args.body}}
+    if args.data:
+        message['data'] = dict(item.split('=', 1) for item in args.data)
+    sender = FcmSender(endpoint, args.project, args.retries)
+    started = time.perf_counter()
+    results = asyncio.run(fan_out(sender, tokens, message, args.concurrency, args.connections))
+    seconds = time.perf_counter() - started
+    sent = sum(1 for ok, _, _ in results.values() if ok)
+    failures = Counter(code for ok, code, _ in results.values() if not ok)
+    retried = sum(1 for _, _, attempts in results.values() if attempts > 1)
+    print(f"✅ {sent:,} of {len(tokens):,} tokens delivered in {seconds:.2f}s "
+          f"({len(tokens) / seconds if seconds else 0:,.0f} tokens/s, {retried:,} retried)")
+    for code, count in failures.most_common():
+        print(f"  ⚠️  {code}: {count:,}")
+
+    print("\n[3/3] Pruning...")
+    pruned = [t for t, (ok, code, _) in results.items() if not ok and (code in PRUNE_CODES or code == 'INVALID_TOKEN')]
+    with open(args.prune_output, 'w', encoding='utf-8') as f:
+        for token in pruned:
+            record = {'token': token, 'errorCode': results[token][1], 'uids': holders[token]}
+            known = {uid: grades[uid] for uid in holders[token] if uid in grades}
+            if known:
+                record['grades'] = known
+            f.write(json.dumps(record) + '\n')
+    print(f"✅ {len(pruned):,} tokens ({sum(len(holders[t]) for t in pruned):,} users) "
+          f"written to {args.prune_output}")
+    if args.apply:
+        cleared, skipped, batches, retried = prune(client, pruned, holders, grades)
+        print(f"✅ Cleared {cleared:,} users in {batches:,} batches ({skipped:,} had a newer token, "
+              f"{retried:,} retried one by one)")
+    else:
+        print(f"📋 Dry run, use --apply or --prune-only {args.prune_output} to remove them in Firestore")
+
+    failed = 0
+    if args.self_test:
+        valid = {t for t in tokens if not t.startswith(('stale', 'bad'))}
+        duplicates = sum(1 for t in valid if stand_in.delivered[t] != 1)
+        expected_prune = {t for t in tokens if t.startswith(('stale', 'bad'))}
+        failed = duplicates + len(expected_prune ^ set(pruned))
+        print(f"\n{'✅' if not duplicates else '❌'} {len(valid) - duplicates:,} of {len(valid):,} "
+              f"valid tokens delivered exactly once")
+        print(f"{'✅' if expected_prune == set(pruned) else '❌'} Prune list matches the "
+              f"{len(expected_prune):,} stale and invalid tokens")
+    if stand_in:
+        stand_in.close()
+
+    print("\n" + "=" * 80)
+    if failed:
+        print("❌ Self-test failed")
+        sys.exit(1)
+    print("✅ COMPLETE!")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""
+Find students registered more than once (entity resolution over StudentInfo)
+
+A student who signs up again with another email, or with a mistyped LRN,
+gets a second account that lrn_index does not catch and that
+ManageUsersScreen cannot spot. Comparing every pair of profiles is
+quadratic; this script compares only pairs that share a blocking key:
+
+    name-year    Soundex(lastName) + Soundex(firstName) + birth year
+    surname-dob  Soundex(lastName) + dateOfBirth     (first name typed differently)
+    first-dob    Soundex(firstName) + dateOfBirth    (surname typed differently)
+    lrn          first 10 digits of the LRN          (typo in the serial)
+
+A duplicate only has to agree on one key, so a typo in one field is caught
+through another. Phonetic surname + birth year alone would put every
+"Santos" or "Reyes" of a year into one block; adding the first name keeps
+blocks small. Blocks larger than --max-block (common names born the same
+day) are skipped and reported.
+
+Candidate pairs are scored with weighted field similarities, renormalized
+over the fields both profiles have:
+
+    lastName 0.25, firstName 0.20, middleName 0.10   Jaro-Winkler on folded names
+    dateOfBirth 0.20   1 equal, 0.8 day/month swapped, 0.5 two parts equal
+    lrn 0.15           1 equal, 0.9 one digit differs, 0.85 adjacent digits swapped
+    address 0.10       barangay and cityMunicipality equal
+
+Names are folded (case, accents, punctuation, spacing) before comparison.
+Both profiles need a dateOfBirth to be reported.
+
+--synthetic N generates N profiles with planted duplicates (LRN typos,
+name typos, accents, swapped day/month, new address) and reports recall
+and precision against them.
+
+Export format:
+    profiles  NDJSON (StudentInfo documents with a "userId" field, or users
+              with a nested "profile" as read by seed-firestore.py)
+
+Usage:
+    python find-duplicate-students.py <profiles.ndjson> [--threshold 0.85] [--max-block 1000]
+                                      [--output duplicate_students.csv]
+    python find-duplicate-students.py --synthetic 100000 [--duplicates 0.02] [--seed 1]
+"""
+
+import argparse
+import csv
+import json
+import random
+import re
+import sys
+import time
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+WEIGHTS = {'lastName': 0.25, 'firstName': 0.20, 'middleName': 0.10, 'dateOfBirth': 0.20,
+           'lrn': 0.15, 'address': 0.10}
+NOT_LETTERS = re.compile(r'[^a-z ]+')
+WHITESPACE = re.compile(r'\s+')
+SOUNDEX_CODES = {c: d for letters, d in (('bfpv', '1'), ('cgjkqsxz', '2'), ('dt', '3'), ('l', '4'),
+                                         ('mn', '5'), ('r', '6')) for c in letters}
+
+
+def read_records(path):
+    """Yield documents from an NDJSON or JSON array export"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if Path(path).suffix.lower() == '.json':
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def to_profile(record):
+    """StudentInfo fields + userId from a profile or a user-with-profile record"""
+    if isinstance(record.get('profile'), dict):
+        return {**record['profile'], 'userId': record.get('uid') or record.get('id', '')}
+    return {**record, 'userId': record.get('userId') or record.get('id', '')}
+
+
+@lru_cache(maxsize=None)
+def fold(name):
+    """Lower case, accents removed (Peña -> pena), letters and single spaces only"""
+    text = unicodedata.normalize('NFKD', name or '').encode('ascii', 'ignore').decode('ascii').lower()
+    return WHITESPACE.sub(' ', NOT_LETTERS.sub(' ', text)).strip()
+
+
+@lru_cache(maxsize=None)
+def soundex(name):
+    letters = fold(name).replace(' ', '')
+    if not letters:
+        return ''
+    code = letters[0].upper()
+    previous = SOUNDEX_CODES.get(letters[0], '')
+    for c in letters[1:]:
+        digit = SOUNDEX_CODES.get(c, '')
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        if c not in 'hw':
+            previous = digit
+    return code.ljust(4, '0')
+
+
+def parse_date(text):
+    """(month, day, year) from MM/DD/YYYY (the app's format) or YYYY-MM-DD"""
+    parts = re.split(r'[/\-.]', (text or '').strip())
+    if len(parts) != 3 or not all(p.isdigit() for p in parts):
+        return None
+    if len(parts[0]) == 4:
+        year, month, day = parts
+    else:
+        month, day, year = parts
+    return int(month), int(day), int(year)
+
+
+@lru_cache(maxsize=1 << 20)
+def jaro_winkler(a, b):
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    window = max(0, max(len(a), len(b)) // 2 - 1)
+    used = [False] * len(b)
+    matches_a = []
+    for i, c in enumerate(a):
+        for j in range(max(0, i - window), min(len(b), i + window + 1)):
+            if not used[j] and b[j] == c:
+                used[j] = True
+                matches_a.append(c)
+                break
+    if not matches_a:
+        return 0.0
+    matches_b = [b[j] for j in range(len(b)) if used[j]]
+    m = len(matches_a)
+    transpositions = sum(x != y for x, y in zip(matches_a, matches_b)) / 2
+    jaro = (m / len(a) + m / len(b) + (m - transpositions) / m) / 3
+    prefix = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefix += 1
+    return jaro + prefix * 0.1 * (1 - jaro)
+
+
+def date_similarity(a, b):
+    if a == b:
+        return 1.0
+    if sorted(a[:2]) == sorted(b[:2]) and a[2] == b[2]:
+        return 0.8
+    return 0.5 if sum(x == y for x, y in zip(a, b)) == 2 else 0.0
+
+
+def lrn_similarity(a, b):
+    if a == b:
+        return 1.0
+    if len(a) != len(b):
+        return 0.0
+    differences = [i for i, (x, y) in enumerate(zip(a, b)) if x != y]
+    if len(differences) == 1:
+        return 0.9
+    if len(differences) == 2 and differences[1] == differences[0] + 1 \
+            and a[differences[0]] == b[differences[1]] and a[differences[1]] == b[differences[0]]:
+        return 0.85
+    return 0.0
+
+
+def prepare(profile):
+    """Comparison fields of one profile: folded names, parsed date, digits, address"""
+    date = parse_date(profile.get('dateOfBirth', ''))
+    lrn = re.sub(r'\D', '', str(profile.get('lrn', '')))
+    address = (fold(profile.get('barangay', '')), fold(profile.get('cityMunicipality', '')))
+    return {
+        'lastName': fold(profile.get('lastName', '')),
+        'firstName': fold(profile.get('firstName', '')),
+        'middleName': fold(profile.get('middleName', '')),
+        'dateOfBirth': date,
+        'lrn': lrn if len(lrn) == 12 else '',
+        'address': address if any(address) else None,
+    }
+
+
+def blocking_keys(profile, fields):
+    last, first = soundex(profile.get('lastName', '')), soundex(profile.get('firstName', ''))
+    date = fields['dateOfBirth']
+    keys = []
+    if last and first and date:
+        keys.append(f'name-year|{last}{first}|{date[2]}')
+    if date:
+        dob = f'{date[2]}-{date[0]:02d}-{date[1]:02d}'
+        if last:
+            keys.append(f'surname-dob|{last}|{dob}')
+        if first:
+            keys.append(f'first-dob|{first}|{dob}')
+    if fields['lrn']:
+        keys.append(f"lrn|{fields['lrn'][:10]}")
+    return keys
+
+
+def score(a, b):
+    """Weighted similarity over the fields both profiles have, and the per-field values"""
+    total = weight = 0.0
+    detail = {}
+    for field, w in WEIGHTS.items():
+        x, y = a[field], b[field]
+        if not x or not y:
+            continue
+        if field == 'dateOfBirth':
+            s = date_similarity(x, y)
+        elif field == 'lrn':
+            s = lrn_similarity(x, y)
+        elif field == 'address':
+            s = ((x[0] == y[0]) + (x[1] == y[1])) / 2
+        else:
+            s = jaro_winkler(x, y) if x < y else jaro_winkler(y, x)
+        detail[field] = s
+        total += w * s
+        weight += w
+    # Names and a near LRN alone are not enough evidence: neighbouring serials of
+    # one school are different students, and common names repeat
+    if 'dateOfBirth' not in detail or weight < 0.6:
+        return 0.0, detail
+    return total / weight, detail
+
+
+def candidate_pairs(keys_per_profile, max_block):
+    blocks = defaultdict(list)
+    for index, keys in enumerate(keys_per_profile):
+        for key in keys:
+            blocks[key].append(index)
+    pairs = set()
+    skipped = []
+    for key, members in blocks.items():
+        if len(members) < 2:
+            continue
+        if len(members) > max_block:
+            skipped.append((key, len(members)))
+            continue
+        for x, i in enumerate(members):
+            for j in members[x + 1:]:
+                pairs.add((i, j) if i < j else (j, i))
+    return pairs, blocks, skipped
+
+
+def synthetic_profiles(count, duplicate_share, seed):
+    """Profiles with planted duplicates; returns (profiles, set of duplicate userId pairs)"""
+    rng = random.Random(seed)
+    syllables = ['ba', 'ca', 'da', 'ga', 'la', 'ma', 'na', 'pa', 'ra', 'sa', 'ta', 'vi', 'lo', 'ne', 'to',
+                 'so', 'ri', 'qui', 'gon', 'mar', 'tes', 'dez', 'nez', 'llo', 'ña']
+    surnames = ['Santos', 'Reyes', 'Cruz', 'Bautista', 'Ocampo', 'Garcia', 'Mendoza', 'Torres',
+                'Villanueva', 'Ramos', 'Aquino', 'Navarro', 'Castillo', 'Flores', 'Dela Cruz']
+    surnames += [''.join(rng.choices(syllables, k=rng.randint(2, 4))).capitalize() for _ in range(4000)]
+    first_names = ['Juan', 'Maria', 'Jose', 'Ana', 'Mark', 'Angel', 'John Paul', 'Kristine', 'Christian',
+                   'Nicole', 'Joshua', 'Princess', 'Carlo', 'Jasmine', 'Miguel', 'Andrea', 'Paolo', 'Bea']
+    first_names += [''.join(rng.choices(syllables, k=rng.randint(2, 3))).capitalize() for _ in range(600)]
+    cities = [f'City {i}' for i in range(40)]
+
+    def typo(text):
+        if len(text) < 3:
+            return text
+        i = rng.randrange(1, len(text) - 1)
+        edit = rng.random()
+        if edit < 0.4:
+            return text[:i] + rng.choice('aeioulnrst') + text[i + 1:]
+        if edit < 0.7:
+            return text[:i] + text[i + 1:]
+        return text[:i - 1] + text[i] + text[i - 1] + text[i + 1:]
+
+    profiles = []
+    for n in range(count):
+        # Common surnames are much more frequent, as in real rosters
+        last = rng.choice(surnames[:15]) if rng.random() < 0.3 else rng.choice(surnames)
+        city = rng.choice(cities)
+        profiles.append({
+            'userId': f'u{n:07d}',
+            'lrn': f'{rng.randrange(100000, 999999)}{rng.randint(18, 23)}{rng.randrange(10000):04d}',
+            'lastName': last,
+            'firstName': rng.choice(first_names),
+            'middleName': rng.choice(surnames) if rng.random() < 0.8 else '',
+            'dateOfBirth': f'{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/{rng.randint(2008, 2013)}',
+            'barangay': f'Barangay {rng.randrange(60)}',
+            'cityMunicipality': city,
+        })
+    planted = set()
+    for n in rng.sample(range(count), int(count * duplicate_share)):
+        copy = dict(profiles[n], userId=f'd{n:07d}')
+        for _ in range(rng.randint(1, 2)):
+            change = rng.choice(['lrn', 'lrn-swap', 'last', 'first', 'middle', 'accent', 'dob', 'moved', 'case'])
+            if change == 'lrn':
+                i = rng.randrange(6, 12)
+                copy['lrn'] = copy['lrn'][:i] + str((int(copy['lrn'][i]) + rng.randint(1, 9)) % 10) + copy['lrn'][i + 1:]
+            elif change == 'lrn-swap':
+                i = rng.randrange(6, 11)
+                lrn = copy['lrn']
+                copy['lrn'] = lrn[:i] + lrn[i + 1] + lrn[i] + lrn[i + 2:]
+            elif change == 'last':
+                copy['lastName'] = typo(copy['lastName'])
+            elif change == 'first':
+                copy['firstName'] = typo(copy['firstName'])
+            elif change == 'middle':
+                copy['middleName'] = ''
+            elif change == 'accent':
+                copy['lastName'] = copy['lastName'].replace('n', 'ñ', 1)
+            elif change == 'dob':
+                month, day, year = copy['dateOfBirth'].split('/')
+                copy['dateOfBirth'] = f'{day}/{month}/{year}' if int(day) <= 12 else f'{month}/{day}/{int(year) + 1}'
+            elif change == 'moved':
+                copy['barangay'], copy['cityMunicipality'] = f'Barangay {rng.randrange(60)}', rng.choice(cities)
+            else:
+                copy['lastName'], copy['firstName'] = copy['lastName'].upper(), copy['firstName'].upper()
+        profiles.append(copy)
+        planted.add((profiles[n]['userId'], copy['userId']))
+    rng.shuffle(profiles)
+    return profiles, planted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Blocking-based duplicate student detection')
+    parser.add_argument('profiles', nargs='?', help='profiles export (NDJSON)')
+    parser.add_argument('--threshold', type=float, default=0.85)
+    parser.add_argument('--max-block', type=int, default=1000, help='skip blocking keys shared by more profiles')
+    parser.add_argument('--output', default='duplicate_students.csv')
+    parser.add_argument('--synthetic', type=int, metavar='N', help='benchmark on N generated profiles')
+    parser.add_argument('--duplicates', type=float, default=0.02, help='synthetic: share of planted duplicates')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    if not args.profiles and not args.synthetic:
+        parser.error('give a profiles export or --synthetic N')
+
+    print("=" * 80)
+    print("Finding duplicate students")
+    print("=" * 80)
+
+    print("\n[1/4] Loading profiles...")
+    planted = None
+    if args.synthetic:
+        profiles, planted = synthetic_profiles(args.synthetic, args.duplicates, args.seed)
+        print(f"✅ {len(profiles):,} synthetic profiles, {len(planted):,} planted duplicates")
+    else:
+        profiles = [to_profile(r) for r in read_records(args.profiles)]
+        print(f"✅ {len(profiles):,} profiles")
+
+    started = time.perf_counter()
+    print("\n[2/4] Blocking...")
+    fields = [prepare(p) for p in profiles]
+    keys = [blocking_keys(p, f) for p, f in zip(profiles, fields)]
+    pairs, blocks, skipped = candidate_pairs(keys, args.max_block)
+    all_pairs = len(profiles) * (len(profiles) - 1) // 2
+    print(f"✅ {len(blocks):,} blocks, {len(pairs):,} candidate pairs instead of {all_pairs:,} "
+          f"({all_pairs / max(1, len(pairs)):,.0f}x fewer comparisons)")
+    for key, size in sorted(skipped, key=lambda s: -s[1])[:5]:
+        print(f"  ⚠️  block {key} skipped ({size:,} profiles)")
+
+    print("\n[3/4] Scoring candidate pairs...")
+    matches = []
+    for i, j in pairs:
+        similarity, detail = score(fields[i], fields[j])
+        if similarity >= args.threshold:
+            matches.append((similarity, i, j, detail))
+    matches.sort(key=lambda m: -m[0])
+    elapsed = time.perf_counter() - started
+    print(f"✅ {len(matches):,} likely duplicates at >= {args.threshold}")
+
+    print(f"\n[4/4] Writing {args.output}...")
+    columns = ['lrn', 'lastName', 'firstName', 'middleName', 'dateOfBirth', 'barangay', 'cityMunicipality']
+    with open(args.output, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['score', 'userIdA', 'userIdB'] + [f'{c}A' for c in columns] + [f'{c}B' for c in columns]
+                        + ['fieldScores'])
+        for similarity, i, j, detail in matches:
+            a, b = profiles[i], profiles[j]
+            writer.writerow([f'{similarity:.3f}', a['userId'], b['userId']]
+                            + [a.get(c, '') for c in columns] + [b.get(c, '') for c in columns]
+                            + [json.dumps({k: round(v, 3) for k, v in detail.items()})])
+    print(f"✅ {len(matches):,} pairs written")
+
+    if planted is not None:
+        found = {tuple(sorted((profiles[i]['userId'], profiles[j]['userId']))) for _, i, j, _ in matches}
+        expected = {tuple(sorted(p)) for p in planted}
+        candidates = {tuple(sorted((profiles[i]['userId'], profiles[j]['userId']))) for i, j in pairs}
+        recall = len(found & expected) / len(expected) if expected else 1.0
+        precision = len(found & expected) / len(found) if found else 1.0
+        blocked = len(candidates & expected) / len(expected) if expected else 1.0
+        print(f"\n📋 Pairs completeness (planted pairs that share a block): {blocked:.1%}")
+        print(f"{'✅' if recall >= 0.95 else '⚠️ '} Recall {recall:.1%}, precision {precision:.1%}")
+
+    print("\n" + "=" * 80)
+    print("✅ COMPLETE!")
+    print(f"📋 {len(profiles):,} profiles in {elapsed:.2f}s")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
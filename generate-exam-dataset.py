@@ -0,0 +1,405 @@
+"""
+Generate a synthetic exam dataset for benchmarking the analytics tools
+
+Writes realistic, reproducible exports (same --seed, same files) shaped like
+the Firestore documents the app creates:
+
+    users.ndjson          User + "profile" roster (input for seed-firestore.py)
+    profiles.ndjson       StudentInfo + "userId" (input for build-leaderboards.py)
+    exams.ndjson          Exam documents with their Questions
+    attempts.ndjson       ExamAttempt documents, graded like submitExamAttempt
+    student_logs.ndjson   StudentLog "Login" and "Tab Change" events
+
+Answers follow a two-parameter logistic model: every student has an ability
+theta ~ N(0, --ability-sd), every question a difficulty b ~ N(--difficulty-mean,
+--difficulty-sd) and a discrimination a ~ logNormal(0, 0.3), and a student
+answers correctly with probability 1 / (1 + exp(-a (theta - b))). Wrong
+multiple choice / true-false answers pick another option; correct short
+answers vary in case and surrounding spaces like real input.
+
+Students start inside the exam window, skewed towards the deadline by
+--skew (1 = uniform, larger = more last-minute starts). A --cheaters share of
+attempts produces bursts of tab changes.
+
+Exams are generated one at a time and written out immediately, so memory
+is bounded by the largest exam, not the dataset. With --time-order, attempts
+(by startedAt) and logs (by timestamp) are written in global time order
+through sorted per-exam runs and a k-way merge, which is what
+analyze-proctoring-logs.py expects without --sort.
+
+Requirements:
+    pip install numpy
+
+Usage:
+    python generate-exam-dataset.py [--output-dir dataset] [--students 10000] [--exams 200]
+                                    [--questions 40] [--mix 0.6,0.2,0.2]
+                                    [--participation 0.9] [--skip-rate 0.02]
+                                    [--ability-sd 1.0] [--difficulty-mean 0.0] [--difficulty-sd 1.0]
+                                    [--skew 2.0] [--cheaters 0.03] [--time-order] [--seed 1]
+
+Example (about 4.5 million attempts):
+    python generate-exam-dataset.py --students 100000 --exams 200 --time-order
+"""
+
+import argparse
+import heapq
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+GRADE_SECTIONS = {
+    "Grade 7": ["Sapphire", "Ruby", "Emerald"],
+    "Grade 8": ["Diamond", "Gold", "Silver"],
+    "Grade 9": ["Bronze", "Copper", "Steel"],
+    "Grade 10": ["Platinum", "Rhodium", "Palladium"],
+}
+GRADE_LEVELS = list(GRADE_SECTIONS)
+SUBJECTS = ["Mathematics", "Science", "English", "Filipino",
+            "Technology and Livelihood Education (TLE)",
+            "Music, Arts, Physical Education, and Health (MAPEH)",
+            "Edukasyon sa Pagpapakatao (ESP)", "Araling Panlipunan (AP)"]
+TERMS = ["Prelim", "Midterm", "Finals"]
+QUESTION_TYPES = ["MULTIPLE_CHOICE", "TRUE_FALSE", "SHORT_ANSWER"]
+SHORT_ANSWERS = [
+    ("photosynthesis", ["respiration", "osmosis", "evaporation"]),
+    ("Manila", ["Cebu", "Davao", "Quezon City"]),
+    ("noun", ["verb", "adjective", "adverb"]),
+    ("Jose Rizal", ["Andres Bonifacio", "Emilio Aguinaldo", "Apolinario Mabini"]),
+    ("equator", ["prime meridian", "tropic of cancer", "horizon"]),
+    ("mitochondria", ["nucleus", "ribosome", "cell wall"]),
+]
+LAST_NAMES = ["Santos", "Reyes", "Cruz", "Bautista", "Ocampo", "Garcia", "Mendoza", "Torres",
+              "Villanueva", "Ramos", "Aquino", "Navarro", "Castillo", "Flores", "Dela Cruz"]
+FIRST_NAMES = ["Juan", "Maria", "Jose", "Ana", "Mark", "Angel", "John Paul", "Kristine",
+               "Christian", "Nicole", "Joshua", "Princess", "Carlo", "Jasmine", "Miguel"]
+SCHOOL_YEAR_START = 1_717_200_000_000  # 2024-06-01
+SCHOOL_YEAR_DAYS = 300
+DAY = 86_400_000
+MERGE_FAN_IN = 200
+
+
+def write_students(rng, args, out_dir, created_at):
+    """Write users.ndjson and profiles.ndjson; return (grade index, ability) arrays"""
+    grades = rng.integers(0, len(GRADE_LEVELS), args.students)
+    sections = rng.integers(0, 3, args.students)
+    ability = rng.normal(0.0, args.ability_sd, args.students)
+    last = rng.integers(0, len(LAST_NAMES), args.students)
+    first = rng.integers(0, len(FIRST_NAMES), args.students)
+    with open(out_dir / 'users.ndjson', 'w', encoding='utf-8') as users, \
+            open(out_dir / 'profiles.ndjson', 'w', encoding='utf-8') as profiles:
+        for i in range(args.students):
+            uid = f's{i:07d}'
+            grade = GRADE_LEVELS[grades[i]]
+            profile = {
+                'lrn': f'{100000000000 + i}',
+                'lastName': LAST_NAMES[last[i]],
+                'firstName': FIRST_NAMES[first[i]],
+                'middleName': '',
+                'gradeLevelToEnroll': grade,
+                'section': GRADE_SECTIONS[grade][sections[i]],
+            }
+            users.write(json.dumps({
+                'uid': uid, 'email': f'{uid}@students.example.com',
+                'username': f"{profile['firstName']} {profile['lastName']}",
+                'role': 'STUDENT', 'isVerified': True, 'emailVerified': True,
+                'createdAt': created_at, 'totalScore': 0, 'examsTaken': 0, 'profile': profile,
+            }, ensure_ascii=False) + '\n')
+            profiles.write(json.dumps({'userId': uid, **profile}, ensure_ascii=False) + '\n')
+    names = [f'{FIRST_NAMES[f]} {LAST_NAMES[l]}' for f, l in zip(first.tolist(), last.tolist())]
+    return grades, ability, names
+
+
+def make_exam(rng, args, number, mix):
+    """One Exam document plus the per-question model parameters"""
+    exam_id = f'e{number:05d}'
+    grade = GRADE_LEVELS[rng.integers(0, len(GRADE_LEVELS))]
+    subject = SUBJECTS[rng.integers(0, len(SUBJECTS))]
+    # Exams are spread over the school year; the term follows the calendar
+    day = int(number * SCHOOL_YEAR_DAYS / max(1, args.exams))
+    start = SCHOOL_YEAR_START + day * DAY + int(rng.integers(7, 16)) * 3_600_000
+    end = start + int(rng.integers(1, 8)) * DAY
+    duration = int(rng.choice([30, 45, 60, 90]))
+
+    types = rng.choice(len(QUESTION_TYPES), size=args.questions, p=mix)
+    difficulty = rng.normal(args.difficulty_mean, args.difficulty_sd, args.questions)
+    discrimination = rng.lognormal(0.0, 0.3, args.questions)
+    questions, keys, choices = [], [], []
+    for j, kind in enumerate(types.tolist()):
+        question_type = QUESTION_TYPES[kind]
+        if question_type == 'MULTIPLE_CHOICE':
+            options = [f'Option {letter}' for letter in 'ABCD']
+            key = int(rng.integers(0, 4))
+            answer_choices = options
+        elif question_type == 'TRUE_FALSE':
+            options = ['True', 'False']
+            key = int(rng.integers(0, 2))
+            answer_choices = options
+        else:
+            correct, distractors = SHORT_ANSWERS[rng.integers(0, len(SHORT_ANSWERS))]
+            options = []
+            # Index 0..3 are accepted spellings of the key, the rest are wrong
+            answer_choices = [correct, correct.capitalize(), f' {correct}', f'{correct.upper()} '] + distractors
+            key = 0
+        questions.append({
+            'id': f'{exam_id}_q{j}',
+            'questionText': f'{subject} question {j + 1}',
+            'type': question_type,
+            'options': options,
+            'correctAnswer': answer_choices[key],
+            'points': 10,
+            'explanation': '',
+        })
+        keys.append(key)
+        choices.append(answer_choices)
+    exam = {
+        'id': exam_id,
+        'title': f'{subject} {TERMS[min(2, day * 3 // SCHOOL_YEAR_DAYS)]} Exam {number + 1}',
+        'description': '',
+        'subject': subject,
+        'gradeLevel': grade,
+        'durationMinutes': duration,
+        'totalPoints': 10 * args.questions,
+        'passingScore': 60,
+        'teacherId': f't{int(rng.integers(0, max(1, args.exams // 10))):04d}',
+        'teacherName': 'Teacher',
+        'createdAt': start - 2 * DAY,
+        'startDate': start,
+        'endDate': end,
+        'startTime': '',
+        'endTime': '',
+        'active': True,
+        'questions': questions,
+        'questionCount': len(questions),
+        'term': TERMS[min(2, day * 3 // SCHOOL_YEAR_DAYS)],
+    }
+    return exam, types, np.array(keys), choices, difficulty, discrimination
+
+
+def make_attempts(rng, args, exam, model, students, ability, names):
+    """Yield (startedAt, attempt, logs) for every student who takes the exam"""
+    types, keys, choices, difficulty, discrimination = model
+    n, q = len(students), len(keys)
+    if n == 0:
+        return
+
+    logits = discrimination[None, :] * (ability[students][:, None] - difficulty[None, :])
+    correct = rng.random((n, q)) < 1.0 / (1.0 + np.exp(-logits))
+    skipped = rng.random((n, q)) < args.skip_rate
+    # Choice index per cell: the key (or an accepted spelling) when correct, another choice otherwise
+    picked = np.empty((n, q), dtype=np.int64)
+    for j in range(q):
+        if QUESTION_TYPES[types[j]] == 'SHORT_ANSWER':
+            right = rng.integers(0, 4, n)
+            wrong = rng.integers(4, len(choices[j]), n)
+        else:
+            k = len(choices[j])
+            right = np.full(n, keys[j])
+            wrong = (keys[j] + rng.integers(1, k, n)) % k
+        picked[:, j] = np.where(correct[:, j], right, wrong)
+    earned = correct & ~skipped
+    scores = earned.sum(axis=1) * 10
+
+    window = exam['endDate'] - exam['startDate']
+    duration = exam['durationMinutes'] * 60_000
+    # Beta(1, skew) measured back from the deadline: larger skew = later starts
+    before_deadline = rng.beta(1.0, args.skew, n) * max(0, window - duration)
+    started = (exam['endDate'] - duration - before_deadline).astype(np.int64)
+    minutes = np.clip(rng.gamma(4.0, exam['durationMinutes'] / 8.0, n), 1, exam['durationMinutes'])
+    submitted = started + (minutes * 60_000).astype(np.int64)
+
+    cheater = rng.random(n) < args.cheaters
+    tab_changes = np.where(cheater, rng.poisson(6, n), rng.poisson(0.2, n))
+    login_lead = rng.integers(10_000, 600_000, n)
+
+    question_ids = [question['id'] for question in exam['questions']]
+    answer_text = [np.array(c, dtype=object) for c in choices]
+    columns = [answer_text[j][picked[:, j]] for j in range(q)]
+    rows = np.stack(columns, axis=1).tolist() if q else [[] for _ in range(n)]
+    skipped_rows = skipped.tolist()
+
+    for i in np.argsort(started, kind='stable').tolist():
+        student = int(students[i])
+        uid = f's{student:07d}'
+        attempt_id = f"{exam['id']}_{uid}"
+        percentage = scores[i] / exam['totalPoints'] * 100
+        attempt = {
+            'id': attempt_id,
+            'examId': exam['id'],
+            'examTitle': exam['title'],
+            'teacherId': exam['teacherId'],
+            'studentId': uid,
+            'studentName': names[student],
+            'studentEmail': f'{uid}@students.example.com',
+            'startedAt': int(started[i]),
+            'submittedAt': int(submitted[i]),
+            'answers': {qid: a for qid, a, skip in zip(question_ids, rows[i], skipped_rows[i]) if not skip},
+            'score': int(scores[i]),
+            'totalPoints': exam['totalPoints'],
+            'percentage': float(percentage),
+            # Firestore stores ExamAttempt.isPassed without the "is" prefix
+            'passed': bool(percentage >= exam['passingScore']),
+            'timeSpentMinutes': int(minutes[i]),
+        }
+        logs = [(int(started[i] - login_lead[i]), 'Login', 'Student logged in successfully.')]
+        if tab_changes[i]:
+            span = int(submitted[i] - started[i])
+            if cheater[i]:
+                # A burst: most switches within a couple of minutes of each other
+                center = started[i] + rng.integers(0, max(1, span))
+                times = np.clip(center + rng.normal(0, 60_000, tab_changes[i]), started[i], submitted[i])
+            else:
+                times = started[i] + rng.integers(0, max(1, span), tab_changes[i])
+            logs.extend((int(t), 'Tab Change', 'Student switched to another tab during the exam.')
+                        for t in np.sort(times))
+        log_records = [(t, {
+            'id': f'{attempt_id}_l{k}',
+            'studentId': uid,
+            'studentName': names[student],
+            'eventType': event,
+            'eventDetails': details,
+            'timestamp': {'_seconds': t // 1000, '_nanoseconds': (t % 1000) * 1_000_000},
+        }) for k, (t, event, details) in enumerate(logs)]
+        yield int(started[i]), attempt, log_records
+
+
+def merge_runs(paths, destination, work_dir):
+    """k-way merge of key-prefixed sorted runs into destination, stripping the keys"""
+    level = 0
+    while len(paths) > MERGE_FAN_IN:
+        merged = []
+        for start in range(0, len(paths), MERGE_FAN_IN):
+            target = work_dir / f'merge{level}_{start}.run'
+            _merge(paths[start:start + MERGE_FAN_IN], target, keep_keys=True)
+            merged.append(target)
+        paths = merged
+        level += 1
+    _merge(paths, destination, keep_keys=False)
+
+
+def _merge(paths, destination, keep_keys):
+    files = [open(p, 'r', encoding='utf-8') for p in paths]
+    try:
+        with open(destination, 'w', encoding='utf-8') as out:
+            # Keys are fixed-width, so plain string order is time order
+            for line in heapq.merge(*files):
+                out.write(line if keep_keys else line.split('\t', 1)[1])
+    finally:
+        for f in files:
+            f.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seeded synthetic exam / attempt / log generator')
+    parser.add_argument('--output-dir', default='dataset')
+    parser.add_argument('--students', type=int, default=10_000)
+    parser.add_argument('--exams', type=int, default=200)
+    parser.add_argument('--questions', type=int, default=40, help='questions per exam')
+    parser.add_argument('--mix', default='0.6,0.2,0.2', help='MULTIPLE_CHOICE,TRUE_FALSE,SHORT_ANSWER weights')
+    parser.add_argument('--participation', type=float, default=0.9, help='share of a grade taking each exam')
+    parser.add_argument('--skip-rate', type=float, default=0.02, help='share of questions left unanswered')
+    parser.add_argument('--ability-sd', type=float, default=1.0)
+    parser.add_argument('--difficulty-mean', type=float, default=0.0)
+    parser.add_argument('--difficulty-sd', type=float, default=1.0)
+    parser.add_argument('--skew', type=float, default=2.0, help='start-time skew towards the deadline')
+    parser.add_argument('--cheaters', type=float, default=0.03, help='share of attempts with tab-switch bursts')
+    parser.add_argument('--time-order', action='store_true', help='write attempts and logs in global time order')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    mix = np.array([float(w) for w in args.mix.split(',')])
+    if len(mix) != 3 or mix.min() < 0 or mix.sum() <= 0:
+        parser.error('--mix needs three non-negative weights')
+    mix = mix / mix.sum()
+
+    print("=" * 80)
+    print("Generating synthetic exam dataset")
+    print("=" * 80)
+
+    out_dir = Path(args.output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(args.seed)
+    started_at = time.perf_counter()
+
+    print(f"\n[1/3] Writing {args.students:,} students...")
+    grades, ability, names = write_students(rng, args, out_dir, SCHOOL_YEAR_START - 30 * DAY)
+    students_by_grade = [np.nonzero(grades == g)[0] for g in range(len(GRADE_LEVELS))]
+    print("✅ users.ndjson, profiles.ndjson")
+
+    print(f"\n[2/3] Writing {args.exams:,} exams with attempts and logs...")
+    work_dir = Path(tempfile.mkdtemp(prefix='exam-dataset-', dir=out_dir)) if args.time_order else None
+    attempt_runs, log_runs = [], []
+    attempts_out = None if args.time_order else open(out_dir / 'attempts.ndjson', 'w', encoding='utf-8')
+    logs_out = None if args.time_order else open(out_dir / 'student_logs.ndjson', 'w', encoding='utf-8')
+    attempt_count = log_count = 0
+    last_report = time.perf_counter()
+    with open(out_dir / 'exams.ndjson', 'w', encoding='utf-8') as exams_out:
+        for number in range(args.exams):
+            exam, *model = make_exam(rng, args, number, mix)
+            exams_out.write(json.dumps(exam, ensure_ascii=False) + '\n')
+            candidates = students_by_grade[GRADE_LEVELS.index(exam['gradeLevel'])]
+            takers = candidates[rng.random(len(candidates)) < args.participation]
+
+            if args.time_order:
+                attempts_path = work_dir / f'a{number:05d}.run'
+                logs_path = work_dir / f'l{number:05d}.run'
+                attempt_runs.append(attempts_path)
+                log_runs.append(logs_path)
+                attempt_file = open(attempts_path, 'w', encoding='utf-8')
+                log_file = open(logs_path, 'w', encoding='utf-8')
+            else:
+                attempt_file, log_file = attempts_out, logs_out
+
+            exam_logs = []
+            for started, attempt, logs in make_attempts(rng, args, exam, model, takers, ability, names):
+                line = json.dumps(attempt, ensure_ascii=False) + '\n'
+                attempt_file.write(f'{started:015d}\t{line}' if args.time_order else line)
+                exam_logs.extend(logs)
+                attempt_count += 1
+            # Logs of one exam overlap between attempts; sort them before writing the run
+            exam_logs.sort(key=lambda item: item[0])
+            for t, log in exam_logs:
+                line = json.dumps(log, ensure_ascii=False) + '\n'
+                log_file.write(f'{t:015d}\t{line}' if args.time_order else line)
+            log_count += len(exam_logs)
+
+            if args.time_order:
+                attempt_file.close()
+                log_file.close()
+            if time.perf_counter() - last_report > 5:
+                elapsed = time.perf_counter() - started_at
+                print(f"  {number + 1:,}/{args.exams:,} exams, {attempt_count:,} attempts "
+                      f"({attempt_count / elapsed:,.0f}/s)")
+                last_report = time.perf_counter()
+    if not args.time_order:
+        attempts_out.close()
+        logs_out.close()
+    print(f"✅ {attempt_count:,} attempts, {log_count:,} log events")
+
+    print("\n[3/3] Finishing...")
+    if args.time_order:
+        merge_runs(attempt_runs, out_dir / 'attempts.ndjson', work_dir)
+        merge_runs(log_runs, out_dir / 'student_logs.ndjson', work_dir)
+        shutil.rmtree(work_dir)
+        print("✅ attempts.ndjson and student_logs.ndjson merged in time order")
+    else:
+        print("✅ attempts.ndjson and student_logs.ndjson written per exam")
+    elapsed = time.perf_counter() - started_at
+
+    print("\n" + "=" * 80)
+    print("✅ COMPLETE!")
+    print(f"📋 Output: {out_dir}")
+    for name in ('users.ndjson', 'profiles.ndjson', 'exams.ndjson', 'attempts.ndjson', 'student_logs.ndjson'):
+        print(f"     {name:<22} {(out_dir / name).stat().st_size:>15,} bytes")
+    print(f"📋 {attempt_count:,} attempts in {elapsed:.1f}s ({attempt_count / elapsed:,.0f} attempts/s)")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Bulk-grade SHORT_ANSWER responses with accepted answers and keywords
+
+submitExamAttempt grades SHORT_ANSWER exactly like multiple choice (trimmed,
+case-insensitive equality with correctAnswer); the keyword matching its
+comment mentions was never implemented. This script grades every
+short-answer response of an attempts export against a rubric:
+
+    correct  the normalized response equals an accepted answer, or
+             contains at least minKeywords of the keywords as whole words
+
+Normalization is case folding, trimming and collapsing runs of whitespace,
+so every answer the app accepts is still accepted.
+
+Each question's accepted answers and keywords are compiled into one
+Aho-Corasick automaton. A response is normalized once and scanned once; the
+scan reports accepted-answer matches that cover the whole response and every
+keyword hit at the same time. Identical responses to the same question
+(common for short answers) are graded once.
+
+Rubric file (optional, JSON):
+    { "<questionId>": { "accept": ["photosynthesis", "photo synthesis"],
+                        "keywords": ["light", "glucose"], "minKeywords": 2 } }
+    Questions without an entry accept their correctAnswer only. Exam
+    questions may also carry "acceptedAnswers" / "keywords" / "minKeywords".
+
+Export format:
+    exams     NDJSON (Exam documents including "questions")
+    attempts  NDJSON, or CSV with an "answers" column holding the JSON map
+
+Usage:
+    python grade-short-answers.py <exams.ndjson> <attempts.ndjson|csv> [--rubric rubric.json]
+                                  [--output short_answer_scores.csv] [--details FILE] [--verify]
+"""
+
+import argparse
+import csv
+import json
+import re
+import sys
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def read_records(path):
+    """Yield documents from an NDJSON, JSON array or CSV export"""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.suffix.lower() == '.csv':
+            for row in csv.DictReader(f):
+                if row.get('answers'):
+                    row['answers'] = json.loads(row['answers'])
+                yield row
+        elif path.suffix.lower() == '.json':
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def normalize(text):
+    return WHITESPACE.sub(' ', str(text)).strip().casefold()
+
+
+class Automaton:
+    """Aho-Corasick automaton over normalized patterns"""
+
+    def __init__(self, patterns):
+        # patterns: list of (text, payload)
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for text, payload in patterns:
+            if not text:
+                continue
+            state = 0
+            for ch in text:
+                next_state = self.goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][ch] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = next_state
+            self.output[state].append((len(text), payload))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(ch, 0) if state else 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def matches(self, text):
+        """Yield (start, end, payload) for every pattern occurrence"""
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for end, ch in enumerate(text, start=1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, payload in output[state]:
+                yield end - length, end, payload
+
+
+def is_word_boundary(text, start, end):
+    return (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())
+
+
+class QuestionGrader:
+    """Accepted answers + keywords of one question compiled into one automaton"""
+
+    def __init__(self, question, rubric):
+        accept = rubric.get('accept') or question.get('acceptedAnswers') or [question.get('correctAnswer', '')]
+        keywords = rubric.get('keywords') or question.get('keywords') or []
+        self.accept = sorted({normalize(a) for a in accept} - {''})
+        self.keywords = sorted({normalize(k) for k in keywords} - {''})
+        self.min_keywords = int(rubric.get('minKeywords') or question.get('minKeywords') or len(self.keywords))
+        patterns = [(a, ('accept', i)) for i, a in enumerate(self.accept)]
+        patterns += [(k, ('keyword', i)) for i, k in enumerate(self.keywords)]
+        self.automaton = Automaton(patterns)
+        self.cache = {}
+
+    def grade(self, answer):
+        """Return (correct, how) for a raw response; how is 'exact', 'keywords' or ''"""
+        cached = self.cache.get(answer)
+        if cached is not None:
+            return cached
+        text = normalize(answer)
+        exact = False
+        found = set()
+        for start, end, (kind, index) in self.automaton.matches(text):
+            if kind == 'accept':
+                exact = exact or (start == 0 and end == len(text))
+            elif is_word_boundary(text, start, end):
+                found.add(index)
+        if exact:
+            result = (True, 'exact')
+        elif self.keywords and len(found) >= self.min_keywords:
+            result = (True, 'keywords')
+        else:
+            result = (False, '')
+        self.cache[answer] = result
+        return result
+
+    def grade_naive(self, answer):
+        """Pattern-by-pattern reference used by --verify"""
+        text = normalize(answer)
+        if text in self.accept:
+            return True, 'exact'
+        found = sum(1 for k in self.keywords
+                    if re.search(r'(?<![^\W_])' + re.escape(k) + r'(?![^\W_])', text))
+        if self.keywords and found >= self.min_keywords:
+            return True, 'keywords'
+        return False, ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-pattern SHORT_ANSWER grading over an attempts export')
+    parser.add_argument('exams', help='exams export (NDJSON)')
+    parser.add_argument('attempts', help='exam_attempts export (NDJSON or CSV)')
+    parser.add_argument('--rubric', help='JSON rubric: questionId -> accept / keywords / minKeywords')
+    parser.add_argument('--output', default='short_answer_scores.csv')
+    parser.add_argument('--details', help='also write one CSV row per short-answer response')
+    parser.add_argument('--verify', action='store_true', help='compare every result with a naive matcher')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("Grading short answers")
+    print("=" * 80)
+
+    rubric = {}
+    if args.rubric:
+        with open(args.rubric, 'r', encoding='utf-8') as f:
+            rubric = json.load(f)
+
+    print("\n[1/3] Compiling rubrics...")
+    graders = {}
+    for exam in read_records(args.exams):
+        for question in exam.get('questions') or []:
+            if question.get('type') == 'SHORT_ANSWER':
+                graders[question['id']] = (exam['id'], question, QuestionGrader(question, rubric.get(question['id'], {})))
+    print(f"✅ {len(graders):,} SHORT_ANSWER questions")
+
+    print(f"\n[2/3] Grading {args.attempts}...")
+    responses = attempts = mismatches = 0
+    grading_seconds = 0.0
+    flipped = defaultdict(lambda: [0, 0])   # questionId -> [now correct, now wrong] vs exact equality
+    started = time.perf_counter()
+    details = open(args.details, 'w', encoding='utf-8', newline='') if args.details else None
+    detail_writer = csv.writer(details) if details else None
+    if detail_writer:
+        detail_writer.writerow(['attemptId', 'questionId', 'answer', 'correct', 'match'])
+    with open(args.output, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['attemptId', 'examId', 'studentId', 'shortAnswers', 'correct',
+                         'points', 'exactPoints', 'delta'])
+        for attempt in read_records(args.attempts):
+            answers = attempt.get('answers') or {}
+            count = correct = points = exact_points = 0
+            graded_at = time.perf_counter()
+            for question_id, answer in answers.items():
+                entry = graders.get(question_id)
+                if entry is None or answer is None:
+                    continue
+                _, question, grader = entry
+                is_correct, how = grader.grade(answer)
+                count += 1
+                value = int(question.get('points', 10))
+                was_correct = answer.strip().lower() == str(question.get('correctAnswer', '')).strip().lower()
+                correct += is_correct
+                points += value if is_correct else 0
+                exact_points += value if was_correct else 0
+                if is_correct != was_correct:
+                    flipped[question_id][0 if is_correct else 1] += 1
+                if args.verify and grader.grade_naive(answer) != (is_correct, how):
+                    mismatches += 1
+                if detail_writer:
+                    detail_writer.writerow([attempt.get('id', ''), question_id, answer, is_correct, how])
+            grading_seconds += time.perf_counter() - graded_at
+            responses += count
+            attempts += 1
+            if count:
+                writer.writerow([attempt.get('id', ''), attempt.get('examId', ''), attempt.get('studentId', ''),
+                                 count, correct, points, exact_points, points - exact_points])
+    if details:
+        details.close()
+    elapsed = time.perf_counter() - started
+    distinct = sum(len(grader.cache) for _, _, grader in graders.values())
+    print(f"✅ {responses:,} responses in {attempts:,} attempts ({distinct:,} distinct per question)")
+    print(f"📋 Throughput: {responses / elapsed if elapsed else 0:,.0f} answers/s end to end, "
+          f"{responses / grading_seconds if grading_seconds else 0:,.0f} answers/s grading only")
+
+    print("\n[3/3] Changes against exact matching...")
+    if not flipped:
+        print("📋 No response changes outcome")
+    for question_id, (gained, lost) in sorted(flipped.items(), key=lambda item: -sum(item[1]))[:10]:
+        print(f"  {question_id:<30} +{gained:,} now correct, -{lost:,} now wrong")
+
+    if args.verify:
+        if mismatches:
+            print(f"\n❌ {mismatches:,} responses differ from the naive matcher")
+            sys.exit(1)
+        print(f"\n✅ All {responses:,} responses match the naive matcher")
+
+    print("\n" + "=" * 80)
+    print("✅ COMPLETE!")
+    print(f"📋 Scores written to {args.output}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
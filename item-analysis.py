@@ -0,0 +1,218 @@
+"""
+Offline item analysis over exported exams and exam_attempts
+
+Computes the same QuestionAnalysis fields as AnalyticsRepository.getItemAnalysis
+(correct/incorrect counts, correctPercentage, responseDistribution) plus:
+    - difficulty index      p = correct / total attempts
+    - discrimination index  D = p(upper 27%) - p(lower 27%), groups by total score
+
+Instead of counting attempts once per question and once per option, every
+attempt is loaded once into a dense attempt x question matrix of answer codes
+and all counts are computed with NumPy.
+
+Export format:
+    exams     NDJSON (one Exam document per line, including "questions")
+    attempts  NDJSON, or CSV with an "answers" column holding the JSON map
+              questionId -> answer
+
+Requirements:
+    pip install numpy
+
+Usage:
+    python item-analysis.py <exams.ndjson> <attempts.ndjson|csv> [--exam-id ID]
+                            [--output item_analysis.json] [--submitted-only] [--verify]
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+# Kelley's upper/lower group size for the discrimination index
+GROUP_FRACTION = 0.27
+
+
+def read_records(path):
+    """Yield documents from an NDJSON, JSON array or CSV export"""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.suffix.lower() == '.csv':
+            for row in csv.DictReader(f):
+                if row.get('answers'):
+                    row['answers'] = json.loads(row['answers'])
+                yield row
+        elif path.suffix.lower() == '.json':
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def build_answer_matrix(attempts, questions, vocabulary):
+    """Encode answers as an (attempts x questions) int32 matrix, -1 = unanswered"""
+    column = {q['id']: j for j, q in enumerate(questions)}
+    matrix = np.full((len(attempts), len(questions)), -1, dtype=np.int32)
+    rows, cols, codes = [], [], []
+    for i, attempt in enumerate(attempts):
+        for question_id, answer in (attempt.get('answers') or {}).items():
+            j = column.get(question_id)
+            if j is None or answer is None:
+                continue
+            code = vocabulary.get(answer)
+            if code is None:
+                code = vocabulary[answer] = len(vocabulary)
+            rows.append(i)
+            cols.append(j)
+            codes.append(code)
+    if rows:
+        matrix[np.array(rows), np.array(cols)] = np.array(codes, dtype=np.int32)
+    return matrix
+
+
+def analyze_exam(exam, attempts, vocabulary):
+    """Return the ItemAnalysis dict for one exam"""
+    questions = exam.get('questions') or []
+    total = len(attempts)
+    if total == 0:
+        return {'examId': exam['id'], 'totalSubmissions': 0, 'questionAnalyses': []}
+
+    answers = build_answer_matrix(attempts, questions, vocabulary)
+
+    # Case-insensitive comparison against the key, like equals(ignoreCase = true):
+    # map every vocabulary entry to the id of its lowercase form
+    lower_ids = {}
+    vocab_lower = np.empty(len(vocabulary) + 1, dtype=np.int32)
+    for answer, code in vocabulary.items():
+        vocab_lower[code] = lower_ids.setdefault(answer.lower(), len(lower_ids))
+    vocab_lower[-1] = -1  # unanswered (-1) indexes the last slot
+    key_lower = np.array([lower_ids.get(str(q.get('correctAnswer', '')).lower(), -2) for q in questions],
+                         dtype=np.int32)
+    correct = vocab_lower[answers] == key_lower[None, :]
+
+    correct_counts = correct.sum(axis=0)
+    difficulty = correct_counts / total
+
+    points = np.array([int(q.get('points', 10)) for q in questions], dtype=np.int64)
+    scores = correct @ points
+    order = np.argsort(scores, kind='stable')
+    group = max(1, int(round(total * GROUP_FRACTION)))
+    lower = correct[order[:group]].mean(axis=0)
+    upper = correct[order[-group:]].mean(axis=0)
+    discrimination = upper - lower
+
+    # Option counts: one np.unique over (question, answer code) pairs
+    answered = answers >= 0
+    q_index = np.nonzero(answered)[1].astype(np.int64)
+    flat = q_index * (len(vocabulary) + 1) + answers[answered]
+    keys, counts = np.unique(flat, return_counts=True)
+    pair_counts = dict(zip(keys.tolist(), counts.tolist()))
+
+    analyses = []
+    for j, question in enumerate(questions):
+        distribution = {}
+        for option in question.get('options') or []:
+            code = vocabulary.get(option)
+            distribution[option] = pair_counts.get(j * (len(vocabulary) + 1) + code, 0) if code is not None else 0
+        correct_attempts = int(correct_counts[j])
+        analyses.append({
+            'question': question,
+            'totalAttempts': total,
+            'correctAttempts': correct_attempts,
+            'incorrectAttempts': total - correct_attempts,
+            'correctPercentage': correct_attempts / total * 100,
+            'responseDistribution': distribution,
+            'difficultyIndex': float(difficulty[j]),
+            'discriminationIndex': float(discrimination[j]),
+        })
+    return {'examId': exam['id'], 'totalSubmissions': total, 'questionAnalyses': analyses}
+
+
+def analyze_exam_naive(exam, attempts):
+    """Straight port of AnalyticsRepository.getItemAnalysis, used by --verify"""
+    total = len(attempts)
+    result = []
+    for question in exam.get('questions') or []:
+        correct = sum(
+            1 for a in attempts
+            if (a.get('answers') or {}).get(question['id']) is not None
+            and a['answers'][question['id']].lower() == str(question.get('correctAnswer', '')).lower()
+        )
+        distribution = {
+            option: sum(1 for a in attempts if (a.get('answers') or {}).get(question['id']) == option)
+            for option in question.get('options') or []
+        }
+        result.append((correct, distribution))
+    return total, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vectorized item analysis over exam_attempts exports')
+    parser.add_argument('exams', help='exams export (NDJSON)')
+    parser.add_argument('attempts', help='exam_attempts export (NDJSON or CSV)')
+    parser.add_argument('--exam-id', help='only analyze this exam')
+    parser.add_argument('--output', default='item_analysis.json')
+    parser.add_argument('--submitted-only', action='store_true', help='ignore attempts without submittedAt')
+    parser.add_argument('--verify', action='store_true', help='compare against the per-question count loop')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("Item analysis")
+    print("=" * 80)
+
+    print("\n[1/3] Loading exports...")
+    started = time.perf_counter()
+    exams = {e['id']: e for e in read_records(args.exams) if not args.exam_id or e.get('id') == args.exam_id}
+    attempts_by_exam = defaultdict(list)
+    attempt_count = 0
+    for attempt in read_records(args.attempts):
+        if attempt.get('examId') not in exams:
+            continue
+        if args.submitted_only and not attempt.get('submittedAt'):
+            continue
+        attempts_by_exam[attempt['examId']].append(attempt)
+        attempt_count += 1
+    load_seconds = time.perf_counter() - started
+    print(f"✅ {len(exams):,} exams, {attempt_count:,} attempts in {load_seconds:.2f}s")
+
+    print("\n[2/3] Computing item statistics...")
+    started = time.perf_counter()
+    vocabulary = {}
+    results = [analyze_exam(exam, attempts_by_exam.get(exam_id, []), vocabulary) for exam_id, exam in exams.items()]
+    compute_seconds = time.perf_counter() - started
+    rate = attempt_count / compute_seconds if compute_seconds > 0 else float('inf')
+    print(f"✅ Analyzed in {compute_seconds:.2f}s ({rate:,.0f} attempts/s)")
+
+    if args.verify:
+        print("\n📋 Verifying against the per-question loop...")
+        mismatches = 0
+        for result in results:
+            total, expected = analyze_exam_naive(exams[result['examId']], attempts_by_exam.get(result['examId'], []))
+            actual = [(qa['correctAttempts'], qa['responseDistribution']) for qa in result['questionAnalyses']]
+            if total and actual != expected:
+                mismatches += 1
+                print(f"❌ Exam {result['examId']} differs")
+        if mismatches:
+            sys.exit(1)
+        print("✅ Results match")
+
+    print(f"\n[3/3] Writing {args.output}...")
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    print("\n" + "=" * 80)
+    print("✅ COMPLETE!")
+    print(f"📋 Exams analyzed: {len(results):,}")
+    print(f"📋 Attempts: {attempt_count:,}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
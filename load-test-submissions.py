@@ -0,0 +1,297 @@
+"""
+Load test exam submissions against the Firestore emulator
+
+Replays the write pattern of ExamRepository.submitExamAttempt: one
+transaction that creates an exam_attempts document and increments totalScore
+and examsTaken on the student's user document. Submissions arrive in bursts,
+like a whole section pressing Submit when the bell rings: every student of a
+burst submits within --spread seconds of the bell, with most of them in the
+first few seconds.
+
+Reports throughput, latency percentiles and the transaction retry and abort
+rates, then checks that every user's counters match the attempts written.
+Latency is measured from each submission's scheduled arrival, so time spent
+waiting for one of the --concurrency slots counts; the service time after
+getting a slot is reported next to it. Throughput is given over the time with
+transactions in flight, separately from the wall time that includes the
+--spread arrival window.
+
+Requirements:
+    pip install google-cloud-firestore
+
+Usage:
+    python load-test-submissions.py --emulator HOST:PORT [--students N] [--bursts B]
+                                    [--concurrency C] [--spread SECONDS]
+                                    [--questions Q] [--max-attempts N] [--seed S]
+
+Example:
+    firebase emulators:start --only firestore
+    python load-test-submissions.py --emulator localhost:8080 --students 2000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_PROJECT = 'online-examination-8372d'
+MAX_BATCH_WRITES = 500
+
+
+def make_exam(exam_id, question_count, rng):
+    """An Exam-shaped document with a mix of question types"""
+    questions = []
+    for i in range(question_count):
+        kind = rng.choice(['MULTIPLE_CHOICE', 'MULTIPLE_CHOICE', 'TRUE_FALSE', 'SHORT_ANSWER'])
+        if kind == 'MULTIPLE_CHOICE':
+            options = ['A', 'B', 'C', 'D']
+        elif kind == 'TRUE_FALSE':
+            options = ['True', 'False']
+        else:
+            options = []
+        questions.append({
+            'id': f'{exam_id}_q{i}',
+            'questionText': f'Question {i + 1}',
+            'type': kind,
+            'options': options,
+            'correctAnswer': rng.choice(options) if options else 'photosynthesis',
+            'points': 10,
+            'explanation': '',
+        })
+    return {
+        'id': exam_id,
+        'title': f'Load test {exam_id}',
+        'subject': 'Science',
+        'gradeLevel': 'Grade 7',
+        'totalPoints': 10 * question_count,
+        'passingScore': 60,
+        'teacherId': 'loadtest-teacher',
+        'questions': questions,
+        'questionCount': question_count,
+        'active': True,
+    }
+
+
+def make_attempt(exam, student_id, started_at, rng):
+    """An ExamAttempt-shaped document graded like submitExamAttempt; submittedAt is stamped on submit"""
+    answers = {}
+    score = 0
+    for question in exam['questions']:
+        if question['options']:
+            answer = rng.choice(question['options'])
+        else:
+            answer = rng.choice(['Photosynthesis ', 'respiration'])
+        answers[question['id']] = answer
+        if answer.strip().lower() == question['correctAnswer'].strip().lower():
+            score += question['points']
+    percentage = score / exam['totalPoints'] * 100
+    return {
+        'examId': exam['id'],
+        'examTitle': exam['title'],
+        'teacherId': exam['teacherId'],
+        'studentId': student_id,
+        'studentName': f'Student {student_id}',
+        'studentEmail': f'{student_id}@example.com',
+        'startedAt': started_at,
+        'answers': answers,
+        'score': score,
+        'totalPoints': exam['totalPoints'],
+        'percentage': percentage,
+        'passed': percentage >= exam['passingScore'],
+    }
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def seed_users(client, student_ids):
+    for start in range(0, len(student_ids), MAX_BATCH_WRITES):
+        batch = client.batch()
+        for student_id in student_ids[start:start + MAX_BATCH_WRITES]:
+            batch.set(client.collection('users').document(student_id),
+                      {'uid': student_id, 'role': 'STUDENT', 'totalScore': 0, 'examsTaken': 0})
+        await batch.commit()
+
+
+async def run_burst(client, exam, student_ids, args, rng, stats):
+    from google.cloud import firestore
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    started_at = int(time.time() * 1000) - 3_000_000
+
+    # Draw every student's arrival and answers up front, in student order: the
+    # order in which the sleeps wake up is not deterministic, so drawing from
+    # rng inside submit() would make --seed irreproducible.
+    # Most students submit right at the bell, stragglers up to --spread later
+    plans = {student_id: (min(args.spread, rng.expovariate(4.0 / args.spread)) if args.spread else 0,
+                          make_attempt(exam, student_id, started_at, rng))
+             for student_id in student_ids}
+    bell = time.perf_counter()
+    arrivals = [delay for delay, _ in plans.values()]
+    busy = []
+
+    async def submit(student_id):
+        delay, planned = plans[student_id]
+        await asyncio.sleep(delay)
+        # Latency runs from the scheduled arrival, so time queued behind the
+        # concurrency limit is counted (no coordinated omission)
+        arrived = bell + delay
+        submitted_at = int(time.time() * 1000)
+        attempt = {**planned, 'submittedAt': submitted_at,
+                   'timeSpentMinutes': max(1, (submitted_at - started_at) // 60000)}
+        calls = 0
+
+        @firestore.async_transactional
+        async def submit_transaction(transaction):
+            nonlocal calls
+            calls += 1
+            doc_ref = client.collection('exam_attempts').document()
+            transaction.set(doc_ref, {**attempt, 'id': doc_ref.id})
+            user_ref = client.collection('users').document(student_id)
+            transaction.update(user_ref, {'totalScore': firestore.Increment(attempt['score']),
+                                          'examsTaken': firestore.Increment(1)})
+            return doc_ref.id
+
+        async with semaphore:
+            began = time.perf_counter()
+            try:
+                await submit_transaction(client.transaction(max_attempts=args.max_attempts))
+                finished = time.perf_counter()
+                stats['latencies'].append(finished - arrived)
+                stats['service'].append(finished - began)
+                stats['expected'][student_id][0] += attempt['score']
+                stats['expected'][student_id][1] += 1
+            except Exception as e:
+                stats['aborted'] += 1
+                stats['errors'][type(e).__name__] += 1
+            stats['retries'] += max(0, calls - 1)
+            stats['submitted'] += 1
+            busy.append((began, time.perf_counter()))
+
+    await asyncio.gather(*(submit(student_id) for student_id in student_ids))
+    return time.perf_counter() - bell, max(arrivals, default=0.0), busy_seconds(busy)
+
+
+def busy_seconds(intervals):
+    """Wall time during which at least one transaction was in flight"""
+    total = 0.0
+    end = None
+    for began, finished in sorted(intervals):
+        if end is None or began > end:
+            total += finished - began
+            end = finished
+        elif finished > end:
+            total += finished - end
+            end = finished
+    return total
+
+
+async def verify(client, stats):
+    refs = [client.collection('users').document(s) for s in stats['expected']]
+    mismatches = 0
+    async for snap in client.get_all(refs):
+        data = snap.to_dict()
+        total, taken = stats['expected'][snap.id]
+        if data.get('totalScore') != total or data.get('examsTaken') != taken:
+            mismatches += 1
+    return mismatches
+
+
+async def run(args):
+    os.environ['FIRESTORE_EMULATOR_HOST'] = args.emulator
+    from google.cloud import firestore
+    client = firestore.AsyncClient(project=args.project)
+    rng = random.Random(args.seed)
+
+    run_id = f'lt{int(time.time())}'
+    student_ids = [f'{run_id}_s{i:06d}' for i in range(args.students)]
+
+    print(f"\n[1/3] Seeding {len(student_ids):,} students...")
+    await seed_users(client, student_ids)
+    exams = [make_exam(f'{run_id}_e{b}', args.questions, rng) for b in range(args.bursts)]
+    for exam in exams:
+        await client.collection('exams').document(exam['id']).set(exam)
+    print("✅ Seeded")
+
+    stats = {
+        'latencies': [],
+        'service': [],
+        'submitted': 0,
+        'retries': 0,
+        'aborted': 0,
+        'errors': defaultdict(int),
+        'expected': defaultdict(lambda: [0, 0]),
+    }
+
+    print(f"\n[2/3] Running {args.bursts} burst(s) of {len(student_ids):,} submissions "
+          f"(concurrency {args.concurrency}, spread {args.spread}s)...")
+    elapsed = spread = busy = 0.0
+    for exam in exams:
+        seconds, arrival_seconds, busy_burst = await run_burst(client, exam, student_ids, args, rng, stats)
+        elapsed += seconds
+        spread += arrival_seconds
+        busy += busy_burst
+        print(f"  Burst {exam['id']}: {seconds:.2f}s (arrivals over {arrival_seconds:.2f}s, "
+              f"{busy_burst:.2f}s with transactions in flight)")
+
+    latencies = sorted(stats['latencies'])
+    service = sorted(stats['service'])
+    completed = len(latencies)
+    print(f"\n📋 Submissions:  {stats['submitted']:,} ({completed:,} committed, {stats['aborted']:,} aborted)")
+    print(f"📋 Wall time:    {elapsed:.2f}s, of which arrivals were spread over {spread:.2f}s")
+    print(f"📋 Throughput:   {completed / busy if busy else 0:,.1f} commits/s while busy ({busy:.2f}s), "
+          f"{completed / elapsed if elapsed else 0:,.1f} commits/s over the wall time")
+    for label, values in (('Latency:     ', latencies), ('Service time:', service)):
+        print(f"📋 {label} p50 {percentile(values, 0.50) * 1000:.0f}ms  "
+              f"p90 {percentile(values, 0.90) * 1000:.0f}ms  "
+              f"p99 {percentile(values, 0.99) * 1000:.0f}ms  "
+              f"max {(values[-1] if values else 0) * 1000:.0f}ms")
+    print("   (latency from each student's scheduled submit, service time from the start of its transaction)")
+    print(f"📋 Retry rate:   {stats['retries'] / max(1, stats['submitted']):.2%} ({stats['retries']:,} retries)")
+    print(f"📋 Abort rate:   {stats['aborted'] / max(1, stats['submitted']):.2%}")
+    for name, count in stats['errors'].items():
+        print(f"     {name}: {count:,}")
+
+    print("\n[3/3] Checking user counters...")
+    mismatches = await verify(client, stats)
+    if mismatches:
+        print(f"❌ {mismatches:,} users have totalScore/examsTaken that do not match their attempts")
+        sys.exit(1)
+    print("✅ All user counters match the committed attempts")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent exam submission load test (Firestore emulator)')
+    parser.add_argument('--emulator', required=True, help='Firestore emulator host, e.g. localhost:8080')
+    parser.add_argument('--project', default=DEFAULT_PROJECT)
+    parser.add_argument('--students', type=int, default=500, help='students submitting per burst')
+    parser.add_argument('--bursts', type=int, default=1, help='number of exams submitted one after another')
+    parser.add_argument('--concurrency', type=int, default=100, help='transactions in flight')
+    parser.add_argument('--spread', type=float, default=10.0, help='seconds over which a burst arrives')
+    parser.add_argument('--questions', type=int, default=40)
+    parser.add_argument('--max-attempts', type=int, default=5, help='transaction attempts before aborting')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("Exam submission load test")
+    print("=" * 80)
+
+    asyncio.run(run(args))
+
+    print("\n" + "=" * 80)
+    print("✅ COMPLETE!")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""
+Materialize exam_results/{attemptId} from exams and exam_attempts
+
+getResultByAttemptId used to re-grade the whole attempt against the Exam
+every time ResultDetailScreen opened. submitExamAttempt now stores a compact
+StoredExamResult next to the attempt, and getResultByAttemptId reads it with
+one document read. This script back-fills the results of older attempts and
+refreshes results whose answer key changed:
+
+    exam_results/{attemptId}
+        attemptId, examId, examTitle, studentId, studentName, score,
+        totalPoints, percentage, passed, submittedAt, timeSpentMinutes,
+        answerKeyVersion,
+        questionResults: [{questionId, studentAnswer, correct, points, maxPoints}]
+
+The keys are the ones Firestore's class mapper uses for StoredExamResult:
+a Kotlin "isPassed" property would be stored as "passed", so the model
+names them passed/correct. Attempts written by the app store ExamAttempt
+.isPassed as "passed" too ("isPassed" is still read for older exports).
+
+Question text and correct answer are not copied; the app takes them from the
+Exam it already holds. answerKeyVersion is the hash Exam.answerKeyVersion()
+computes (question ids, trimmed lower-case correct answers, points); the app
+falls back to re-grading when it differs, and this script only rewrites
+results that are missing, carry another version or lack the "passed" key
+(written by earlier versions of this script; incremental runs).
+
+Exams are graded in parallel worker processes. --verify first checks the
+written keys against the StoredExamResult / StoredQuestionResult properties
+in Exam.kt, as toObject() maps them, so a document the app cannot read back
+fails independently of the grader. It then compares every materialized
+result, expanded the way StoredExamResult.toExamResult does, with the
+ExamResult the on-the-fly re-grade returns, field by field.
+
+Export format:
+    exams     NDJSON (Exam documents including "questions")
+    attempts  NDJSON, or CSV with an "answers" column holding the JSON map
+    existing  NDJSON of exam_results documents (optional, for incremental runs)
+
+Requirements:
+    pip install google-cloud-firestore   (only for --apply / --existing-from-firestore)
+
+Usage:
+    python materialize-exam-results.py <exams.ndjson> <attempts.ndjson|csv>
+                                       [--exam-id ID] [--since MILLIS]
+                                       [--existing exam_results.ndjson | --existing-from-firestore]
+                                       [--output exam_results.ndjson] [--workers N] [--verify]
+                                       [--apply] [--prune] [--project ID] [--emulator HOST:PORT]
+
+    --since          only attempts submitted at or after this time (epoch millis)
+    --prune          also delete results whose attempt is not in the export
+                     (ignored with --exam-id or --since)
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_PROJECT = 'online-examination-8372d'
+MAX_BATCH_WRITES = 500
+ATTEMPTS_PER_TASK = 5000
+MODEL_SOURCE = Path(__file__).resolve().parent / 'app/src/main/java/com/onlineexamination/data/model/Exam.kt'
+
+
+def read_records(path):
+    """Yield documents from an NDJSON, JSON array or CSV export"""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.suffix.lower() == '.csv':
+            for row in csv.DictReader(f):
+                if row.get('answers'):
+                    row['answers'] = json.loads(row['answers'])
+                for key in ('score', 'totalPoints', 'timeSpentMinutes'):
+                    if row.get(key) not in (None, ''):
+                        row[key] = int(row[key])
+                for key in ('startedAt', 'submittedAt'):
+                    row[key] = int(row[key]) if row.get(key) not in (None, '') else None
+                if row.get('percentage') not in (None, ''):
+                    row['percentage'] = float(row['percentage'])
+                for key in ('passed', 'isPassed'):
+                    if key in row:
+                        row[key] = str(row[key]).lower() == 'true'
+                yield row
+        elif path.suffix.lower() == '.json':
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def attempt_passed(attempt):
+    """ExamAttempt.isPassed, stored as "passed" by the app"""
+    return bool(attempt.get('passed', attempt.get('isPassed', False)))
+
+
+def firestore_properties(source, class_name):
+    """Property names toObject() maps for a Kotlin data class (isX: Boolean is stored as x)"""
+    body = re.search(rf'data class {class_name}\((.*?)\n\)', source, re.S).group(1)
+    names = set()
+    for name, kind in re.findall(r'va[lr]\s+(\w+)\s*:\s*([\w<>?, ]+?)\s*(?:=|,|$)', body, re.M):
+        if kind == 'Boolean' and re.match(r'is[A-Z]', name):
+            name = name[2].lower() + name[3:]
+        names.add(name)
+    return names
+
+
+def schema_problems(result):
+    """Keys of a materialized document that StoredExamResult would not read back, and missing ones"""
+    source = MODEL_SOURCE.read_text(encoding='utf-8')
+    problems = []
+    for class_name, keys in (('StoredExamResult', set(result)),
+                             ('StoredQuestionResult', set().union(*map(set, result['questionResults'])))):
+        expected = firestore_properties(source, class_name)
+        problems += [f"{class_name}: '{k}' is not a property" for k in sorted(keys - expected)]
+        problems += [f"{class_name}: '{k}' is never written" for k in sorted(expected - keys)]
+    return problems
+
+
+def answer_key_version(exam):
+    """Same value as Exam.answerKeyVersion() in the app"""
+    key = '\u001e'.join(f"{q.get('id', '')}\u001f{str(q.get('correctAnswer', '')).strip().lower()}"
+                        f"\u001f{int(q.get('points', 10))}"
+                        for q in exam.get('questions') or [])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+
+
+def materialize(exam, attempts):
+    """StoredExamResult documents for attempts of one exam"""
+    version = answer_key_version(exam)
+    key = [(q.get('id', ''), str(q.get('correctAnswer', '')).strip().lower(), int(q.get('points', 10)))
+           for q in exam.get('questions') or []]
+    title = exam.get('title', '')
+    results = []
+    for attempt in attempts:
+        answers = attempt.get('answers') or {}
+        question_results = []
+        for question_id, correct, points in key:
+            answer = answers.get(question_id) or ''
+            is_correct = answer.strip().lower() == correct
+            question_results.append({
+                'questionId': question_id,
+                'studentAnswer': answer,
+                'correct': is_correct,
+                'points': points if is_correct else 0,
+                'maxPoints': points,
+            })
+        results.append({
+            'attemptId': attempt['id'],
+            'examId': exam['id'],
+            'examTitle': title,
+            'studentId': attempt.get('studentId', ''),
+            'studentName': attempt.get('studentName', ''),
+            'score': int(attempt.get('score', 0)),
+            'totalPoints': int(attempt.get('totalPoints', 100)),
+            'percentage': float(attempt.get('percentage', 0.0)),
+            'passed': attempt_passed(attempt),
+            'submittedAt': int(attempt['submittedAt']),
+            'timeSpentMinutes': int(attempt.get('timeSpentMinutes', 0)),
+            'answerKeyVersion': version,
+            'questionResults': question_results,
+        })
+    return results
+
+
+def materialize_task(task):
+    return materialize(*task)
+
+
+def regrade_on_the_fly(attempt, exam):
+    """The ExamResult getResultByAttemptId builds when no stored result can be used"""
+    question_results = []
+    for question in exam.get('questions') or []:
+        student_answer = (attempt.get('answers') or {}).get(question['id']) or ''
+        correct_answer = question.get('correctAnswer', '')
+        is_correct = student_answer.strip().lower() == correct_answer.strip().lower()
+        max_points = int(question.get('points', 10))
+        question_results.append({
+            'questionId': question['id'],
+            'questionText': question.get('questionText', ''),
+            'studentAnswer': student_answer,
+            'correctAnswer': correct_answer,
+            'isCorrect': is_correct,
+            'points': max_points if is_correct else 0,
+            'maxPoints': max_points,
+        })
+    return {
+        'attemptId': attempt['id'],
+        'examId': exam['id'],
+        'examTitle': exam.get('title', ''),
+        'studentId': attempt.get('studentId', ''),
+        'studentName': attempt.get('studentName', ''),
+        'score': int(attempt.get('score', 0)),
+        'totalPoints': int(attempt.get('totalPoints', 100)),
+        'percentage': float(attempt.get('percentage', 0.0)),
+        'passed': attempt_passed(attempt),
+        'submittedAt': int(attempt['submittedAt']),
+        'timeSpentMinutes': int(attempt.get('timeSpentMinutes', 0)),
+        'questionResults': question_results,
+    }
+
+
+def to_exam_result(stored, exam):
+    """StoredExamResult.toExamResult(exam)"""
+    questions = {q['id']: q for q in exam.get('questions') or []}
+    result = {k: v for k, v in stored.items() if k not in ('answerKeyVersion', 'questionResults', 'passed')}
+    result['isPassed'] = stored['passed']
+    result['questionResults'] = [{
+        'questionId': qr['questionId'],
+        'questionText': questions.get(qr['questionId'], {}).get('questionText', ''),
+        'studentAnswer': qr['studentAnswer'],
+        'correctAnswer': questions.get(qr['questionId'], {}).get('correctAnswer', ''),
+        'isCorrect': qr['correct'],
+        'points': qr['points'],
+        'maxPoints': qr['maxPoints'],
+    } for qr in stored['questionResults']]
+    return result
+
+
+def firestore_client(project, emulator):
+    if emulator:
+        os.environ['FIRESTORE_EMULATOR_HOST'] = emulator
+    from google.cloud import firestore
+    return firestore.Client(project=project)
+
+
+def stored_version(result):
+    """answerKeyVersion of a stored result; None for the old isPassed/isCorrect schema, which must be rewritten"""
+    return result.get('answerKeyVersion', '') if 'passed' in result else None
+
+
+def stored_versions(client, attempt_ids):
+    """stored_version of the stored exam_results documents, read in chunks"""
+    versions = {}
+    for start in range(0, len(attempt_ids), MAX_BATCH_WRITES):
+        refs = [client.collection('exam_results').document(i) for i in attempt_ids[start:start + MAX_BATCH_WRITES]]
+        for snap in client.get_all(refs, field_paths=['answerKeyVersion', 'passed']):
+            if snap.exists:
+                versions[snap.id] = stored_version(snap.to_dict() or {})
+    return versions
+
+
+def apply_writes(client, results, deletes):
+    """Commit the results and deletes in batches of MAX_BATCH_WRITES; returns the number of batches"""
+    writes = [('set', r['attemptId'], r) for r in results] + [('delete', i, None) for i in deletes]
+    batches = 0
+    for start in range(0, len(writes), MAX_BATCH_WRITES):
+        batch = client.batch()
+        for op, attempt_id, data in writes[start:start + MAX_BATCH_WRITES]:
+            ref = client.collection('exam_results').document(attempt_id)
+            if op == 'set':
+                batch.set(ref, data)
+            else:
+                batch.delete(ref)
+        batch.commit()
+        batches += 1
+    return batches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Materialize compact exam results per attempt')
+    parser.add_argument('exams', help='exams export (NDJSON)')
+    parser.add_argument('attempts', help='exam_attempts export (NDJSON or CSV)')
+    parser.add_argument('--exam-id', help='only this exam')
+    parser.add_argument('--since', type=int, help='only attempts submitted at or after this time (epoch millis)')
+    parser.add_argument('--existing', help='exam_results export; only missing or stale results are written')
+    parser.add_argument('--existing-from-firestore', action='store_true',
+                        help='read stored answerKeyVersions from Firestore instead of an export')
+    parser.add_argument('--output', default='exam_results.ndjson')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--verify', action='store_true', help='compare with the on-the-fly re-grade')
+    parser.add_argument('--apply', action='store_true', help='write the results to Firestore')
+    parser.add_argument('--prune', action='store_true', help='delete results whose attempt is not in the export')
+    parser.add_argument('--project', default=DEFAULT_PROJECT)
+    parser.add_argument('--emulator', help='Firestore emulator host, e.g. localhost:8080')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("Materializing exam results")
+    print("=" * 80)
+
+    print("\n[1/4] Loading exports...")
+    exams = {e['id']: e for e in read_records(args.exams) if not args.exam_id or e.get('id') == args.exam_id}
+    attempts_by_exam = defaultdict(list)
+    skipped = 0
+    for attempt in read_records(args.attempts):
+        if attempt.get('examId') not in exams:
+            continue
+        if attempt.get('submittedAt') is None:
+            skipped += 1
+            continue
+        if args.since is not None and int(attempt['submittedAt']) < args.since:
+            continue
+        attempts_by_exam[attempt['examId']].append(attempt)
+    attempt_ids = [a['id'] for attempts in attempts_by_exam.values() for a in attempts]
+    print(f"✅ {len(exams):,} exams, {len(attempt_ids):,} submitted attempts ({skipped:,} unsubmitted skipped)")
+
+    client = None
+    if args.apply or args.existing_from_firestore:
+        client = firestore_client(args.project, args.emulator)
+    existing = None
+    if args.existing:
+        existing = {r['attemptId']: stored_version(r) for r in read_records(args.existing)}
+    elif args.existing_from_firestore:
+        existing = stored_versions(client, attempt_ids)
+    if existing is not None:
+        versions = {exam_id: answer_key_version(exams[exam_id]) for exam_id in attempts_by_exam}
+        for exam_id, attempts in attempts_by_exam.items():
+            attempts[:] = [a for a in attempts if existing.get(a['id']) != versions[exam_id]]
+        pending = sum(len(a) for a in attempts_by_exam.values())
+        print(f"📋 {len(existing):,} stored results, {pending:,} missing or stale")
+
+    print(f"\n[2/4] Materializing with {args.workers} workers...")
+    started = time.perf_counter()
+    tasks = [(exams[exam_id], attempts[start:start + ATTEMPTS_PER_TASK])
+             for exam_id, attempts in attempts_by_exam.items()
+             for start in range(0, len(attempts), ATTEMPTS_PER_TASK)]
+    results = []
+    if args.workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for chunk in pool.map(materialize_task, tasks, chunksize=4):
+                results.extend(chunk)
+    else:
+        for task in tasks:
+            results.extend(materialize_task(task))
+    seconds = time.perf_counter() - started
+    rate = len(results) / seconds if seconds else 0
+    print(f"✅ {len(results):,} results in {seconds:.2f}s ({rate:,.0f}/s)")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        for result in results:
+            f.write(json.dumps(result, ensure_ascii=False) + '\n')
+    print(f"✅ Results written to {args.output}")
+
+    deletes = []
+    if args.prune and existing is not None and args.since is None and not args.exam_id:
+        present = set(attempt_ids)
+        deletes = [i for i in existing if i not in present]
+        print(f"📋 {len(deletes):,} results without an attempt to delete")
+
+    print("\n[3/4] Verifying...")
+    if args.verify:
+        if results and MODEL_SOURCE.exists():
+            problems = schema_problems(results[0])
+            for problem in problems:
+                print(f"  ❌ {problem}")
+            if problems:
+                print("❌ Written keys do not match what toObject(StoredExamResult) reads")
+                sys.exit(1)
+            print("✅ Written keys match the StoredExamResult properties in Exam.kt")
+        elif results:
+            print(f"⚠️  {MODEL_SOURCE} not found, schema check skipped")
+        attempts_by_id = {a['id']: a for attempts in attempts_by_exam.values() for a in attempts}
+        mismatches = 0
+        score_drift = 0
+        for stored in results:
+            exam = exams[stored['examId']]
+            attempt = attempts_by_id[stored['attemptId']]
+            expected = regrade_on_the_fly(attempt, exam)
+            if to_exam_result(stored, exam) != expected:
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f"  ❌ {stored['attemptId']} differs from the on-the-fly re-grade")
+            if sum(qr['points'] for qr in expected['questionResults']) != expected['score']:
+                score_drift += 1
+        if mismatches:
+            print(f"❌ {mismatches:,} of {len(results):,} results differ from the on-the-fly re-grade")
+            sys.exit(1)
+        print(f"✅ All {len(results):,} results match the on-the-fly re-grade")
+        if score_drift:
+            print(f"⚠️  {score_drift:,} attempts have a stored score that differs from their question points "
+                  f"(answer key edited; run regrade-attempts.py)")
+    else:
+        print("📋 Skipped, use --verify")
+
+    print("\n[4/4] Firestore...")
+    if args.apply:
+        batches = apply_writes(client, results, deletes)
+        print(f"✅ Wrote {len(results):,} results and deleted {len(deletes):,} in {batches:,} batches")
+    else:
+        print("📋 Dry run, use --apply to write the results")
+
+    print("\n" + "=" * 80)
+    print("✅ COMPLETE!")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
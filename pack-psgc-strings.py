@@ -0,0 +1,316 @@
+"""
+Regenerate PsgcData.kt with province data packed into string constants
+
+Every Barangay("...", "...") literal compiles into constructor bytecode, which
+is what forces the lazy/buildList/chunk workarounds in fix-psgc-*.py and
+split-psgc-provinces.py. This script writes each province as one or more
+`private const val` strings instead. String constants live in the class
+constant pool, so the method that decodes them stays a handful of
+instructions no matter how large the dataset grows.
+
+Packed format (one record per line, tab separated):
+    P<TAB>code<TAB>name     province (or region)
+    M<TAB>code<TAB>name     municipality of the preceding province
+    code<TAB>name           barangay of the preceding municipality
+
+A JVM string constant is limited to 65535 bytes of modified UTF-8, so large
+provinces are split across several constants on record boundaries.
+
+Usage:
+    python pack-psgc-strings.py [--input PATH] [--output PATH] [--check]
+
+    --check   only report sizes and verify the round trip, do not write
+"""
+
+import argparse
+import re
+import sys
+from pathlib import Path
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+PSGC_FILE = 'app/src/main/java/com/onlineexamination/data/model/PsgcData.kt'
+COMPILED_CLASS = 'app/build/tmp/kotlin-classes/debug/com/onlineexamination/data/model/PsgcData.class'
+
+# Stay well below the 65535 byte CONSTANT_Utf8 limit
+MAX_CONSTANT_BYTES = 60000
+
+LIT = r'"((?:[^"\\\n]|\\.)*)"'
+LEGACY_TOKEN = re.compile(
+    rf'Province\(\s*code\s*=\s*{LIT}\s*,\s*name\s*=\s*{LIT}'
+    rf'|Municipality\(\s*code\s*=\s*{LIT}\s*,\s*name\s*=\s*{LIT}'
+    rf'|Municipality\(\s*{LIT}\s*,\s*{LIT}\s*\)'
+    rf'|Barangay\(\s*{LIT}\s*,\s*{LIT}\s*\)'
+)
+PACKED_CONSTANT = re.compile(rf'private const val (PROVINCE_\d+_\d+) = {LIT}')
+KOTLIN_ESCAPES = {'t': '\t', 'b': '\b', 'n': '\n', 'r': '\r', "'": "'", '"': '"', '\\': '\\', '$': '$'}
+
+KOTLIN_HEADER = '''package com.onlineexamination.data.model
+
+data class Barangay(
+    val code: String,
+    val name: String
+)
+
+data class Municipality(
+    val code: String,
+    val name: String,
+    val barangays: List<Barangay> = emptyList()
+)
+
+data class Province(
+    val code: String,
+    val name: String,
+    val municipalities: List<Municipality>
+)
+
+/**
+ * Generated by pack-psgc-strings.py - do not edit by hand.
+ *
+ * Each province is stored as packed string constants and decoded on first access:
+ * "P\\t<code>\\t<name>" starts a province, "M\\t<code>\\t<name>" a municipality and
+ * "<code>\\t<name>" is a barangay of the preceding municipality.
+ */
+object PsgcData {
+    val provinces: List<Province> by lazy { decode(PACKED) }
+
+    private fun decode(chunks: Array<String>): List<Province> {
+        val provinces = mutableListOf<Province>()
+        var province: Province? = null
+        var municipality: Municipality? = null
+        var municipalities = mutableListOf<Municipality>()
+        var barangays = mutableListOf<Barangay>()
+
+        fun closeMunicipality() {
+            municipality?.let { municipalities.add(it.copy(barangays = barangays)) }
+            municipality = null
+        }
+
+        fun closeProvince() {
+            closeMunicipality()
+            province?.let { provinces.add(it.copy(municipalities = municipalities)) }
+            province = null
+        }
+
+        for (chunk in chunks) {
+            for (line in chunk.split('\\n')) {
+                if (line.isEmpty()) continue
+                val fields = line.split('\\t')
+                when (fields[0]) {
+                    "P" -> {
+                        closeProvince()
+                        province = Province(fields[1], fields[2], emptyList())
+                        municipalities = mutableListOf()
+                    }
+                    "M" -> {
+                        closeMunicipality()
+                        municipality = Municipality(fields[1], fields[2])
+                        barangays = mutableListOf()
+                    }
+                    else -> barangays.add(Barangay(fields[0], fields[1]))
+                }
+            }
+        }
+        closeProvince()
+        return provinces
+    }
+'''
+
+
+def decode_kotlin_string(raw):
+    """Decode the body of a Kotlin "..." literal"""
+    if '\\' not in raw:
+        return raw
+    out = []
+    i = 0
+    while i < len(raw):
+        ch = raw[i]
+        if ch == '\\' and i + 1 < len(raw):
+            nxt = raw[i + 1]
+            if nxt == 'u' and i + 6 <= len(raw):
+                out.append(chr(int(raw[i + 2:i + 6], 16)))
+                i += 6
+                continue
+            out.append(KOTLIN_ESCAPES.get(nxt, nxt))
+            i += 2
+            continue
+        out.append(ch)
+        i += 1
+    return ''.join(out)
+
+
+def encode_kotlin_string(value):
+    """Escape a value for a Kotlin "..." literal"""
+    return (value.replace('\\', '\\\\').replace('"', '\\"').replace('$', '\\$')
+            .replace('\n', '\\n').replace('\t', '\\t'))
+
+
+def modified_utf8_length(value):
+    """Byte length of a string in the class file constant pool"""
+    total = 0
+    for ch in value:
+        cp = ord(ch)
+        if 0 < cp < 0x80:
+            total += 1
+        elif cp < 0x800:
+            total += 2
+        elif cp < 0x10000:
+            total += 3
+        else:
+            total += 6
+    return total
+
+
+def parse_legacy(content):
+    """Read Province/Municipality/Barangay constructor calls into a province tree"""
+    provinces = []
+    for m in LEGACY_TOKEN.finditer(content):
+        groups = m.groups()
+        if groups[0] is not None:
+            provinces.append((decode_kotlin_string(groups[0]), decode_kotlin_string(groups[1]), []))
+        elif groups[2] is not None or groups[4] is not None:
+            code, name = (groups[2], groups[3]) if groups[2] is not None else (groups[4], groups[5])
+            provinces[-1][2].append((decode_kotlin_string(code), decode_kotlin_string(name), []))
+        else:
+            provinces[-1][2][-1][2].append((decode_kotlin_string(groups[6]), decode_kotlin_string(groups[7])))
+    return provinces
+
+
+def parse_packed(content):
+    """Read the PROVINCE_n_m constants of an already packed PsgcData.kt"""
+    chunks = [decode_kotlin_string(raw) for _, raw in PACKED_CONSTANT.findall(content)]
+    return decode(chunks)
+
+
+def encode_province(province):
+    """Pack one province into a list of chunks, each under MAX_CONSTANT_BYTES"""
+    code, name, municipalities = province
+    lines = [f'P\t{code}\t{name}\n']
+    for muni_code, muni_name, barangays in municipalities:
+        lines.append(f'M\t{muni_code}\t{muni_name}\n')
+        lines.extend(f'{b_code}\t{b_name}\n' for b_code, b_name in barangays)
+
+    chunks = []
+    current = []
+    size = 0
+    for line in lines:
+        line_size = modified_utf8_length(line)
+        if current and size + line_size > MAX_CONSTANT_BYTES:
+            chunks.append(''.join(current))
+            current, size = [], 0
+        current.append(line)
+        size += line_size
+    chunks.append(''.join(current))
+    return chunks
+
+
+def decode(chunks):
+    """Python mirror of PsgcData.decode() used to prove the format is lossless"""
+    provinces = []
+    for chunk in chunks:
+        for line in chunk.split('\n'):
+            if not line:
+                continue
+            fields = line.split('\t')
+            if fields[0] == 'P':
+                provinces.append((fields[1], fields[2], []))
+            elif fields[0] == 'M':
+                provinces[-1][2].append((fields[1], fields[2], []))
+            else:
+                provinces[-1][2][-1][2].append((fields[0], fields[1]))
+    return provinces
+
+
+def generate_kotlin(packed):
+    """Build PsgcData.kt from [(province_index, [chunk, ...]), ...]"""
+    names = [f'PROVINCE_{index}_{part}' for index, chunks in packed for part in range(len(chunks))]
+    code = KOTLIN_HEADER
+    code += '\n    private val PACKED = arrayOf(\n'
+    code += ',\n'.join(f'        {name}' for name in names)
+    code += '\n    )\n\n'
+    for index, chunks in packed:
+        for part, chunk in enumerate(chunks):
+            code += f'    private const val PROVINCE_{index}_{part} = "{encode_kotlin_string(chunk)}"\n'
+    code += '}\n'
+    return code
+
+
+def estimate_class_size(chunks):
+    """Rough PsgcData.class size: constant pool strings plus field/decoder overhead"""
+    constant_pool = sum(3 + modified_utf8_length(chunk) for chunk in chunks)
+    # Per constant: field_info + ConstantValue attribute + name/String pool entries
+    fields = len(chunks) * 48
+    # decode(), lazy delegate, PACKED initializer and data class references
+    code = 4096 + len(chunks) * 8
+    return constant_pool + fields + code
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack PsgcData.kt into runtime-decoded string constants')
+    parser.add_argument('--input', default=PSGC_FILE)
+    parser.add_argument('--output', default=PSGC_FILE)
+    parser.add_argument('--check', action='store_true', help='report and verify only, do not write')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("Packing PsgcData.kt into string constants")
+    print("=" * 80)
+
+    print(f"\n[1/4] Reading {args.input}...")
+    content = Path(args.input).read_text(encoding='utf-8')
+    if PACKED_CONSTANT.search(content):
+        provinces = parse_packed(content)
+        print("📋 Input is already packed")
+    else:
+        provinces = parse_legacy(content)
+    municipality_count = sum(len(p[2]) for p in provinces)
+    barangay_count = sum(len(m[2]) for p in provinces for m in p[2])
+    print(f"✅ {len(provinces)} provinces, {municipality_count:,} municipalities, {barangay_count:,} barangays")
+
+    for code, name, municipalities in provinces:
+        for value in [code, name] + [v for m in municipalities for v in (m[0], m[1])] + \
+                [v for m in municipalities for b in m[2] for v in b]:
+            if '\t' in value or '\n' in value:
+                print(f"❌ Value contains a tab or newline and cannot be packed: {value!r}")
+                sys.exit(1)
+
+    print("\n[2/4] Encoding provinces...")
+    packed = [(index, encode_province(province)) for index, province in enumerate(provinces)]
+    all_chunks = [chunk for _, chunks in packed for chunk in chunks]
+    largest = max(modified_utf8_length(chunk) for chunk in all_chunks)
+    split = sum(1 for _, chunks in packed if len(chunks) > 1)
+    print(f"✅ {len(all_chunks)} string constants ({split} provinces split across several)")
+    print(f"📋 Largest constant: {largest:,} bytes (limit 65,535)")
+
+    print("\n[3/4] Verifying lossless decode...")
+    kotlin_code = generate_kotlin(packed)
+    if decode(all_chunks) != provinces:
+        print("❌ Decoding the packed chunks does not reproduce the input")
+        sys.exit(1)
+    if parse_packed(kotlin_code) != provinces:
+        print("❌ Decoding the generated Kotlin constants does not reproduce the input")
+        sys.exit(1)
+    print("✅ Packed chunks and generated Kotlin source both decode to the original data")
+
+    print("\n[4/4] Class size report...")
+    print(f"  Source file:                 {len(content.encode('utf-8')):>12,} bytes -> "
+          f"{len(kotlin_code.encode('utf-8')):,} bytes")
+    print(f"  Constructor literals:        {len(provinces) + municipality_count + barangay_count:>12,} -> 0")
+    print(f"  Estimated PsgcData.class:    {estimate_class_size(all_chunks):>12,} bytes")
+    compiled = Path(COMPILED_CLASS)
+    if compiled.exists():
+        print(f"  Last compiled PsgcData.class: {compiled.stat().st_size:>11,} bytes")
+
+    if args.check:
+        print("\n📋 --check given, nothing written")
+    else:
+        Path(args.output).write_text(kotlin_code, encoding='utf-8')
+        print(f"\n✅ Wrote {args.output}")
+
+    print("\n" + "=" * 80)
+    print("✅ COMPLETE!")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Re-grade exam_attempts after an answer key was edited
+
+When a teacher fixes a correctAnswer in EditExamScreen, the stored score,
+percentage and passed of every past ExamAttempt - and the totalScore
+increment that submitExamAttempt applied to the student - go stale.
+
+This script re-applies the submitExamAttempt rules in vectorized form:
+    isCorrect  = answer.trim().equals(correctAnswer.trim(), ignoreCase = true)
+    score      = sum of points of correct questions
+    percentage = score / exam.totalPoints * 100
+    passed     = percentage >= exam.passingScore
+and emits only the writes needed to fix what changed:
+    - one update per attempt whose score/percentage/passed differ
+    - one FieldValue.increment(totalScore) per affected student
+
+ExamAttempt.isPassed is stored by Firestore as "passed" ("isPassed" is
+still read from older exports). Writes are grouped into Firestore batches
+of at most 500 operations, and a student's increment is always committed
+in the same batch as the attempt updates it accounts for ("unit" in the
+deltas file), so a run that fails half way never leaves totalScore out of
+step with the attempts; repeating it from a fresh export is safe.
+
+Export format:
+    exams     NDJSON (one Exam document per line, including "questions")
+    attempts  NDJSON, or CSV with an "answers" column holding the JSON map
+
+Requirements:
+    pip install numpy
+    pip install google-cloud-firestore   (only for --apply / --emulator-test)
+
+Usage:
+    python regrade-attempts.py <exams.ndjson> <attempts.ndjson|csv> [--exam-id ID]
+                               [--output regrade_deltas.ndjson]
+                               [--apply] [--project ID] [--emulator HOST:PORT]
+                               [--emulator-test]
+
+    --apply          write the deltas to Firestore
+    --emulator       use the Firestore emulator (sets FIRESTORE_EMULATOR_HOST)
+    --emulator-test  seed the emulator with the exported attempts and users,
+                     apply the deltas and read everything back to verify
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from itertools import groupby
+from pathlib import Path
+
+import numpy as np
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_PROJECT = 'online-examination-8372d'
+MAX_BATCH_WRITES = 500
+
+
+def read_records(path):
+    """Yield documents from an NDJSON, JSON array or CSV export"""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.suffix.lower() == '.csv':
+            for row in csv.DictReader(f):
+                if row.get('answers'):
+                    row['answers'] = json.loads(row['answers'])
+                for key in ('score', 'totalPoints', 'timeSpentMinutes'):
+                    if row.get(key) not in (None, ''):
+                        row[key] = int(row[key])
+                if row.get('percentage') not in (None, ''):
+                    row['percentage'] = float(row['percentage'])
+                for key in ('passed', 'isPassed'):
+                    if key in row:
+                        row[key] = str(row[key]).lower() == 'true'
+                yield row
+        elif path.suffix.lower() == '.json':
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def normalize(answer):
+    return str(answer).strip().lower()
+
+
+def regrade_exam(exam, attempts):
+    """Return (scores, percentages, passed) arrays for the attempts of one exam"""
+    questions = exam.get('questions') or []
+    column = {q['id']: j for j, q in enumerate(questions)}
+
+    vocabulary = {}
+    key = np.array([vocabulary.setdefault(normalize(q.get('correctAnswer', '')), len(vocabulary))
+                    for q in questions], dtype=np.int32)
+
+    # A missing answer counts as "" (attempt.answers[question.id] ?: ""), so
+    # it is encoded like any other string
+    empty = vocabulary.setdefault('', len(vocabulary))
+    answers = np.full((len(attempts), len(questions)), empty, dtype=np.int32)
+    rows, cols, codes = [], [], []
+    for i, attempt in enumerate(attempts):
+        for question_id, answer in (attempt.get('answers') or {}).items():
+            j = column.get(question_id)
+            if j is None or answer is None:
+                continue
+            rows.append(i)
+            cols.append(j)
+            codes.append(vocabulary.setdefault(normalize(answer), len(vocabulary)))
+    if rows:
+        answers[np.array(rows), np.array(cols)] = np.array(codes, dtype=np.int32)
+
+    points = np.array([int(q.get('points', 10)) for q in questions], dtype=np.int64)
+    scores = (answers == key[None, :]) @ points
+    total_points = float(exam.get('totalPoints', 100))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentages = scores.astype(np.float64) / total_points * 100
+    passed = percentages >= float(exam.get('passingScore', 60))
+    return scores, percentages, passed
+
+
+def compute_deltas(exams, attempts_by_exam):
+    """
+    Attempt updates and totalScore increments, student by student. Each unit
+    (a student's updates, split at MAX_BATCH_WRITES - 1, plus the increment
+    for exactly those updates) must be committed in one batch.
+    """
+    changes = defaultdict(list)
+    for exam_id, attempts in attempts_by_exam.items():
+        scores, percentages, passed = regrade_exam(exams[exam_id], attempts)
+        old_scores = np.array([int(a.get('score', 0)) for a in attempts], dtype=np.int64)
+        old_percentages = np.array([float(a.get('percentage', 0.0)) for a in attempts], dtype=np.float64)
+        old_passed = np.array([bool(a.get('passed', a.get('isPassed', False))) for a in attempts])
+        changed = (scores != old_scores) | (percentages != old_percentages) | (passed != old_passed)
+        for i in np.nonzero(changed)[0]:
+            attempt = attempts[i]
+            fields = {}
+            if scores[i] != old_scores[i]:
+                fields['score'] = int(scores[i])
+            if percentages[i] != old_percentages[i]:
+                fields['percentage'] = float(percentages[i])
+            if passed[i] != old_passed[i]:
+                fields['passed'] = bool(passed[i])
+            changes[attempt['studentId']].append((f"exam_attempts/{attempt['id']}", fields,
+                                                  int(scores[i] - old_scores[i])))
+
+    deltas = []
+    for student_id in sorted(changes):
+        student_changes = changes[student_id]
+        for part, start in enumerate(range(0, len(student_changes), MAX_BATCH_WRITES - 1)):
+            unit = f'{student_id}#{part}'
+            chunk = student_changes[start:start + MAX_BATCH_WRITES - 1]
+            deltas.extend({'op': 'update', 'path': path, 'fields': fields, 'unit': unit}
+                          for path, fields, _ in chunk)
+            score_delta = sum(delta for _, _, delta in chunk)
+            if score_delta:
+                deltas.append({'op': 'increment', 'path': f'users/{student_id}',
+                               'fields': {'totalScore': score_delta}, 'unit': unit})
+    return deltas
+
+
+def firestore_client(project, emulator):
+    if emulator:
+        os.environ['FIRESTORE_EMULATOR_HOST'] = emulator
+    from google.cloud import firestore
+    return firestore.Client(project=project)
+
+
+def pack_units(deltas):
+    """Group the deltas into batches of at most MAX_BATCH_WRITES without splitting a unit"""
+    batches = [[]]
+    for _, unit in groupby(deltas, key=lambda d: d.get('unit')):
+        unit = list(unit)
+        if len(batches[-1]) + len(unit) > MAX_BATCH_WRITES:
+            batches.append([])
+        batches[-1].extend(unit)
+    return [batch for batch in batches if batch]
+
+
+def apply_deltas(client, deltas):
+    """Commit the deltas unit by unit in batches of MAX_BATCH_WRITES; returns the number of batches"""
+    from google.cloud import firestore
+
+    batches = 0
+    for writes in pack_units(deltas):
+        batch = client.batch()
+        for delta in writes:
+            ref = client.document(delta['path'])
+            if delta['op'] == 'increment':
+                batch.update(ref, {k: firestore.Increment(v) for k, v in delta['fields'].items()})
+            else:
+                batch.update(ref, delta['fields'])
+        batch.commit()
+        batches += 1
+    return batches
+
+
+def emulator_test(client, exams, attempts_by_exam, deltas):
+    """Seed the emulator, apply the deltas and check the stored documents"""
+    print("\n📋 Seeding emulator...")
+    totals = defaultdict(int)
+    writes = []
+    for attempts in attempts_by_exam.values():
+        for attempt in attempts:
+            writes.append((f"exam_attempts/{attempt['id']}", attempt))
+            totals[attempt['studentId']] += int(attempt.get('score', 0))
+    for student_id, total in totals.items():
+        writes.append((f'users/{student_id}', {'uid': student_id, 'role': 'STUDENT', 'totalScore': total}))
+    for start in range(0, len(writes), MAX_BATCH_WRITES):
+        batch = client.batch()
+        for path, data in writes[start:start + MAX_BATCH_WRITES]:
+            batch.set(client.document(path), data)
+        batch.commit()
+
+    apply_deltas(client, deltas)
+
+    print("📋 Reading back...")
+    expected_totals = defaultdict(int)
+    failures = 0
+    for exam_id, attempts in attempts_by_exam.items():
+        scores, percentages, passed = regrade_exam(exams[exam_id], attempts)
+        refs = [client.document(f"exam_attempts/{a['id']}") for a in attempts]
+        stored = {snap.id: snap.to_dict() for snap in client.get_all(refs)}
+        for attempt, score, percentage, is_passed in zip(attempts, scores, percentages, passed):
+            doc = stored[attempt['id']]
+            expected_totals[attempt['studentId']] += int(score)
+            if (doc['score'], doc['percentage'], doc['passed']) != (int(score), float(percentage), bool(is_passed)):
+                failures += 1
+    user_refs = [client.document(f'users/{s}') for s in expected_totals]
+    for snap in client.get_all(user_refs):
+        if snap.to_dict()['totalScore'] != expected_totals[snap.id]:
+            failures += 1
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch re-grade exam attempts after answer key edits')
+    parser.add_argument('exams', help='exams export (NDJSON)')
+    parser.add_argument('attempts', help='exam_attempts export (NDJSON or CSV)')
+    parser.add_argument('--exam-id', help='only re-grade this exam')
+    parser.add_argument('--output', default='regrade_deltas.ndjson')
+    parser.add_argument('--apply', action='store_true', help='write the deltas to Firestore')
+    parser.add_argument('--project', default=DEFAULT_PROJECT)
+    parser.add_argument('--emulator', help='Firestore emulator host, e.g. localhost:8080')
+    parser.add_argument('--emulator-test', action='store_true', help='seed, apply and verify against the emulator')
+    args = parser.parse_args()
+
+    if args.emulator_test and not args.emulator:
+        print("❌ --emulator-test needs --emulator HOST:PORT")
+        sys.exit(1)
+
+    print("=" * 80)
+    print("Re-grading exam attempts")
+    print("=" * 80)
+
+    print("\n[1/3] Loading exports...")
+    exams = {e['id']: e for e in read_records(args.exams) if not args.exam_id or e.get('id') == args.exam_id}
+    attempts_by_exam = defaultdict(list)
+    for attempt in read_records(args.attempts):
+        if attempt.get('examId') in exams:
+            attempts_by_exam[attempt['examId']].append(attempt)
+    attempt_count = sum(len(a) for a in attempts_by_exam.values())
+    print(f"✅ {len(exams):,} exams, {attempt_count:,} attempts")
+
+    print("\n[2/3] Re-grading...")
+    started = time.perf_counter()
+    deltas = compute_deltas(exams, attempts_by_exam)
+    seconds = time.perf_counter() - started
+    updates = sum(1 for d in deltas if d['op'] == 'update')
+    increments = len(deltas) - updates
+    print(f"✅ Re-graded in {seconds:.2f}s")
+    print(f"📋 Attempts to update: {updates:,}")
+    print(f"📋 totalScore increments: {increments:,}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        for delta in deltas:
+            f.write(json.dumps(delta) + '\n')
+    print(f"✅ Deltas written to {args.output}")
+
+    print("\n[3/3] Firestore...")
+    if args.emulator_test:
+        client = firestore_client(args.project, args.emulator)
+        failures = emulator_test(client, exams, attempts_by_exam, deltas)
+        if failures:
+            print(f"❌ {failures:,} documents do not match the re-graded values")
+            sys.exit(1)
+        print("✅ Emulator documents match the re-graded values")
+    elif args.apply:
+        client = firestore_client(args.project, args.emulator)
+        batches = apply_deltas(client, deltas)
+        print(f"✅ Applied {len(deltas):,} writes in {batches:,} batches")
+    else:
+        print("📋 Dry run, use --apply to write the deltas")
+
+    print("\n" + "=" * 80)
+    print("✅ COMPLETE!")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,613 @@
+"""
+Schedule make-up sittings for approved special exam requests
+
+Teachers approve SpecialExamRequest documents one at a time and every
+approved student then needs a make-up sitting, arranged by hand. This script
+takes the whole APPROVED backlog and assigns each student to a make-up
+window:
+
+    group     requests are grouped by (examId, teacherId); a student with
+              several requests for the same exam gets one seat
+    window    durationMinutes of the exam plus --buffer, starting on the
+              --step grid inside the teacher's availability, with at most
+              --capacity students
+    clashes   a student cannot sit a window that overlaps one of their
+              other active exams or another make-up window assigned to them;
+              a teacher proctors one window at a time
+
+Only exams whose open period (startDate..endDate) is at most --max-sitting
+hours are treated as fixed sittings that block a student; an exam open for
+days can be taken around the make-up and blocks nothing. Other exams of a
+student are the active exams of their grade (profiles gradeLevelToEnroll)
+and the all-grades exams.
+
+Teacher availability comes from --availability (NDJSON: teacherId, start,
+end in epoch millis). Teachers without entries are available on weekdays
+during --hours for --days days from --from.
+
+The solver is a greedy set cover over intervals. For a group, every
+busy interval [b0, b1) of a student blocks the window starts in
+(b0 - length, b1), a contiguous range of the sorted candidate starts, so
+one difference array gives the number of free students at every start. The
+start with the most free students (earliest on ties) becomes a window, the
+most constrained free students are seated first, and the loop repeats for
+the rest. Students of a grade share their sittings, so the blocked ranges
+of a grade are computed once per group and weighted by the number of its
+students who have no make-up yet. Groups are scheduled largest first.
+
+Runs are incremental. Requests that already carry a sessionId keep their
+seat, and their sessions (from the stamped requests and --sessions) are
+loaded as teacher and student commitments before anything new is placed.
+A new request of an already seated student for the same exam joins that
+student's session, and newly approved students first fill free seats of
+the existing sessions of their group before new windows are opened.
+--reschedule ignores the existing sessions and seats every approved request
+again; with --apply the replaced session documents are deleted and requests
+stamped with a replaced session that found no new seat lose their sessionId,
+scheduledStart and scheduledEnd, so the next run schedules them again.
+
+--verify re-checks every window against the constraints independently
+and compares the number of windows with the ceil(students / capacity)
+lower bound (after the free seats of existing sessions). --synthetic N
+generates a backlog of N requests.
+
+Export format:
+    requests  NDJSON (special_exam_requests documents)
+    exams     NDJSON (Exam documents, questions not needed)
+    profiles  NDJSON (student profiles, "userId" or "uid", gradeLevelToEnroll)
+    sessions  NDJSON (special_exam_sessions documents, optional)
+
+Requirements:
+    pip install google-cloud-firestore   (only for --apply)
+
+Usage:
+    python schedule-special-exams.py <requests.ndjson> <exams.ndjson> <profiles.ndjson>
+                                     [--availability teachers.ndjson]
+                                     [--sessions special_exam_sessions.ndjson] [--reschedule]
+                                     [--from YYYY-MM-DD] [--days 14] [--hours 08:00-17:00]
+                                     [--utc-offset 8] [--step 30] [--buffer 15]
+                                     [--capacity 40] [--max-sitting 8]
+                                     [--output make_up_windows.ndjson] [--verify]
+                                     [--apply] [--project ID] [--emulator HOST:PORT]
+    python schedule-special-exams.py --synthetic 5000 [--seed 1] [--verify]
+"""
+
+import argparse
+import bisect
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_PROJECT = 'online-examination-8372d'
+MAX_BATCH_WRITES = 500
+MINUTE = 60 * 1000
+HOUR = 60 * MINUTE
+GRADES = ['Grade 7', 'Grade 8', 'Grade 9', 'Grade 10', 'Grade 11', 'Grade 12']
+
+
+def read_records(path):
+    """Yield documents from an NDJSON or JSON array export"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if Path(path).suffix.lower() == '.json':
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def merge(intervals):
+    """Sorted, non-overlapping union of [start, end) intervals"""
+    merged = []
+    for start, end in sorted(tuple(i) for i in intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def default_availability(first_day, days, hours, offset):
+    """Weekday [start, end) school hours in epoch millis"""
+    (start_h, start_m), (end_h, end_m) = (map(int, part.split(':')) for part in hours.split('-'))
+    zone = timezone(timedelta(hours=offset))
+    day = datetime.strptime(first_day, '%Y-%m-%d').replace(tzinfo=zone)
+    windows = []
+    for _ in range(days):
+        if day.weekday() < 5:
+            windows.append((int(day.replace(hour=start_h, minute=start_m).timestamp() * 1000),
+                            int(day.replace(hour=end_h, minute=end_m).timestamp() * 1000)))
+        day += timedelta(days=1)
+    return windows
+
+
+def candidate_starts(availability, length, step, taken):
+    """Window starts on the step grid that fit an availability interval and miss the taken windows"""
+    starts = []
+    for free_start, free_end in merge(availability):
+        first = -(-free_start // step) * step
+        starts.extend(range(first, free_end - length + 1, step))
+    if taken:
+        starts = [s for s in starts if not overlaps(taken, s, s + length)]
+    return starts
+
+
+def overlaps(intervals, start, end):
+    """Whether [start, end) overlaps one of the sorted, non-overlapping intervals"""
+    position = bisect.bisect_left(intervals, [end]) - 1
+    return position >= 0 and intervals[position][1] > start
+
+
+def blocked_ranges(busy, starts, length):
+    """Merged [lo, hi) index ranges of the starts whose window overlaps a busy interval"""
+    ranges = []
+    for b0, b1 in busy:
+        lo = bisect.bisect_right(starts, b0 - length)
+        hi = bisect.bisect_left(starts, b1)
+        if lo < hi:
+            if ranges and lo <= ranges[-1][1]:
+                ranges[-1][1] = max(ranges[-1][1], hi)
+            else:
+                ranges.append([lo, hi])
+    return ranges
+
+
+class Scheduler:
+    """Greedy interval scheduler shared by all groups: tracks teacher and student commitments"""
+
+    def __init__(self, sittings, student_grade, availability, default, step, buffer, capacity):
+        self.sittings = sittings
+        self.student_grade = student_grade
+        self.availability = availability
+        self.default = default
+        self.step = step
+        self.buffer = buffer
+        self.capacity = capacity
+        self.teacher_taken = defaultdict(list)
+        self.student_taken = defaultdict(list)
+
+    def preload(self, sessions):
+        """Existing sessions are commitments of their teacher and students"""
+        for session in sessions:
+            window = [session['start'], session['end']]
+            self.teacher_taken[session['teacherId']].append(window)
+            for student_id in session['studentIds']:
+                self.student_taken[student_id].append(window)
+        for taken in (self.teacher_taken, self.student_taken):
+            for owner in taken:
+                taken[owner] = merge(taken[owner])
+
+    def student_busy(self, student_id, exam_id):
+        grade = self.student_grade.get(student_id, '')
+        busy = [s for s in self.sittings.get(grade, []) if s[2] != exam_id]
+        return merge([s[:2] for s in busy] + self.student_taken[student_id])
+
+    def join_sessions(self, sessions, students):
+        """Seat students in free seats of existing sessions of their group; returns [(studentId, session)]"""
+        joined = []
+        remaining = sorted(students)
+        for session in sorted(sessions, key=lambda s: s['start']):
+            start, end = session['start'], session['end']
+            for student_id in list(remaining):
+                if len(session['studentIds']) >= self.capacity:
+                    break
+                if not overlaps(self.student_busy(student_id, session['examId']), start, end):
+                    session['studentIds'].append(student_id)
+                    bisect.insort(self.student_taken[student_id], [start, end])
+                    joined.append((student_id, session))
+                    remaining.remove(student_id)
+        return joined
+
+    def schedule_group(self, exam, teacher_id, students):
+        """Seat the students of one group; returns (windows, unscheduled students)"""
+        length = int(exam.get('durationMinutes') or 60) * MINUTE + self.buffer
+        starts = candidate_starts(self.availability.get(teacher_id, self.default), length, self.step,
+                                  self.teacher_taken[teacher_id])
+        exam_id = exam['id']
+
+        # Students without a make-up so far only have their grade's sittings
+        grade_busy = {grade: merge(s[:2] for s in self.sittings.get(grade, []) if s[2] != exam_id)
+                      for grade in {self.student_grade.get(s, '') for s in students}}
+        grade_ranges = {grade: blocked_ranges(busy, starts, length) for grade, busy in grade_busy.items()}
+
+        remaining = set(students)
+        windows = []
+        while remaining and starts:
+            shared = defaultdict(int)
+            own = {}
+            for student_id in remaining:
+                if self.student_taken[student_id]:
+                    own[student_id] = blocked_ranges(self.student_busy(student_id, exam_id), starts, length)
+                else:
+                    shared[self.student_grade.get(student_id, '')] += 1
+            blocked = [0] * (len(starts) + 1)
+            for grade, count in shared.items():
+                for lo, hi in grade_ranges[grade]:
+                    blocked[lo] += count
+                    blocked[hi] -= count
+            for ranges in own.values():
+                for lo, hi in ranges:
+                    blocked[lo] += 1
+                    blocked[hi] -= 1
+            best, best_blocked, running = None, None, 0
+            for index in range(len(starts)):
+                running += blocked[index]
+                if best is None or running < best_blocked:
+                    best, best_blocked = index, running
+            if best_blocked == len(remaining):
+                break
+
+            # Seat the free students with the fewest other options first
+            def options(student_id):
+                ranges = own.get(student_id) or grade_ranges[self.student_grade.get(student_id, '')]
+                return len(starts) - sum(hi - lo for lo, hi in ranges), student_id
+
+            free = [s for s in remaining
+                    if not any(lo <= best < hi for lo, hi in
+                               own.get(s) or grade_ranges[self.student_grade.get(s, '')])]
+            seated = sorted(free, key=options)[:self.capacity]
+            start = starts[best]
+            end = start + length
+            windows.append((start, end, seated))
+            remaining.difference_update(seated)
+            for student_id in seated:
+                bisect.insort(self.student_taken[student_id], [start, end])
+            bisect.insort(self.teacher_taken[teacher_id], [start, end])
+            starts = [s for s in starts if s + length <= start or s >= end]
+            grade_ranges = {grade: blocked_ranges(busy, starts, length) for grade, busy in grade_busy.items()}
+        return windows, sorted(remaining)
+
+
+def fixed_sittings(exams, max_sitting):
+    """{gradeLevel: [(startDate, endDate + 1, examId)]} of short active exams; "" exams apply to every grade"""
+    by_grade = defaultdict(list)
+    for exam in exams:
+        start, end = int(exam.get('startDate') or 0), int(exam.get('endDate') or 0) + 1
+        if exam.get('active', exam.get('isActive', True)) and 0 < end - start <= max_sitting:
+            by_grade[exam.get('gradeLevel', '')].append((start, end, exam['id']))
+    every_grade = by_grade.pop('', [])
+    sittings = {grade: sorted(items + every_grade) for grade, items in by_grade.items()}
+    sittings[''] = sorted(every_grade)
+    for grade in GRADES:
+        sittings.setdefault(grade, sorted(every_grade))
+    return sittings
+
+
+def existing_sessions(requests, sessions):
+    """{sessionId: session} of the --sessions export and the sessions stamped on requests"""
+    booked = {s['id']: {**s, 'studentIds': list(s.get('studentIds') or []),
+                        'requestIds': list(s.get('requestIds') or [])} for s in sessions}
+    for request in requests:
+        session_id = request.get('sessionId')
+        if not session_id or request.get('status') != 'APPROVED':
+            continue
+        session = booked.setdefault(session_id, {
+            'id': session_id, 'examId': request.get('examId', ''), 'teacherId': request.get('teacherId', ''),
+            'start': int(request['scheduledStart']), 'end': int(request['scheduledEnd']),
+            'studentIds': [], 'requestIds': []})
+        if request['studentId'] not in session['studentIds']:
+            session['studentIds'].append(request['studentId'])
+        if request['id'] not in session['requestIds']:
+            session['requestIds'].append(request['id'])
+    return booked
+
+
+def group_requests(requests, booked):
+    """({(examId, teacherId): {studentId: [requestIds]}} of the APPROVED requests without a seat,
+    [(requestId, studentId, session)] of new requests whose student already has a seat for that exam)"""
+    seat_of = {(s['examId'], s['teacherId'], student_id): s
+               for s in booked.values() for student_id in s['studentIds']}
+    groups = defaultdict(lambda: defaultdict(list))
+    attach = []
+    for request in requests:
+        if request.get('status') != 'APPROVED' or not request.get('examId') or not request.get('studentId'):
+            continue
+        key = (request['examId'], request.get('teacherId', ''), request['studentId'])
+        if key in seat_of:
+            if request['id'] not in seat_of[key]['requestIds']:
+                attach.append((request['id'], key[2], seat_of[key]))
+        else:
+            groups[key[:2]][key[2]].append(request['id'])
+    return groups, attach
+
+
+def solve(groups, exams_by_id, scheduler, booked):
+    """Schedule every group, largest first; returns (window documents, joined [(requestId, studentId,
+    session)], unscheduled, missing exams)"""
+    documents = []
+    joined = []
+    unscheduled = []
+    missing = []
+    sessions_of = defaultdict(list)
+    for session in booked.values():
+        sessions_of[(session['examId'], session['teacherId'])].append(session)
+    for (exam_id, teacher_id), students in sorted(groups.items(), key=lambda g: (-len(g[1]), g[0])):
+        exam = exams_by_id.get(exam_id)
+        if exam is None:
+            missing.append(exam_id)
+            continue
+        seated = scheduler.join_sessions(sessions_of[(exam_id, teacher_id)], students)
+        joined.extend((r, student_id, session) for student_id, session in seated for r in students[student_id])
+        placed = {student_id for student_id, _ in seated}
+        windows, left = scheduler.schedule_group(exam, teacher_id, sorted(set(students) - placed))
+        for start, end, seated in windows:
+            documents.append({
+                'id': f'{exam_id}_{teacher_id}_{start}',
+                'examId': exam_id,
+                'examTitle': exam.get('title', ''),
+                'teacherId': teacher_id,
+                'start': start,
+                'end': end,
+                'studentIds': sorted(seated),
+                'requestIds': sorted(r for s in seated for r in students[s]),
+            })
+        unscheduled.extend((exam_id, teacher_id, s) for s in left)
+    return documents, joined, unscheduled, missing
+
+
+def verify(documents, groups, scheduler, unscheduled, booked, joined):
+    """Independent check of the constraints; returns a list of problems"""
+    problems = []
+    by_teacher = defaultdict(list)
+    by_student = defaultdict(list)
+    seated = defaultdict(int)
+    for session in booked.values():
+        by_teacher[session['teacherId']].append((session['start'], session['end'], session['id']))
+        for student_id in session['studentIds']:
+            by_student[student_id].append((session['start'], session['end'], session['id']))
+    # Students seated in existing sessions by this run
+    for student_id, session in {(s, session['id']): (s, session) for _, s, session in joined}.values():
+        start, end = session['start'], session['end']
+        seated[(session['examId'], session['teacherId'], student_id)] += 1
+        if len(session['studentIds']) > scheduler.capacity:
+            problems.append(f"{session['id']} over capacity")
+        grade = scheduler.student_grade.get(student_id, '')
+        for s0, s1, other in scheduler.sittings.get(grade, []):
+            if other != session['examId'] and s0 < end and start < s1:
+                problems.append(f"{student_id} clashes with exam {other} in {session['id']}")
+    for window in documents:
+        start, end = window['start'], window['end']
+        if len(window['studentIds']) > scheduler.capacity:
+            problems.append(f"{window['id']} over capacity")
+        available = scheduler.availability.get(window['teacherId'], scheduler.default)
+        if not any(a <= start and end <= b for a, b in available):
+            problems.append(f"{window['id']} outside teacher availability")
+        by_teacher[window['teacherId']].append((start, end, window['id']))
+        for student_id in window['studentIds']:
+            by_student[student_id].append((start, end, window['id']))
+            seated[(window['examId'], window['teacherId'], student_id)] += 1
+            grade = scheduler.student_grade.get(student_id, '')
+            for s0, s1, other in scheduler.sittings.get(grade, []):
+                if other != window['examId'] and s0 < end and start < s1:
+                    problems.append(f"{student_id} clashes with exam {other} in {window['id']}")
+    for owner, intervals in list(by_teacher.items()) + list(by_student.items()):
+        intervals.sort()
+        for (_, end, first), (start, _, second) in zip(intervals, intervals[1:]):
+            if start < end:
+                problems.append(f"{owner} double booked in {first} and {second}")
+    left = {(e, t, s) for e, t, s in unscheduled}
+    for (exam_id, teacher_id), students in groups.items():
+        for student_id in students:
+            key = (exam_id, teacher_id, student_id)
+            if seated[key] != (0 if key in left else 1):
+                problems.append(f"{student_id} seated {seated[key]} times for {exam_id}")
+    return problems
+
+
+def synthetic_backlog(count, first_day, days, offset, seed):
+    """(requests, exams, profiles) of a term-end backlog with fixed sittings in every grade"""
+    rng = random.Random(seed)
+    day_windows = default_availability(first_day, days, '08:00-17:00', offset)
+    teachers = [f'teacher{i:04d}' for i in range(max(1, count // 80))]
+    students = [f'student{i:06d}' for i in range(max(1, count // 2))]
+    profiles = [{'userId': s, 'gradeLevelToEnroll': rng.choice(GRADES)} for s in students]
+    exams = []
+    for i in range(max(1, count // 25)):
+        opened = rng.randint(-30, -1) * 24 * HOUR + day_windows[0][0]
+        exams.append({'id': f'exam{i:05d}', 'title': f'Quarter Exam {i}', 'teacherId': rng.choice(teachers),
+                      'gradeLevel': rng.choice(GRADES), 'durationMinutes': rng.choice([30, 45, 60, 90, 120]),
+                      'startDate': opened, 'endDate': opened + 7 * 24 * HOUR, 'active': True})
+    # Regular timed sittings during the make-up period
+    for i in range(len(day_windows) * len(GRADES) * 2):
+        day_start, _ = rng.choice(day_windows)
+        start = day_start + rng.randint(0, 14) * 30 * MINUTE
+        exams.append({'id': f'sitting{i:05d}', 'title': f'Timed Quiz {i}', 'teacherId': rng.choice(teachers),
+                      'gradeLevel': rng.choice(GRADES + ['']), 'durationMinutes': 60,
+                      'startDate': start, 'endDate': start + rng.choice([1, 2]) * HOUR - 1, 'active': True})
+    grade_of = {p['userId']: p['gradeLevelToEnroll'] for p in profiles}
+    term_exams = defaultdict(list)
+    for exam in exams[:max(1, count // 25)]:
+        term_exams[exam['gradeLevel']].append(exam)
+    requests = []
+    for i in range(count):
+        student_id = rng.choice(students)
+        exam = rng.choice(term_exams.get(grade_of[student_id]) or exams[:1])
+        requests.append({'id': f'request{i:06d}', 'studentId': student_id, 'examId': exam['id'],
+                         'examTitle': exam['title'], 'teacherId': exam['teacherId'], 'reason': 'Medical',
+                         'status': rng.choices(['APPROVED', 'PENDING', 'REJECTED'], [0.8, 0.15, 0.05])[0],
+                         'requestedAt': day_windows[0][0] - rng.randint(1, 20) * 24 * HOUR})
+    return requests, exams, profiles
+
+
+def firestore_client(project, emulator):
+    if emulator:
+        os.environ['FIRESTORE_EMULATOR_HOST'] = emulator
+    from google.cloud import firestore
+    return firestore.Client(project=project)
+
+
+def apply_schedule(client, documents, attach, replaced, cleared):
+    """Write special_exam_sessions/{id}, stamp the seated requests, delete replaced sessions and
+    clear the stamps of the `cleared` requests, in batches of MAX_BATCH_WRITES"""
+    from google.cloud import firestore
+
+    sessions = client.collection('special_exam_sessions')
+    requests = client.collection('special_exam_requests')
+    operations = []
+    for window in documents:
+        operations.append(('set', sessions.document(window['id']),
+                           {**window, 'createdAt': firestore.SERVER_TIMESTAMP}))
+        for request_id in window['requestIds']:
+            operations.append(('merge', requests.document(request_id),
+                               {'sessionId': window['id'], 'scheduledStart': window['start'],
+                                'scheduledEnd': window['end']}))
+    for request_id, student_id, session in attach:
+        operations.append(('merge', sessions.document(session['id']),
+                           {'requestIds': firestore.ArrayUnion([request_id]),
+                            'studentIds': firestore.ArrayUnion([student_id])}))
+        operations.append(('merge', requests.document(request_id),
+                           {'sessionId': session['id'], 'scheduledStart': session['start'],
+                            'scheduledEnd': session['end']}))
+    new_ids = {window['id'] for window in documents}
+    operations.extend(('delete', sessions.document(i), None) for i in sorted(replaced - new_ids))
+    operations.extend(('merge', requests.document(request_id),
+                       {'sessionId': firestore.DELETE_FIELD, 'scheduledStart': firestore.DELETE_FIELD,
+                        'scheduledEnd': firestore.DELETE_FIELD}) for request_id in cleared)
+    batches = 0
+    for start in range(0, len(operations), MAX_BATCH_WRITES):
+        batch = client.batch()
+        for op, ref, data in operations[start:start + MAX_BATCH_WRITES]:
+            if op == 'delete':
+                batch.delete(ref)
+            else:
+                batch.set(ref, data, merge=op == 'merge')
+        batch.commit()
+        batches += 1
+    return batches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Schedule make-up sittings for approved special exam requests')
+    parser.add_argument('requests', nargs='?', help='special_exam_requests export (NDJSON)')
+    parser.add_argument('exams', nargs='?', help='exams export (NDJSON)')
+    parser.add_argument('profiles', nargs='?', help='student profiles export (NDJSON)')
+    parser.add_argument('--availability', help='teacher availability (NDJSON: teacherId, start, end)')
+    parser.add_argument('--sessions', help='special_exam_sessions export; existing sessions are kept')
+    parser.add_argument('--reschedule', action='store_true',
+                        help='seat every approved request again and replace the existing sessions')
+    parser.add_argument('--from', dest='first_day', default=(datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d'))
+    parser.add_argument('--days', type=int, default=14)
+    parser.add_argument('--hours', default='08:00-17:00', help='default teacher hours on weekdays')
+    parser.add_argument('--utc-offset', type=float, default=8, help='hours, default Philippine time')
+    parser.add_argument('--step', type=int, default=30, help='window start grid (minutes)')
+    parser.add_argument('--buffer', type=int, default=15, help='minutes added to the exam duration')
+    parser.add_argument('--capacity', type=int, default=40, help='students per window')
+    parser.add_argument('--max-sitting', type=float, default=8, help='longest exam (hours) that blocks a student')
+    parser.add_argument('--output', default='make_up_windows.ndjson')
+    parser.add_argument('--verify', action='store_true', help='re-check every window against the constraints')
+    parser.add_argument('--synthetic', type=int, metavar='N', help='schedule N generated requests')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--apply', action='store_true', help='write the sessions and stamp the requests')
+    parser.add_argument('--project', default=DEFAULT_PROJECT)
+    parser.add_argument('--emulator', help='Firestore emulator host, e.g. localhost:8080')
+    args = parser.parse_args()
+    if not args.synthetic and not (args.requests and args.exams and args.profiles):
+        parser.error('give the requests, exams and profiles exports or --synthetic N')
+
+    print("=" * 80)
+    print("Scheduling special exams")
+    print("=" * 80)
+
+    print("\n[1/3] Loading...")
+    if args.synthetic:
+        requests, exams, profiles = synthetic_backlog(args.synthetic, args.first_day, args.days,
+                                                      args.utc_offset, args.seed)
+    else:
+        requests = list(read_records(args.requests))
+        exams = list(read_records(args.exams))
+        profiles = list(read_records(args.profiles))
+    availability = defaultdict(list)
+    if args.availability:
+        for entry in read_records(args.availability):
+            availability[entry['teacherId']].append((int(entry['start']), int(entry['end'])))
+    student_grade = {p.get('userId') or p.get('uid'): p.get('gradeLevelToEnroll', '') for p in profiles}
+    booked = existing_sessions(requests, read_records(args.sessions) if args.sessions else [])
+    replaced = set()
+    if args.reschedule:
+        replaced = set(booked)
+        booked = {}
+    groups, attach = group_requests(requests, booked)
+    approved = sum(len(ids) for students in groups.values() for ids in students.values())
+    seats = sum(len(students) for students in groups.values())
+    print(f"✅ {len(requests):,} requests, {approved:,} approved without a session: "
+          f"{seats:,} students in {len(groups):,} groups")
+    if booked:
+        print(f"📋 {len(booked):,} existing sessions kept, {len(attach):,} new requests join their student's session")
+    if replaced:
+        print(f"📋 Rescheduling: {len(replaced):,} existing sessions will be replaced")
+
+    sittings = fixed_sittings(exams, args.max_sitting * HOUR)
+    default = default_availability(args.first_day, args.days, args.hours, args.utc_offset)
+    print(f"📋 {sum(len(s) for g, s in sittings.items() if g):,} fixed grade sittings, "
+          f"{len(default):,} default teacher days from {args.first_day}")
+
+    print("\n[2/3] Solving...")
+    scheduler = Scheduler(sittings, student_grade, availability, default,
+                          args.step * MINUTE, args.buffer * MINUTE, args.capacity)
+    scheduler.preload(booked.values())
+    exams_by_id = {e['id']: e for e in exams}
+    free_seats = defaultdict(int)
+    for session in booked.values():
+        free_seats[(session['examId'], session['teacherId'])] += max(0, args.capacity - len(session['studentIds']))
+    lower_bound = sum(-(-max(0, len(s) - free_seats[g]) // args.capacity) for g, s in groups.items()
+                      if g[0] in exams_by_id)
+    started = time.perf_counter()
+    documents, joined, unscheduled, missing = solve(groups, exams_by_id, scheduler, booked)
+    seconds = time.perf_counter() - started
+    print(f"✅ {len(documents):,} new windows for {seats - len(unscheduled):,} students in {seconds:.2f}s "
+          f"(lower bound {lower_bound:,} windows)")
+    if joined:
+        print(f"📋 {len({(s, session['id']) for _, s, session in joined}):,} students took free seats in existing sessions")
+    if unscheduled:
+        print(f"⚠️  {len(unscheduled):,} students have no free window; extend --days or --availability")
+    if missing:
+        print(f"⚠️  {len(missing):,} groups reference deleted exams")
+    # Requests of a replaced session without a new seat must not keep the old stamp,
+    # or the next run rebuilds the deleted session from it
+    reseated = {r for window in documents for r in window['requestIds']} | {r for r, _, _ in attach + joined}
+    cleared = sorted(r['id'] for r in requests if r.get('sessionId') in replaced and r['id'] not in reseated)
+    if cleared:
+        print(f"📋 {len(cleared):,} requests lose the stamp of a replaced session")
+
+    if args.verify:
+        problems = verify(documents, groups, scheduler, unscheduled, booked, joined)
+        for problem in problems[:20]:
+            print(f"  ❌ {problem}")
+        if problems:
+            print(f"❌ {len(problems):,} constraint violations")
+            sys.exit(1)
+        print("✅ Every window fits teacher availability, capacity and student clashes")
+
+    print(f"\n[3/3] Writing {args.output}...")
+    with open(args.output, 'w', encoding='utf-8') as f:
+        for window in documents:
+            f.write(json.dumps(window, ensure_ascii=False) + '\n')
+        for request_id, student_id, session in attach + joined:
+            f.write(json.dumps({'joined': True, 'sessionId': session['id'], 'studentId': student_id,
+                                'requestId': request_id}) + '\n')
+        for exam_id, teacher_id, student_id in unscheduled:
+            f.write(json.dumps({'unscheduled': True, 'examId': exam_id, 'teacherId': teacher_id,
+                                'studentId': student_id, 'requestIds': groups[(exam_id, teacher_id)][student_id]}) + '\n')
+    print(f"✅ {len(documents):,} windows written")
+    if args.apply:
+        client = firestore_client(args.project, args.emulator)
+        batches = apply_schedule(client, documents, attach + joined, replaced, cleared)
+        print(f"✅ Wrote the sessions and stamped the requests in {batches:,} batches")
+    else:
+        print("📋 Dry run, use --apply to write special_exam_sessions")
+
+    print("\n" + "=" * 80)
+    print("✅ COMPLETE!")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+Bulk load users, profiles, lrn_index entries and exams into Firestore
+
+Standing up a staging project or the emulator by signing up students one at a
+time through the app is slow. This loader reads NDJSON or CSV rosters and
+writes the same documents the app creates:
+
+    users/{uid}                          User fields
+    users/{uid}/profiles/student         StudentInfo fields (role STUDENT)
+    users/{uid}/profiles/teacher         TeacherInfo fields (role TEACHER)
+    lrn_index/{lrn}                      { userId, createdAt } (see LRN_INDEX_SOLUTION.md)
+    exams/{id}                           Exam documents (questionCount is filled in)
+
+Writes are grouped into 500-operation batches and committed through a bounded
+pool of concurrent commits. Every committed batch is recorded in a checkpoint
+file, so a failed or interrupted run can be restarted and skips what is
+already written.
+
+Roster format:
+    NDJSON  one user per line; User fields at the top level and the profile
+            under "profile"
+    CSV     one user per row; columns named like User fields go to users/{uid},
+            every other non-empty column goes to the profile
+
+Requirements:
+    pip install google-cloud-firestore
+
+Usage:
+    python seed-firestore.py [--users FILE] [--exams FILE] [--project ID]
+                             [--emulator HOST:PORT] [--concurrency N]
+                             [--checkpoint FILE] [--restart]
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_PROJECT = 'online-examination-8372d'
+MAX_BATCH_WRITES = 500
+# Commit requests are limited to 10 MiB; exams with many questions can get close
+MAX_BATCH_BYTES = 8_000_000
+MAX_RETRIES = 5
+
+USER_FIELDS = {'uid', 'email', 'username', 'role', 'photoUrl', 'emailVerified', 'isVerified',
+               'createdAt', 'fcmToken', 'totalScore', 'examsTaken'}
+BOOLEAN_FIELDS = {'emailVerified', 'isVerified', 'isActive', 'active'}
+INTEGER_FIELDS = {'createdAt', 'totalScore', 'examsTaken', 'durationMinutes', 'totalPoints',
+                  'passingScore', 'startDate', 'endDate'}
+
+
+def read_records(path):
+    """Yield documents from an NDJSON, JSON array or CSV export"""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.suffix.lower() == '.csv':
+            for row in csv.DictReader(f):
+                yield {k: v for k, v in row.items() if v not in (None, '')}
+        elif path.suffix.lower() == '.json':
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def coerce(document):
+    """CSV values arrive as strings; restore the types the Kotlin models use"""
+    for key, value in document.items():
+        if not isinstance(value, str):
+            continue
+        if key in BOOLEAN_FIELDS:
+            document[key] = value.lower() == 'true'
+        elif key in INTEGER_FIELDS:
+            document[key] = int(value)
+    return document
+
+
+def user_operations(record, now):
+    """Turn one roster record into (path, data) writes"""
+    record = dict(record)
+    profile = record.pop('profile', None)
+    if profile is None:
+        profile = {k: v for k, v in record.items() if k not in USER_FIELDS}
+        record = {k: v for k, v in record.items() if k in USER_FIELDS}
+    user = coerce(record)
+    uid = user.get('uid')
+    if not uid:
+        raise ValueError(f"roster entry without uid: {record}")
+    user.setdefault('role', 'STUDENT')
+    user.setdefault('createdAt', now)
+    user.setdefault('totalScore', 0)
+    user.setdefault('examsTaken', 0)
+
+    operations = [(f'users/{uid}', user)]
+    if user['role'] == 'STUDENT':
+        if profile:
+            operations.append((f'users/{uid}/profiles/student', profile))
+        lrn = str(profile.get('lrn', '')).strip() if profile else ''
+        if lrn:
+            operations.append((f'lrn_index/{lrn}', {'userId': uid, 'createdAt': user['createdAt']}))
+    elif user['role'] == 'TEACHER' and profile:
+        operations.append((f'users/{uid}/profiles/teacher', profile))
+    return operations
+
+
+def exam_operations(record):
+    exam = coerce(dict(record))
+    if isinstance(exam.get('questions'), str):
+        exam['questions'] = json.loads(exam['questions'])
+    exam['questionCount'] = len(exam.get('questions') or [])
+    return [(f"exams/{exam['id']}", exam)]
+
+
+def batches(args, now):
+    """Yield (batch_number, operations) in a deterministic order"""
+    pending = []
+    pending_bytes = 0
+    number = 0
+    sources = []
+    if args.users:
+        sources.append((args.users, lambda r: user_operations(r, now)))
+    if args.exams:
+        sources.append((args.exams, exam_operations))
+    for path, to_operations in sources:
+        for record in read_records(path):
+            for operation in to_operations(record):
+                size = len(json.dumps(operation[1], ensure_ascii=False))
+                if pending and (len(pending) == MAX_BATCH_WRITES or pending_bytes + size > MAX_BATCH_BYTES):
+                    yield number, pending
+                    number += 1
+                    pending, pending_bytes = [], 0
+                pending.append(operation)
+                pending_bytes += size
+    if pending:
+        yield number, pending
+
+
+class Checkpoint:
+    """Committed batch numbers, stored as a contiguous prefix plus stragglers"""
+
+    def __init__(self, path, signature):
+        self.path = path
+        self.signature = signature
+        self.prefix = 0
+        self.done = set()
+        self.last_save = 0.0
+        if path and Path(path).exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('signature') == signature:
+                self.prefix = data['prefix']
+                self.done = set(data['done'])
+
+    def is_done(self, number):
+        return number < self.prefix or number in self.done
+
+    def mark(self, number):
+        self.done.add(number)
+        while self.prefix in self.done:
+            self.done.remove(self.prefix)
+            self.prefix += 1
+        if time.monotonic() - self.last_save > 1.0:
+            self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = Path(str(self.path) + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'signature': self.signature, 'prefix': self.prefix, 'done': sorted(self.done)}, f)
+        os.replace(tmp, self.path)
+        self.last_save = time.monotonic()
+
+
+def input_signature(args):
+    """Checkpoints only apply to the same input files"""
+    digest = hashlib.sha1()
+    for path in (args.users, args.exams):
+        if path:
+            stat = Path(path).stat()
+            digest.update(f'{Path(path).resolve()}:{stat.st_size}:{stat.st_mtime_ns}'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+async def load(args):
+    if args.emulator:
+        os.environ['FIRESTORE_EMULATOR_HOST'] = args.emulator
+    from google.cloud import firestore
+    client = firestore.AsyncClient(project=args.project)
+
+    if args.restart and Path(args.checkpoint).exists():
+        Path(args.checkpoint).unlink()
+    checkpoint = Checkpoint(args.checkpoint, input_signature(args))
+    if checkpoint.prefix or checkpoint.done:
+        print(f"📋 Resuming: {checkpoint.prefix + len(checkpoint.done):,} batches already committed")
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    stats = {'documents': 0, 'batches': 0, 'skipped': 0, 'retries': 0}
+    failures = []
+    tasks = set()
+
+    async def commit(number, operations):
+        try:
+            for attempt in range(MAX_RETRIES):
+                try:
+                    batch = client.batch()
+                    for path, data in operations:
+                        batch.set(client.document(path), data)
+                    await batch.commit()
+                    checkpoint.mark(number)
+                    stats['documents'] += len(operations)
+                    stats['batches'] += 1
+                    return
+                except Exception as e:
+                    if attempt == MAX_RETRIES - 1:
+                        failures.append((number, e))
+                        return
+                    stats['retries'] += 1
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+        finally:
+            semaphore.release()
+
+    started = time.perf_counter()
+    last_report = started
+    now = int(time.time() * 1000)
+    for number, operations in batches(args, now):
+        if checkpoint.is_done(number):
+            stats['skipped'] += 1
+            continue
+        if failures:
+            break
+        # Acquire before creating the task so at most `concurrency` batches are held in memory
+        await semaphore.acquire()
+        task = asyncio.create_task(commit(number, operations))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        if time.perf_counter() - last_report > 5:
+            elapsed = time.perf_counter() - started
+            print(f"  {stats['documents']:,} documents, {stats['documents'] / elapsed * 60:,.0f}/min")
+            last_report = time.perf_counter()
+    if tasks:
+        await asyncio.gather(*tasks)
+    checkpoint.save()
+    return stats, failures, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent batched bulk loader for Firestore')
+    parser.add_argument('--users', help='users roster (NDJSON or CSV)')
+    parser.add_argument('--exams', help='exams export (NDJSON)')
+    parser.add_argument('--project', default=DEFAULT_PROJECT)
+    parser.add_argument('--emulator', help='Firestore emulator host, e.g. localhost:8080')
+    parser.add_argument('--concurrency', type=int, default=8, help='batch commits in flight')
+    parser.add_argument('--checkpoint', default='seed-firestore.checkpoint.json')
+    parser.add_argument('--restart', action='store_true', help='ignore an existing checkpoint')
+    args = parser.parse_args()
+
+    if not args.users and not args.exams:
+        parser.error('nothing to load, give --users and/or --exams')
+
+    print("=" * 80)
+    print("Bulk loading Firestore")
+    print("=" * 80)
+    print(f"\n📋 Target: {'emulator ' + args.emulator if args.emulator else 'project ' + args.project}")
+    print(f"📋 {MAX_BATCH_WRITES} writes per batch, {args.concurrency} commits in flight\n")
+
+    stats, failures, seconds = asyncio.run(load(args))
+
+    print("\n" + "=" * 80)
+    if failures:
+        number, error = failures[0]
+        print(f"❌ Batch {number} failed after {MAX_RETRIES} attempts: {error}")
+        print(f"📋 Progress saved to {args.checkpoint}, run again to resume")
+    else:
+        print("✅ COMPLETE!")
+    print(f"📋 Documents written: {stats['documents']:,} in {stats['batches']:,} batches")
+    print(f"📋 Batches skipped (checkpoint): {stats['skipped']:,}")
+    print(f"📋 Retries: {stats['retries']:,}")
+    print(f"📋 Write rate: {stats['documents'] / seconds * 60 if seconds else 0:,.0f} documents/min")
+    print("=" * 80)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
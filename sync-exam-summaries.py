@@ -0,0 +1,226 @@
+"""
+Maintain the exam_summaries projection of the exams collection
+
+Exam documents embed every Question (text, options, correct answer,
+explanation), so getExamsByTeacher, getActiveExamsForStudent and the admin
+lists download all questions of all exams just to show titles and dates.
+exam_summaries/{examId} holds only the listing fields:
+
+    id, title, subject, gradeLevel, teacherId, teacherName, createdAt,
+    startDate, endDate, startTime, endTime, active, durationMinutes,
+    totalPoints, passingScore, questionCount, term
+
+The Kotlin isActive property is stored as "active" (the Firestore mapper drops
+the "is" prefix of Boolean getters); exports that still carry isActive are read
+as a fallback. getExamsByTeacher lists from this projection.
+
+ExamRepository keeps the summary in step on create/update/delete. This script
+does the one-off migration and later re-syncs: it derives the summaries from
+the exams (an export or the live collection), compares them with what is
+stored and only writes the summaries that are missing or differ, and deletes
+summaries whose exam is gone.
+
+It also reports the bytes each listing downloads with full exams vs
+summaries, using Firestore's documented storage size rules (strings are
+UTF-8 length + 1, numbers 8, booleans 1, plus field names and 32 bytes per
+document) as the size measure.
+
+Requirements:
+    pip install google-cloud-firestore   (not needed for a report on an export)
+
+Usage:
+    python sync-exam-summaries.py [exams.ndjson] [--summaries exam_summaries.ndjson]
+                                  [--apply] [--project ID] [--emulator HOST:PORT]
+
+    Without an export the exams are read from Firestore. Without --apply
+    only the report and the pending changes are printed.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_PROJECT = 'online-examination-8372d'
+MAX_BATCH_WRITES = 500
+SUMMARY_FIELDS = ['id', 'title', 'subject', 'gradeLevel', 'teacherId', 'teacherName', 'createdAt',
+                  'startDate', 'endDate', 'startTime', 'endTime', 'active', 'durationMinutes',
+                  'totalPoints', 'passingScore', 'questionCount', 'term']
+
+
+def read_records(path):
+    """Yield documents from an NDJSON or JSON array export"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if Path(path).suffix.lower() == '.json':
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def exam_active(exam):
+    return exam.get('active', exam.get('isActive', True))
+
+
+def to_summary(exam):
+    summary = {field: exam[field] for field in SUMMARY_FIELDS if field in exam}
+    summary['id'] = exam['id']
+    summary['active'] = exam_active(exam)
+    # questionCount was not always written; the questions list is authoritative
+    summary['questionCount'] = len(exam.get('questions') or [])
+    return summary
+
+
+def value_size(value):
+    """Firestore storage size of a field value"""
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 8
+    if isinstance(value, str):
+        return len(value.encode('utf-8')) + 1
+    if isinstance(value, dict):
+        return sum(len(k.encode('utf-8')) + 1 + value_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(value_size(v) for v in value)
+    return 8
+
+
+def document_size(collection, document):
+    name = len(collection.encode('utf-8')) + 1 + len(str(document['id']).encode('utf-8')) + 1 + 16
+    return name + value_size(document) + 32
+
+
+def listings(exams):
+    """The exam lists the app renders: per teacher, per student grade, and the admin list"""
+    result = defaultdict(list)
+    grades = {e.get('gradeLevel', '') for e in exams} - {''}
+    for exam in exams:
+        result[('teacher', exam.get('teacherId', ''))].append(exam['id'])
+        result[('admin', 'all')].append(exam['id'])
+        if exam_active(exam):
+            for grade in grades if exam.get('gradeLevel', '') == '' else [exam['gradeLevel']]:
+                result[('student', grade)].append(exam['id'])
+    return result
+
+
+def report(exams, summaries):
+    full_sizes = {e['id']: document_size('exams', e) for e in exams}
+    summary_sizes = {s['id']: document_size('exam_summaries', s) for s in summaries}
+    print(f"  {'listing':<10} {'lists':>6} {'full bytes/listing':>20} {'summary bytes/listing':>22} {'reduction':>10}")
+    by_kind = defaultdict(list)
+    for (kind, _), ids in listings(exams).items():
+        by_kind[kind].append((sum(full_sizes[i] for i in ids), sum(summary_sizes[i] for i in ids)))
+    for kind in ('teacher', 'student', 'admin'):
+        pairs = by_kind.get(kind)
+        if not pairs:
+            continue
+        full = statistics.mean(p[0] for p in pairs)
+        summary = statistics.mean(p[1] for p in pairs)
+        print(f"  {kind:<10} {len(pairs):>6,} {full:>20,.0f} {summary:>22,.0f} {full / summary:>9.1f}x")
+    total_full, total_summary = sum(full_sizes.values()), sum(summary_sizes.values())
+    print(f"  Per exam: {total_full / len(exams):,.0f} bytes full, {total_summary / len(exams):,.0f} bytes summary")
+
+
+def diff(summaries, stored):
+    """Return (writes, deletes) that bring the stored projection in line"""
+    expected = {s['id']: s for s in summaries}
+    writes = [s for exam_id, s in expected.items() if stored.get(exam_id) != s]
+    deletes = [exam_id for exam_id in stored if exam_id not in expected]
+    return writes, deletes
+
+
+def firestore_client(project, emulator):
+    if emulator:
+        os.environ['FIRESTORE_EMULATOR_HOST'] = emulator
+    from google.cloud import firestore
+    return firestore.Client(project=project)
+
+
+def read_collection(client, name):
+    documents = {}
+    for snap in client.collection(name).stream():
+        data = snap.to_dict()
+        data['id'] = data.get('id') or snap.id
+        documents[snap.id] = data
+    return documents
+
+
+def apply(client, writes, deletes):
+    """Commit the changes in batches of MAX_BATCH_WRITES; returns the number of batches"""
+    operations = [('set', s['id'], s) for s in writes] + [('delete', exam_id, None) for exam_id in deletes]
+    batches = 0
+    for start in range(0, len(operations), MAX_BATCH_WRITES):
+        batch = client.batch()
+        for op, exam_id, data in operations[start:start + MAX_BATCH_WRITES]:
+            ref = client.collection('exam_summaries').document(exam_id)
+            if op == 'set':
+                batch.set(ref, data)
+            else:
+                batch.delete(ref)
+        batch.commit()
+        batches += 1
+    return batches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate and sync the exam_summaries projection')
+    parser.add_argument('exams', nargs='?', help='exams export (NDJSON); read from Firestore when omitted')
+    parser.add_argument('--summaries', help='exam_summaries export to diff against instead of Firestore')
+    parser.add_argument('--apply', action='store_true', help='write the missing/changed summaries')
+    parser.add_argument('--project', default=DEFAULT_PROJECT)
+    parser.add_argument('--emulator', help='Firestore emulator host, e.g. localhost:8080')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("Syncing exam_summaries")
+    print("=" * 80)
+
+    # A report on an export needs no Firestore access at all
+    client = firestore_client(args.project, args.emulator) if args.apply or not args.exams else None
+
+    print("\n[1/3] Loading exams...")
+    if args.exams:
+        exams = list(read_records(args.exams))
+    else:
+        exams = list(read_collection(client, 'exams').values())
+    if not exams:
+        print("❌ No exams found")
+        sys.exit(1)
+    summaries = [to_summary(e) for e in exams]
+    print(f"✅ {len(exams):,} exams")
+
+    print("\n[2/3] Bytes downloaded per listing...")
+    report(exams, summaries)
+
+    print("\n[3/3] Comparing with the stored projection...")
+    if args.summaries:
+        stored = {s['id']: s for s in read_records(args.summaries)}
+    elif client is not None:
+        stored = read_collection(client, 'exam_summaries')
+    else:
+        stored = None
+    if stored is None:
+        print("📋 No projection to compare (give --summaries or --apply); all summaries would be written")
+        writes, deletes = summaries, []
+    else:
+        writes, deletes = diff(summaries, stored)
+        print(f"📋 {len(stored):,} stored, {len(writes):,} to write, {len(deletes):,} to delete")
+
+    if args.apply:
+        batches = apply(client, writes, deletes)
+        print(f"✅ Applied {len(writes) + len(deletes):,} changes in {batches:,} batches")
+
+    print("\n" + "=" * 80)
+    print("✅ COMPLETE!")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+"""
+Validate a PSGC dataset before it is written into PsgcData.kt
+
+Checks a dataset in a single linear pass and reports:
+    - orphans            (municipality/barangay whose parent code does not exist)
+    - duplicate codes    (same code at the same level more than once)
+    - parent mismatches  (child code prefix does not belong to its parent)
+    - kotlin escapes     (unescaped '$', invalid '\\x' escapes, unparsable
+                          constructor calls, or source names containing
+                          characters the generators would not escape)
+    - count drift        (per-level and per-parent child counts that differ
+                          from a source dataset, e.g. municipalities dropped
+                          by the fix-psgc-*.py regex rewriters)
+
+Known findings are read from a baseline file (psgc-baseline.json) and only
+findings beyond it fail the run. The shipped PsgcData.kt truncates the 10-digit
+PSGC barangay codes to 9 digits, so the barangays of a municipality share codes
+like "090734100" and the duplicate check reports 35,548 findings over 5,247
+codes. The app only looks up provinces and municipalities by code, so those
+duplicates are recorded in the baseline until PsgcData.kt is regenerated with
+full codes; a new duplicate code, or more entries under a known one, still fails.
+
+Requirements:
+    pip install barangay          (only for --source barangay)
+    pip install openpyxl pandas   (only for --source <file>.xlsx)
+
+Usage:
+    python validate-psgc-data.py [--kotlin PATH] [--source barangay|<excel file>]
+                                 [--skip CHECK ...] [--max-errors N]
+                                 [--baseline FILE | --no-baseline] [--write-baseline]
+
+Examples:
+    python validate-psgc-data.py
+    python validate-psgc-data.py --source barangay
+    python validate-psgc-data.py --source psgc_data.xlsx --skip duplicate
+    python validate-psgc-data.py --write-baseline    (after reviewing the findings)
+
+Exit code is 1 if any (non-skipped) check fails, so it can gate every regeneration.
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from pathlib import Path
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+PSGC_FILE = 'app/src/main/java/com/onlineexamination/data/model/PsgcData.kt'
+BASELINE_FILE = 'psgc-baseline.json'
+
+CHECKS = ['orphan', 'duplicate', 'parent', 'escape', 'drift']
+LEVELS = ['region', 'province', 'municipality', 'barangay']
+
+# Kotlin string literal: anything except an unescaped quote or newline
+LIT = r'"((?:[^"\\\n]|\\.)*)"'
+KOTLIN_TOKEN = re.compile(
+    rf'(?P<prov>Province\(\s*code\s*=\s*{LIT}\s*,\s*name\s*=\s*{LIT})'
+    rf'|(?P<muni>Municipality\(\s*code\s*=\s*{LIT}\s*,\s*name\s*=\s*{LIT})'
+    rf'|(?P<muni_pos>Municipality\(\s*{LIT}\s*,\s*{LIT}\s*\))'
+    rf'|(?P<brgy>Barangay\(\s*{LIT}\s*,\s*{LIT}\s*\))'
+    r'|(?P<bad>(?<!class )\b(?:Province|Municipality|Barangay)\((?!\)))'
+)
+# Constants written by pack-psgc-strings.py
+PACKED_CONSTANT = re.compile(rf'private const val PROVINCE_\d+_\d+ = {LIT}')
+KOTLIN_ESCAPES = {'t': '\t', 'b': '\b', 'n': '\n', 'r': '\r', "'": "'", '"': '"', '\\': '\\', '$': '$'}
+# A '$' starts a string template when followed by an identifier or '{'
+TEMPLATE = re.compile(r'(?<!\\)(?:\\\\)*\$(?=[A-Za-z_{])')
+BAD_ESCAPE = re.compile(r'\\(?:u(?![0-9a-fA-F]{4})|[^tbnr\'"\\$u])')
+# Characters the generator scripts write verbatim into "..." literals
+NEEDS_ESCAPE = re.compile(r'["\\$\n\r]')
+
+# PSGC codes in PsgcData.kt are 10-digit codes truncated to 9 digits:
+# RR PPP MM BB -> parent prefixes below
+PARENT_PREFIX = {'province': 2, 'municipality': 5, 'barangay': 7}
+
+
+def normalize_code(code):
+    """Normalize a PSGC code to 9 digits the same way populate-barangays*.py do"""
+    code = str(code).strip()
+    if code.endswith('.0'):
+        code = code[:-2]
+    return code.ljust(9, '0') if len(code) < 9 else code[:9]
+
+
+def decode_kotlin_string(raw):
+    """Decode the body of a Kotlin "..." literal"""
+    if '\\' not in raw:
+        return raw
+    out = []
+    i = 0
+    while i < len(raw):
+        ch = raw[i]
+        if ch == '\\' and i + 1 < len(raw):
+            nxt = raw[i + 1]
+            if nxt == 'u' and i + 6 <= len(raw):
+                out.append(chr(int(raw[i + 2:i + 6], 16)))
+                i += 6
+                continue
+            out.append(KOTLIN_ESCAPES.get(nxt, nxt))
+            i += 2
+            continue
+        out.append(ch)
+        i += 1
+    return ''.join(out)
+
+
+def is_region_code(code):
+    return code[2:] == '0' * (len(code) - 2)
+
+
+def load_packed(content):
+    """Read the tab/newline records of a PsgcData.kt written by pack-psgc-strings.py"""
+    records = []
+    province = None
+    municipality = None
+    for raw in PACKED_CONSTANT.findall(content):
+        for line in decode_kotlin_string(raw).split('\n'):
+            if not line:
+                continue
+            fields = line.split('\t')
+            if fields[0] == 'P':
+                province, municipality = fields[1], None
+                records.append(('region' if is_region_code(province) else 'province', fields[1], fields[2], None))
+            elif fields[0] == 'M':
+                municipality = fields[1]
+                records.append(('municipality', fields[1], fields[2], province))
+            else:
+                records.append(('barangay', fields[0], fields[1], municipality))
+    return records
+
+
+def load_kotlin(path):
+    """Parse PsgcData.kt into (level, code, name, parent_code) records
+
+    Tokens are read in file order with one regex scan; the current province and
+    municipality provide the parent of every following child entry.
+    """
+    content = Path(path).read_text(encoding='utf-8')
+    if PACKED_CONSTANT.search(content):
+        return load_packed(content), []
+    records = []
+    problems = []
+    province = None
+    municipality = None
+
+    newlines = [m.start() for m in re.finditer('\n', content)]
+
+    def line_of(pos):
+        return bisect_left(newlines, pos) + 1
+
+    for m in KOTLIN_TOKEN.finditer(content):
+        kind = m.lastgroup
+        if kind == 'bad':
+            problems.append((line_of(m.start()), f'unparsable constructor call near: {content[m.start():m.start() + 60]!r}'))
+            continue
+        if kind == 'prov':
+            raw_code, raw_name = m.group(2), m.group(3)
+        elif kind == 'muni':
+            raw_code, raw_name = m.group(5), m.group(6)
+        elif kind == 'muni_pos':
+            raw_code, raw_name = m.group(8), m.group(9)
+        else:
+            raw_code, raw_name = m.group(11), m.group(12)
+
+        for raw in (raw_code, raw_name):
+            if TEMPLATE.search(raw) or BAD_ESCAPE.search(raw):
+                problems.append((line_of(m.start()), f'unescaped Kotlin string content: "{raw}"'))
+
+        code = decode_kotlin_string(raw_code)
+        name = decode_kotlin_string(raw_name)
+        if kind == 'prov':
+            level = 'region' if is_region_code(code) else 'province'
+            province, municipality = code, None
+            records.append((level, code, name, None))
+        elif kind in ('muni', 'muni_pos'):
+            municipality = code
+            records.append(('municipality', code, name, province))
+        else:
+            records.append(('barangay', code, name, municipality))
+
+    return records, problems
+
+
+def load_barangay_package():
+    """Flatten barangay.BARANGAY_FLAT into validator records"""
+    import barangay
+
+    type_map = {
+        'region': 'region',
+        'province': 'province',
+        'municipality': 'municipality',
+        'city': 'municipality',
+        'submunicipality': 'municipality',
+        'barangay': 'barangay',
+    }
+    records = []
+    for entry in barangay.BARANGAY_FLAT:
+        if not isinstance(entry, dict):
+            continue
+        entry_type = entry.get('type', '').lower()
+        level = type_map.get(entry_type.split(' ')[0])
+        psgc_id = str(entry.get('psgc_id', '')).strip()
+        name = entry.get('name', '').strip()
+        if not level or not psgc_id or not name:
+            continue
+        parent_id = str(entry.get('parent_psgc_id', '')).strip()
+        records.append((level, normalize_code(psgc_id), name, normalize_code(parent_id) if parent_id else None))
+    return records
+
+
+def load_excel(path):
+    """Read a PSGC Excel publication (10-digit code, name, geographic level columns)"""
+    import pandas as pd
+
+    df = pd.read_excel(path, dtype=str)
+    columns = {str(c).lower(): c for c in df.columns}
+    code_col = next((c for k, c in columns.items() if 'psgc' in k or 'code' in k), None)
+    name_col = next((c for k, c in columns.items() if 'name' in k), None)
+    level_col = next((c for k, c in columns.items() if 'level' in k), None)
+    if not code_col or not name_col or not level_col:
+        print(f"❌ Could not identify code/name/level columns in {path}: {list(df.columns)}")
+        sys.exit(1)
+
+    level_map = {'reg': 'region', 'prov': 'province', 'city': 'municipality',
+                 'mun': 'municipality', 'submun': 'municipality', 'bgy': 'barangay'}
+    records = []
+    for code, name, geo_level in zip(df[code_col], df[name_col], df[level_col]):
+        level = level_map.get(str(geo_level).strip().lower())
+        if not level or str(code) == 'nan' or str(name) == 'nan':
+            continue
+        full = str(code).strip().zfill(10)
+        if level == 'region':
+            parent = None
+        elif level == 'province':
+            parent = full[:2] + '0' * 8
+        elif level == 'municipality':
+            parent = full[:5] + '0' * 5
+        else:
+            parent = full[:7] + '0' * 3
+        records.append((level, normalize_code(full), str(name).strip(), normalize_code(parent) if parent else None))
+    return records
+
+
+def validate(records, source_records=None, check_escape_in_names=False):
+    """Run every check over the records in one pass; returns {check: [messages]}"""
+    errors = defaultdict(list)
+    seen = {level: set() for level in LEVELS}
+    parent_refs = []
+    children = Counter()
+    level_counts = Counter()
+
+    for level, code, name, parent in records:
+        level_counts[level] += 1
+        if code in seen[level]:
+            errors['duplicate'].append(f'{level} {code} "{name}" appears more than once')
+        seen[level].add(code)
+
+        if check_escape_in_names and NEEDS_ESCAPE.search(name):
+            errors['escape'].append(f'{level} {code} name needs escaping for Kotlin: {name!r}')
+
+        if level in ('region', 'province') and parent is None:
+            continue
+        parent_refs.append((level, code, name, parent))
+        children[(level, parent)] += 1
+
+        if parent is not None and level in PARENT_PREFIX:
+            if is_region_code(parent):
+                same = code[:2] == parent[:2]
+            else:
+                prefix = PARENT_PREFIX[level]
+                same = code[:prefix] == parent[:prefix]
+            if not same:
+                errors['parent'].append(f'{level} {code} "{name}" does not belong to parent {parent}')
+
+    # Parents may appear after their children, so resolve them once the pass is done
+    parent_levels = {
+        'province': ('region',),
+        'municipality': ('province', 'region'),
+        'barangay': ('municipality',),
+    }
+    for level, code, name, parent in parent_refs:
+        if parent is None or not any(parent in seen[p] for p in parent_levels[level]):
+            errors['orphan'].append(f'{level} {code} "{name}" has no parent ({parent})')
+
+    if source_records is not None:
+        source_counts = Counter()
+        source_children = Counter()
+        source_seen = {level: {} for level in LEVELS}
+        for level, code, name, parent in source_records:
+            source_counts[level] += 1
+            source_seen[level][code] = name
+            if parent is not None:
+                source_children[(level, parent)] += 1
+
+        for level in LEVELS:
+            if source_counts[level] and source_counts[level] != level_counts[level]:
+                errors['drift'].append(
+                    f'{level}: {level_counts[level]:,} in dataset vs {source_counts[level]:,} in source')
+        for level in ('province', 'municipality'):
+            for code, name in source_seen[level].items():
+                if code not in seen[level]:
+                    errors['drift'].append(f'{level} {code} "{name}" is missing from the dataset')
+        for (level, parent), expected in source_children.items():
+            if level == 'barangay' and parent in seen['municipality'] and children[(level, parent)] != expected:
+                errors['drift'].append(
+                    f'municipality {parent}: {children[(level, parent)]} barangays vs {expected} in source')
+
+    return errors, level_counts
+
+
+def baseline_key(check, message):
+    """Key a finding by level and code where the message has them, so renames don't matter"""
+    if check in ('orphan', 'duplicate', 'parent'):
+        return ' '.join(message.split()[:2])
+    return message
+
+
+def load_baseline(path):
+    """Read {check: {key: count}} of accepted findings; missing file means none"""
+    if not path or not Path(path).exists():
+        return {}
+    return json.loads(Path(path).read_text(encoding='utf-8'))
+
+
+def write_baseline(path, errors):
+    baseline = {}
+    for check, messages in errors.items():
+        counts = Counter(baseline_key(check, message) for message in messages)
+        if counts:
+            baseline[check] = dict(sorted(counts.items()))
+    Path(path).write_text(json.dumps(baseline, indent=1, ensure_ascii=False) + '\n', encoding='utf-8')
+    return baseline
+
+
+def split_known(check, messages, baseline):
+    """Split findings into (new, known count) against the baseline allowance per key"""
+    allowance = Counter(baseline.get(check, {}))
+    new = []
+    known = 0
+    for message in messages:
+        key = baseline_key(check, message)
+        if allowance[key] > 0:
+            allowance[key] -= 1
+            known += 1
+        else:
+            new.append(message)
+    return new, known
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Validate PSGC data before regenerating PsgcData.kt')
+    parser.add_argument('--kotlin', default=PSGC_FILE, help='PsgcData.kt to validate')
+    parser.add_argument('--source', help="'barangay' for the barangay package, or an Excel file path")
+    parser.add_argument('--skip', nargs='*', default=[], choices=CHECKS, help='checks to ignore')
+    parser.add_argument('--max-errors', type=int, default=20, help='messages to print per check')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='accepted findings (default: %(default)s)')
+    parser.add_argument('--no-baseline', action='store_true', help='fail on every finding')
+    parser.add_argument('--write-baseline', action='store_true',
+                        help='record the current findings as the baseline and exit')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("Validating PSGC data")
+    print("=" * 80)
+
+    print(f"\n[1/3] Parsing {args.kotlin}...")
+    started = time.perf_counter()
+    records, kotlin_problems = load_kotlin(args.kotlin)
+    parse_seconds = time.perf_counter() - started
+    print(f"✅ Parsed {len(records):,} entries in {parse_seconds:.3f}s")
+
+    source_records = None
+    if args.source:
+        print(f"\n[2/3] Loading source: {args.source}...")
+        if args.source == 'barangay':
+            source_records = load_barangay_package()
+        else:
+            source_records = load_excel(args.source)
+        print(f"✅ Loaded {len(source_records):,} source entries")
+        source_errors, _ = validate(source_records, check_escape_in_names=True)
+        for message in source_errors['escape']:
+            kotlin_problems.append((0, f'source {message}'))
+    else:
+        print("\n[2/3] No source given, skipping count drift")
+
+    print("\n[3/3] Running checks...")
+    started = time.perf_counter()
+    errors, level_counts = validate(records, source_records)
+    errors['escape'] = [f'line {line}: {msg}' if line else msg for line, msg in kotlin_problems] + errors['escape']
+    check_seconds = time.perf_counter() - started
+    print(f"✅ Checked in {check_seconds:.3f}s")
+    for level in LEVELS:
+        print(f"  {level.capitalize():<13} {level_counts[level]:>8,}")
+
+    if args.write_baseline:
+        baseline = write_baseline(args.baseline, errors)
+        total = sum(sum(counts.values()) for counts in baseline.values())
+        print(f"\n✅ Wrote {total:,} findings to {args.baseline}")
+        return
+
+    baseline = {} if args.no_baseline else load_baseline(args.baseline)
+    if baseline:
+        print(f"📋 Baseline: {args.baseline}")
+
+    failed = False
+    print()
+    for check in CHECKS:
+        messages, known = split_known(check, errors.get(check, []), baseline)
+        note = f" ({known:,} known in baseline)" if known else ""
+        if check in args.skip:
+            print(f"⏭️  {check:<10} skipped ({len(messages) + known:,} findings)")
+            continue
+        if not messages:
+            print(f"✅ {check:<10} OK{note}")
+            continue
+        failed = True
+        print(f"❌ {check:<10} {len(messages):,} problems{note}")
+        for message in messages[:args.max_errors]:
+            print(f"     {message}")
+        if len(messages) > args.max_errors:
+            print(f"     ... and {len(messages) - args.max_errors:,} more")
+
+    print("\n" + "=" * 80)
+    print("❌ VALIDATION FAILED" if failed else "✅ VALIDATION PASSED")
+    print(f"📋 Total time: {parse_seconds + check_seconds:.3f}s")
+    print("=" * 80)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()